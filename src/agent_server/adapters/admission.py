@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from ..metrics.registry import MetricsRegistry
+
+T = TypeVar("T")
+
+
+class AdmissionRejected(HTTPException):
+    """429 Too Many Requests with a Retry-After header, FastAPI renders it like any HTTPException."""
+
+    def __init__(self, name: str, reason: str, retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail=f"{name} is saturated ({reason}), retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """An admitted run, `release` (idempotent) frees its slot for the next waiter."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(time.perf_counter() - self._started)
+
+    async def guard(self, stream: AsyncIterator[T]) -> AsyncIterator[T]:
+        """Holds the slot until the stream is exhausted or closed (e.g. the client went away)."""
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            self.release()
+
+
+class AdmissionController:
+    """
+    Admission control for one endpoint class (e.g. "chat", "graph").
+
+    - at most `max_in_flight` runs at once, 0 disables the limit
+    - up to `max_queue` requests wait for a slot, in arrival order, at most
+      `queue_timeout` seconds
+    - everything beyond is rejected right away with 429 and a Retry-After estimated
+      from the average run time, so the admitted runs keep their share of the backend
+
+    In flight runs, queue depth, admissions, rejections and the wait time are recorded
+    as `admission.<name>.*` metrics. Lives on the event loop of the server.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            max_in_flight: int = 4,
+            max_queue: int = 8,
+            queue_timeout: float = 10.0,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+    ):
+        self.name = name
+        self.max_in_flight = max(0, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.metrics = metrics or MetricsRegistry()
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._active = 0
+        self._queue: deque[asyncio.Future] = deque()
+        self._runs = 0
+        self._run_seconds = 0.0
+
+    def _metric(self, name: str) -> str:
+        return f"admission.{self.name}.{name}"
+
+    def _record_gauges(self):
+        self.metrics.set_gauge(self._metric("in_flight"), self._active)
+        self.metrics.set_gauge(self._metric("queue_depth"), len(self._queue))
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead drained at the average run time."""
+        average = self._run_seconds / self._runs if self._runs else self.queue_timeout
+        slots = self.max_in_flight or 1
+        return min(300, max(1, math.ceil(average * (len(self._queue) + 1) / slots)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.metrics.increment(self._metric(f"rejected.{reason}"))
+        retry_after = self.retry_after()
+        self.logger.warning(f"AdmissionController {self.name}: rejected ({reason}), retry after {retry_after}s")
+        return AdmissionRejected(self.name, reason, retry_after)
+
+    def _admit(self, waited: float) -> AdmissionTicket:
+        self.metrics.increment(self._metric("admitted"))
+        self.metrics.observe(self._metric("wait_seconds"), waited)
+        self._record_gauges()
+        return AdmissionTicket(self)
+
+    def _dispatch(self):
+        # a granted waiter owns its slot from here on
+        while self._queue and self._active < self.max_in_flight:
+            waiter = self._queue.popleft()
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+        self._record_gauges()
+
+    def _release(self, seconds: float):
+        self._runs += 1
+        self._run_seconds += seconds
+        self._active -= 1
+        self._dispatch()
+
+    async def acquire(self) -> AdmissionTicket:
+        """A slot for one run, raises AdmissionRejected when the class is saturated."""
+        if self.max_in_flight == 0 or (self._active < self.max_in_flight and not self._queue):
+            self._active += 1
+            return self._admit(0.0)
+        if len(self._queue) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        enqueued_at = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.append(waiter)
+        self._record_gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # granted in the same moment, the slot goes to the next waiter
+                self._active -= 1
+                self._dispatch()
+            else:
+                waiter.cancel()
+                self._queue.remove(waiter)
+                self._record_gauges()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject("timeout") from None
+        return self._admit(time.perf_counter() - enqueued_at)
+
+    async def stream(
+            self,
+            build: Callable[[], AsyncIterator[T]],
+            media_type: str = "text/event-stream",
+            headers: Optional[dict[str, str]] = None,
+    ) -> StreamingResponse:
+        """
+        A StreamingResponse of the stream `build` returns, holding a slot until it is done.
+
+        A failing `build` frees the slot right away; the response frees it once sent, also
+        when the client went away before the body started and `guard` never ran.
+        """
+        ticket = await self.acquire()
+        try:
+            body = ticket.guard(build())
+        except BaseException:
+            ticket.release()
+            raise
+        return StreamingResponse(body, media_type=media_type, headers=headers, background=BackgroundTask(ticket.release))
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[AdmissionTicket]:
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self._active,
+            "queued": len(self._queue),
+        }
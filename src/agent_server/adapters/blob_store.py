@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+HANDLE_PREFIX = "sha256:"
+
+
+def handle_for(payload: bytes) -> str:
+    return HANDLE_PREFIX + hashlib.sha256(payload).hexdigest()
+
+
+class BlobStore:
+    """
+    Keeps large JSON payloads out of the graph state.
+
+    `put` stores a value and returns a content-addressed handle ("sha256:<hex>"), so the
+    same payload is stored once and a handle written to the cache or a checkpoint stays
+    valid. `offload` / `load` move one key of a dict to the store and back, the dict
+    then carries `<key>_ref` instead of `<key>`.
+
+    This base class keeps the last `max_entries` payloads in memory.
+    """
+
+    def __init__(self, max_entries: int = 1024, logger: logging.Logger | None = None):
+        self.max_entries = max_entries
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._blobs: OrderedDict[str, bytes] = OrderedDict()
+
+    @staticmethod
+    def ref_key(key: str) -> str:
+        return f"{key}_ref"
+
+    def put(self, value: Any) -> str:
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        handle = handle_for(payload)
+        self._write(handle, payload)
+        return handle
+
+    def get(self, handle: str, default: Any = None) -> Any:
+        payload = self._read(handle)
+        if payload is None:
+            self.logger.warning(f"BlobStore: {handle} not found")
+            return default
+        return json.loads(payload)
+
+    def offload(self, item: dict, key: str) -> dict:
+        if not isinstance(item, dict) or key not in item:
+            return item
+        offloaded = {k: v for k, v in item.items() if k != key}
+        offloaded[self.ref_key(key)] = self.put(item[key])
+        return offloaded
+
+    def load(self, item: dict, key: str, default: Any = None) -> Any:
+        if key in item:
+            return item[key]
+        handle = item.get(self.ref_key(key))
+        return self.get(handle, default) if handle else default
+
+    def _write(self, handle: str, payload: bytes) -> None:
+        with self._lock:
+            self._blobs[handle] = payload
+            self._blobs.move_to_end(handle)
+            while len(self._blobs) > self.max_entries:
+                self._blobs.popitem(last=False)
+
+    def _read(self, handle: str) -> Optional[bytes]:
+        with self._lock:
+            return self._blobs.get(handle)
+
+
+class FileBlobStore(BlobStore):
+    """
+    BlobStore on disk, one file per payload below `directory`.
+
+    With `max_age`, payloads which were neither written nor read for `max_age` seconds
+    are removed, at most once per `cleanup_interval` seconds on a write. The container
+    uses the checkpoint max age: a checkpoint which may still answer a query keeps its
+    payloads.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            max_age: int | None = None,
+            cleanup_interval: int = 3600,
+            logger: logging.Logger | None = None,
+    ):
+        super().__init__(logger=logger)
+        self.directory = directory
+        self.max_age = max_age
+        self.cleanup_interval = cleanup_interval
+        self._next_cleanup = time.monotonic()
+
+    def _path(self, handle: str) -> str:
+        digest = handle.removeprefix(HANDLE_PREFIX)
+        if not digest.isalnum():
+            raise ValueError(f"Invalid blob handle {handle}")
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def _write(self, handle: str, payload: bytes) -> None:
+        path = self._path(handle)
+        if os.path.isfile(path):
+            self._touch(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to a temporary file first, readers never see a partial blob
+            partial = f"{path}.{threading.get_ident()}.part"
+            with open(partial, "wb") as f:
+                f.write(payload)
+            os.replace(partial, path)
+        self._cleanup_due()
+
+    def _read(self, handle: str) -> Optional[bytes]:
+        try:
+            path = self._path(handle)
+            with open(path, "rb") as f:
+                payload = f.read()
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return payload
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        # the age of a payload counts from its last use
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _cleanup_due(self) -> None:
+        if self.max_age is None:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_cleanup:
+                return
+            self._next_cleanup = time.monotonic() + self.cleanup_interval
+        self.cleanup()
+
+    def cleanup(self) -> int:
+        """Removes the payloads (and stale partial writes) older than `max_age`, returns their number."""
+        if self.max_age is None:
+            return 0
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    # removed or rewritten in the meantime
+                    continue
+        if removed:
+            self.logger.info(f"FileBlobStore: removed {removed} payloads older than {self.max_age}s")
+        return removed
+
+
+class BlobStoreFactory:
+    """
+    Creates the blob store of the Internet Archive graph for the configured backend.
+
+    Backends:
+    - "file": FileBlobStore below `directory`, payloads unused for `max_age` seconds are removed
+    - "memory": BlobStore, the payloads live as long as the process; not with a
+      persistent `checkpoint_backend`, its checkpoints would outlive the file lists
+    - "none": large payloads stay in the graph state
+    """
+
+    @staticmethod
+    def create(
+            backend: str,
+            directory: str | None = None,
+            max_age: int | None = None,
+            checkpoint_backend: str | None = None,
+            logger: logging.Logger | None = None,
+    ) -> Optional[BlobStore]:
+        backend = (backend or "none").lower()
+
+        if backend == "none":
+            return None
+        if backend == "memory":
+            if (checkpoint_backend or "none").lower() != "none":
+                raise AttributeError(
+                    f"The memory blob store cannot be used with the {checkpoint_backend} checkpointer, "
+                    f"use the file blob store"
+                )
+            return BlobStore(logger=logger)
+        if backend == "file":
+            if not directory:
+                raise AttributeError("The file blob store needs a directory")
+            return FileBlobStore(directory=directory, max_age=max_age, logger=logger)
+
+        raise AttributeError(f"Unknown blob store backend {backend}")
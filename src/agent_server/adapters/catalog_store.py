@@ -0,0 +1,96 @@
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import Engine, func
+from sqlmodel import Session, select
+
+from ..models.manual import Game, Platform, Manual, ManualSource, IADownload
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSelection:
+    """The games of a sweep, the filters are combined; empty selects all games."""
+
+    platforms: tuple[str, ...] = ()  # platform names or ids
+    years: tuple[int, ...] = ()
+    game_ids: tuple[int, ...] = ()
+    limit: Optional[int] = None
+    # also search games which have a manual source already
+    force: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogGame:
+    id: int
+    name: str
+    year: Optional[int]
+    platform: Optional[str]
+
+
+class CatalogStore:
+    """
+    Reads the games of a catalog sweep and links the manuals found to them.
+
+    A game is done once its Manual has a ManualSource, a sweep skips it unless
+    forced; so a stopped sweep is resumed by starting it again.
+    """
+
+    def __init__(self, engine: Engine, logger: logging.Logger | None = None):
+        self.engine = engine
+        self.logger = logger or logging.getLogger(__name__)
+
+    def games(self, selection: CatalogSelection) -> list[CatalogGame]:
+        with Session(self.engine) as session:
+            statement = select(Game, Platform).join(Platform, Game.platform == Platform.id, isouter=True)
+            if selection.game_ids:
+                statement = statement.where(Game.id.in_(selection.game_ids))
+            if selection.years:
+                statement = statement.where(Game.year.in_(selection.years))
+            if selection.platforms:
+                ids = [int(p) for p in selection.platforms if str(p).isdigit()]
+                names = [str(p).lower() for p in selection.platforms if not str(p).isdigit()]
+                statement = statement.where(Platform.id.in_(ids) | func.lower(Platform.name).in_(names))
+            if not selection.force:
+                done = select(Manual.game_id).join(ManualSource, ManualSource.manual_id == Manual.id) \
+                    .where(Manual.game_id.is_not(None))
+                statement = statement.where(Game.id.not_in(done))
+            statement = statement.order_by(Game.id)
+            if selection.limit:
+                statement = statement.limit(selection.limit)
+            return [
+                CatalogGame(id=game.id, name=game.name, year=game.year, platform=platform.name if platform else None)
+                for game, platform in session.exec(statement).all()
+            ]
+
+    def link(self, game_id: int, search_id: int, files: Iterable[tuple[str, str]]) -> int:
+        """
+        Links the (identifier, file name) pairs found by the search to the manual of the
+        game, the manual is created on first use. Returns the number of new sources.
+        """
+        with Session(self.engine) as session:
+            manual = session.exec(select(Manual).where(Manual.game_id == game_id)).first()
+            if manual is None:
+                manual = Manual(game_id=game_id)
+                session.add(manual)
+                session.flush()
+
+            linked = 0
+            for identifier, file_name in dict.fromkeys(files):
+                if session.get(ManualSource, (manual.id, identifier, file_name)) is None:
+                    session.add(ManualSource(
+                        manual_id=manual.id, identifier=identifier, file_name=file_name, search_id=search_id,
+                    ))
+                    linked += 1
+                # the download of a shared file belongs to the manual which got it first
+                for download in session.exec(
+                    select(IADownload)
+                    .where(IADownload.search_id == search_id)
+                    .where(IADownload.identifier == identifier)
+                    .where(IADownload.file_name == file_name)
+                    .where(IADownload.manual_id.is_(None))
+                ).all():
+                    download.manual_id = manual.id
+                    session.add(download)
+            session.commit()
+            return linked
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import random
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from sqlalchemy import Engine
+from sqlmodel import Session, create_engine, delete, select
+
+from ..models.checkpoint import GraphCheckpoint, GraphCheckpointBlob, GraphCheckpointWrite
+
+
+class SQLModelCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer stored in the `graphcheckpoint*` tables.
+
+    Works on SQLite (local development) and on Postgres (production, reusing the
+    sqlmodel engine). The layout follows the LangGraph savers: one row per checkpoint,
+    channel values as versioned blobs (unchanged channels are not written again) and
+    the pending writes of each task, so a failed run resumes with the tasks which did
+    not finish.
+
+    The async methods run the sync ones in a worker thread.
+    """
+
+    def __init__(self, engine: Engine, logger: logging.Logger | None = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.engine = engine
+        self.logger = logger or logging.getLogger(__name__)
+        for table in (GraphCheckpoint, GraphCheckpointBlob, GraphCheckpointWrite):
+            table.__table__.create(self.engine, checkfirst=True)
+
+    @staticmethod
+    def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }
+        }
+
+    def _tuple(self, session: Session, row: GraphCheckpoint) -> CheckpointTuple:
+        checkpoint: Checkpoint = self.serde.loads_typed((row.checkpoint_type, row.checkpoint))
+
+        channel_values: dict[str, Any] = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = session.get(GraphCheckpointBlob, (row.thread_id, row.checkpoint_ns, channel, str(version)))
+            if blob is not None and blob.type != "empty":
+                channel_values[channel] = self.serde.loads_typed((blob.type, blob.blob))
+
+        writes = session.exec(
+            select(GraphCheckpointWrite)
+            .where(GraphCheckpointWrite.thread_id == row.thread_id)
+            .where(GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns)
+            .where(GraphCheckpointWrite.checkpoint_id == row.checkpoint_id)
+            .order_by(GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+        ).all()
+
+        return CheckpointTuple(
+            config=self._config(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=(
+                self._config(row.thread_id, row.checkpoint_ns, row.parent_checkpoint_id)
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (write.task_id, write.channel, self.serde.loads_typed((write.type, write.value)))
+                for write in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        statement = (
+            select(GraphCheckpoint)
+            .where(GraphCheckpoint.thread_id == thread_id)
+            .where(GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            statement = statement.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        else:
+            # checkpoint ids are monotonically increasing
+            statement = statement.order_by(GraphCheckpoint.checkpoint_id.desc()).limit(1)
+
+        with Session(self.engine) as session:
+            row = session.exec(statement).first()
+            return self._tuple(session, row) if row is not None else None
+
+    def list(
+            self,
+            config: RunnableConfig | None,
+            *,
+            filter: dict[str, Any] | None = None,
+            before: RunnableConfig | None = None,
+            limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        statement = select(GraphCheckpoint)
+        if config:
+            statement = statement.where(GraphCheckpoint.thread_id == config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                statement = statement.where(GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                statement = statement.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            statement = statement.where(GraphCheckpoint.checkpoint_id < before_id)
+        statement = statement.order_by(GraphCheckpoint.checkpoint_id.desc())
+
+        with Session(self.engine) as session:
+            tuples = []
+            for row in session.exec(statement):
+                if limit is not None and len(tuples) >= limit:
+                    break
+                checkpoint_tuple = self._tuple(session, row)
+                if filter and not all(
+                        checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+                ):
+                    continue
+                tuples.append(checkpoint_tuple)
+        yield from tuples
+
+    def put(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+
+        with Session(self.engine) as session:
+            for channel, version in new_versions.items():
+                blob_type, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+                session.merge(GraphCheckpointBlob(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    channel=channel,
+                    version=str(version),
+                    type=blob_type,
+                    blob=blob,
+                ))
+            checkpoint_type, checkpoint_payload = self.serde.dumps_typed(c)
+            metadata_type, metadata_payload = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+            session.merge(GraphCheckpoint(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                checkpoint_type=checkpoint_type,
+                checkpoint=checkpoint_payload,
+                metadata_type=metadata_type,
+                checkpoint_metadata=metadata_payload,
+            ))
+            session.commit()
+
+        return self._config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[tuple[str, Any]],
+            task_id: str,
+            task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with Session(self.engine) as session:
+            for idx, (channel, value) in enumerate(writes):
+                key = (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx))
+                # regular writes are stored once, special channels (errors, interrupts) are replaced
+                if key[-1] >= 0 and session.get(GraphCheckpointWrite, key) is not None:
+                    continue
+                value_type, payload = self.serde.dumps_typed(value)
+                session.merge(GraphCheckpointWrite(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint_id,
+                    task_id=task_id,
+                    idx=key[-1],
+                    channel=channel,
+                    type=value_type,
+                    value=payload,
+                    task_path=task_path,
+                ))
+            session.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with Session(self.engine) as session:
+            for table in (GraphCheckpoint, GraphCheckpointBlob, GraphCheckpointWrite):
+                session.exec(delete(table).where(table.thread_id == thread_id))
+            session.commit()
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+            self,
+            config: RunnableConfig | None,
+            *,
+            filter: dict[str, Any] | None = None,
+            before: RunnableConfig | None = None,
+            limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[tuple[str, Any]],
+            task_id: str,
+            task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+class CheckpointSaverFactory:
+    """
+    Creates the checkpointer of the Internet Archive graph for the configured backend.
+
+    Backends:
+    - "sqlite": SQLModelCheckpointSaver on its own SQLite file (`url`)
+    - "postgres": SQLModelCheckpointSaver on the shared Postgres engine
+    - "none": no checkpoints, runs always start from the beginning
+    """
+
+    @staticmethod
+    def create(
+            backend: str,
+            url: str | None = None,
+            engine: Engine | None = None,
+            logger: logging.Logger | None = None,
+    ) -> Optional[BaseCheckpointSaver]:
+        backend = (backend or "none").lower()
+
+        if backend == "none":
+            return None
+        if backend == "sqlite":
+            return SQLModelCheckpointSaver(engine=create_engine(url or "sqlite:///checkpoints.sqlite"), logger=logger)
+        if backend == "postgres":
+            if engine is None:
+                raise AttributeError("The postgres checkpointer needs an engine")
+            return SQLModelCheckpointSaver(engine=engine, logger=logger)
+
+        raise AttributeError(f"Unknown checkpoint backend {backend}")
@@ -0,0 +1,245 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import Engine, delete
+from sqlmodel import Session, select
+
+from .blob_store import BlobStore
+from .internet_archive_records import files_table
+from ..models.manual import (
+    IASearch, IASearchResult, IAFilteredResult, IAEntryToConsider, IAPdfToDownload, IADownload,
+    IAItem, IAItemFile, IAItemCollection, IAItemSubject,
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+FINISHED_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# IAItem columns filled from the item metadata of the graph state
+_ITEM_FIELDS = (
+    "mediatype", "title", "creator", "date", "language", "uploader", "publicdate", "addeddate",
+    "description", "scanner", "ocr", "ocr_parameters", "ocr_module_version", "ocr_detected_lang",
+    "ocr_detected_lang_conf",
+)
+
+
+def _text(value: Any) -> Optional[str]:
+    """IA metadata values are a str or a list of them."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (list, tuple)):
+        return "; ".join(str(v) for v in value)
+    return str(value)
+
+
+def _values(value: Any) -> list[str]:
+    if not value:
+        return []
+    return list(dict.fromkeys(str(v) for v in (value if isinstance(value, (list, tuple)) else [value])))
+
+
+class IASearchStore:
+    """
+    Persists the Internet Archive searches run as jobs in IASearch and its tables.
+
+    An IASearch row is the job: its status, the last progress stage and text, and the
+    times it was started and finished. `save_result` writes the final graph state:
+    the ranked search and filter results, the items with their metadata, the entries
+    to consider, the PDFs chosen per item and the downloaded files.
+
+    The file lists the MetadataNode moved to the `blob_store` (`files_ref`) are read
+    from there for the file details.
+
+    All methods open their own session, they are called from worker threads.
+    """
+
+    def __init__(self, engine: Engine, blob_store: BlobStore | None = None, logger: logging.Logger | None = None):
+        self.engine = engine
+        self.blob_store = blob_store
+        self.logger = logger or logging.getLogger(__name__)
+
+    def create(self, query: str, normalized_query: str) -> dict:
+        with Session(self.engine) as session:
+            search = IASearch(query=query, normalized_query=normalized_query, status=JOB_QUEUED)
+            session.add(search)
+            session.commit()
+            session.refresh(search)
+            return self._job(search)
+
+    def latest(self, normalized_query: str, max_age: int) -> Optional[dict]:
+        """The job to answer a query with: an active one, or one done in the last `max_age` seconds."""
+        with Session(self.engine) as session:
+            search = session.exec(
+                select(IASearch)
+                .where(IASearch.normalized_query == normalized_query)
+                .where(IASearch.status.in_((*ACTIVE_STATUSES, JOB_DONE)))
+                .order_by(IASearch.id.desc())
+            ).first()
+            if search is None:
+                return None
+            if search.status == JOB_DONE and search.created_at < datetime.utcnow() - timedelta(seconds=max_age):
+                return None
+            return self._job(search)
+
+    def unfinished(self) -> list[dict]:
+        """Jobs queued or running when the server stopped."""
+        with Session(self.engine) as session:
+            searches = session.exec(
+                select(IASearch).where(IASearch.status.in_(ACTIVE_STATUSES)).order_by(IASearch.id)
+            ).all()
+            return [self._job(search) for search in searches]
+
+    def update(self, search_id: int, **fields: Any) -> None:
+        with Session(self.engine) as session:
+            search = session.get(IASearch, search_id)
+            if search is None:
+                return
+            for key, value in fields.items():
+                setattr(search, key, value)
+            session.add(search)
+            session.commit()
+
+    def get(self, search_id: int, results: bool = True) -> Optional[dict]:
+        with Session(self.engine) as session:
+            search = session.get(IASearch, search_id)
+            if search is None:
+                return None
+            job = self._job(search)
+            if results and search.status == JOB_DONE:
+                job["results"] = self._results(session, search_id)
+            return job
+
+    @staticmethod
+    def _job(search: IASearch) -> dict:
+        return {
+            "id": search.id,
+            "query": search.query,
+            "status": search.status,
+            "stage": search.stage,
+            "progress": search.progress,
+            "error": search.error,
+            "created_at": search.created_at.isoformat() if search.created_at else None,
+            "started_at": search.started_at.isoformat() if search.started_at else None,
+            "finished_at": search.finished_at.isoformat() if search.finished_at else None,
+        }
+
+    @staticmethod
+    def _results(session: Session, search_id: int) -> dict:
+        def ranked(model) -> list[str]:
+            rows = session.exec(select(model).where(model.search_id == search_id).order_by(model.rank)).all()
+            return [row.identifier for row in rows]
+
+        pdfs: dict[str, list[str]] = {}
+        for pdf in session.exec(select(IAPdfToDownload).where(IAPdfToDownload.search_id == search_id)).all():
+            pdfs.setdefault(pdf.identifier, []).append(pdf.file_name)
+        downloads = session.exec(select(IADownload).where(IADownload.search_id == search_id)).all()
+        return {
+            "results": ranked(IASearchResult),
+            "filtered_results": ranked(IAFilteredResult),
+            "entries_to_consider": ranked(IAEntryToConsider),
+            "pdfs_to_download": pdfs,
+            "downloads": [
+                {"identifier": d.identifier, "file_name": d.file_name, "target_path": d.target_path, "status": d.status}
+                for d in downloads
+            ],
+        }
+
+    def save_result(self, search_id: int, state: dict) -> None:
+        """Writes the final state of the graph and marks the job done; a job written before is replaced."""
+        metadata = state.get("metadata") or {}
+        consider = list(state.get("entries_to_consider") or [])
+        pdfs = state.get("pdfs_to_download") or {}
+        downloaded = state.get("downloaded") or {}
+        now = datetime.utcnow()
+
+        with Session(self.engine) as session:
+            search = session.get(IASearch, search_id)
+            if search is None:
+                return
+            for model in (IASearchResult, IAFilteredResult, IAEntryToConsider, IAPdfToDownload, IADownload):
+                session.exec(delete(model).where(model.search_id == search_id))
+
+            # the items referenced by the entries and PDFs
+            for identifier in dict.fromkeys([*consider, *pdfs]):
+                self._save_item(session, identifier, metadata.get(identifier) or {}, pdfs.get(identifier) or [])
+            session.flush()
+
+            session.add_all(
+                IASearchResult(search_id=search_id, rank=rank, identifier=identifier)
+                for rank, identifier in enumerate(state.get("results") or [])
+            )
+            session.add_all(
+                IAFilteredResult(search_id=search_id, rank=rank, identifier=identifier)
+                for rank, identifier in enumerate(state.get("filtered_results") or [])
+            )
+            session.add_all(
+                IAEntryToConsider(search_id=search_id, rank=rank, identifier=identifier)
+                for rank, identifier in enumerate(consider)
+            )
+            session.add_all(
+                IAPdfToDownload(search_id=search_id, identifier=identifier, file_name=file_name)
+                for identifier, file_names in pdfs.items()
+                for file_name in dict.fromkeys(file_names)
+            )
+            session.add_all(
+                IADownload(
+                    search_id=search_id,
+                    identifier=identifier,
+                    file_name=path.replace("\\", "/").rsplit("/", 1)[-1],
+                    target_path=path,
+                    status="ok",
+                    finished_at=now,
+                )
+                for identifier, paths in downloaded.items()
+                for path in paths
+            )
+
+            errors = [*(state.get("error") or []), *(state.get("item_errors") or [])]
+            search.cached_results = state.get("cached_results")
+            search.cached_filtered = state.get("cached_filtered_results")
+            search.cached_metadata = state.get("cached_metadata")
+            search.error = "\n".join(errors) or None
+            search.status = JOB_DONE
+            search.finished_at = now
+            session.add(search)
+            session.commit()
+
+    def _files(self, entry: dict) -> list:
+        if "files" in entry or self.blob_store is None:
+            return files_table(entry.get("files"))
+        return files_table(self.blob_store.load(entry, "files"))
+
+    def _save_item(self, session: Session, identifier: str, entry: dict, file_names: list[str]) -> None:
+        values = entry.get("metadata") or {}
+        item = session.get(IAItem, identifier) or IAItem(identifier=identifier)
+        for key in _ITEM_FIELDS:
+            if key in values:
+                setattr(item, key, _text(values[key]))
+        item.updated_at = datetime.utcnow()
+        session.add(item)
+
+        for collection in _values(values.get("collection")):
+            session.merge(IAItemCollection(identifier=identifier, collection=collection))
+        for subject in _values(values.get("subject")):
+            session.merge(IAItemSubject(identifier=identifier, subject=subject))
+
+        # the chosen files, with their details when the file table is available
+        files = {file.name: file for file in self._files(entry)}
+        for name in dict.fromkeys(file_names):
+            row = session.exec(
+                select(IAItemFile).where(IAItemFile.identifier == identifier).where(IAItemFile.name == name)
+            ).first() or IAItemFile(identifier=identifier, name=name)
+            file = files.get(name)
+            if file is not None:
+                row.format = file.format or None
+                row.source = file.source or None
+                row.size_bytes = file.size
+                row.md5 = file.md5 or None
+                row.sha1 = file.sha1 or None
+            session.add(row)
@@ -1,8 +1,11 @@
+import asyncio
 import json
 import logging
 from pathlib import Path
 from typing import Dict, Optional, Any, List
 
+import anyio
+import httpx
 import internetarchive
 from fastapi import HTTPException
 from pydantic import (
@@ -12,6 +15,8 @@ from pydantic import (
     model_validator,
 )
 
+from .internet_archive_records import IAItem
+
 #TODO: refactor this classes, multiple code smells
 
 class InternetArchiveSearchResults(dict):
@@ -46,9 +51,25 @@ class InternetArchiveSearchResults(dict):
             self["items"] = []
         self["items"].append(item.get("identifier"))
 
+IA_BASE_URL = "https://archive.org"
+
+
+def item_dir(target_dir: Path, identifier: str) -> Path:
+    """
+    The download directory of an item, `target_dir/<identifier>`: two items with a file
+    of the same name (e.g. "manual.pdf") do not overwrite or skip each other's file.
+    """
+    if not identifier or identifier in (".", "..") or "/" in identifier or "\\" in identifier:
+        raise ValueError(f"Invalid identifier {identifier!r}")
+    return target_dir / identifier
+
+
 class InternetArchiveSearchWrapper(BaseModel):
     """
     Wrapper Internet Archive search Python Library.
+
+    The `a*` methods talk to the public IA HTTP API with httpx instead, so graph nodes
+    running on the event loop do not block a worker thread per request.
     """
 
     def __init__(self, **data):
@@ -58,9 +79,13 @@ class InternetArchiveSearchWrapper(BaseModel):
 
     _logger: logging.Logger = PrivateAttr()
     _result: InternetArchiveSearchResults = PrivateAttr()
+    _async_client: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+    _async_client_loop: Optional[asyncio.AbstractEventLoop] = PrivateAttr(default=None)
     params: dict = Field()
     query_suffix: Optional[str] = ""
     k: int = 100
+    base_url: str = IA_BASE_URL
+    timeout: float = 30.0
 
     @model_validator(mode="before")
     @classmethod
@@ -89,13 +114,7 @@ class InternetArchiveSearchWrapper(BaseModel):
         item = internetarchive.get_item(params["q"])
         files = internetarchive.get_files(params["q"])
 
-        res = dict()
-        res['metadata'] = item.metadata
-        res['files'] = []
-        for file in files:
-            res['files'].append(file.metadata)
-
-        return res
+        return IAItem.from_api(item.metadata, (file.metadata for file in files)).to_dict()
 
 
     @staticmethod
@@ -105,12 +124,15 @@ class InternetArchiveSearchWrapper(BaseModel):
             target_dir: str
     ) -> dict:
         item = internetarchive.get_item(identifier)
+        destdir = str(item_dir(Path(target_dir), identifier))
         success = True
         for file in files:
-            success &= internetarchive.File(item, file).download(
+            # None when the file exists already, False when it failed
+            if internetarchive.File(item, file).download(
                 ignore_existing=True,
-                destdir=target_dir,
-            )
+                destdir=destdir,
+            ) is False:
+                success = False
 
 
         return {"success": success}
@@ -153,7 +175,7 @@ class InternetArchiveSearchWrapper(BaseModel):
             params["q"] += " " + self.query_suffix
 
         res = self._internetarchive_detail_infos(params)
-        self._logger.info(f"Item Metadata Results: {res}")
+        self._logger.info(f"Item Metadata Results: {params['q']} with {len(res['files']['names'])} files")
 
         return res
 
@@ -169,6 +191,116 @@ class InternetArchiveSearchWrapper(BaseModel):
             "target_dir": str(target_dir.resolve()),
         }
         result = self._internetarchive_download(**prams)
+        if not result["success"]:
+            raise IOError(f"Download of {identifier} {files} failed")
+
+    def _client(self) -> httpx.AsyncClient:
+        # The connection pool belongs to the event loop it was created on
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._release_client()
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                follow_redirects=True,
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    def _release_client(self) -> None:
+        """Closes the client of another event loop on its loop, a closed loop took its connections along."""
+        client, loop = self._async_client, self._async_client_loop
+        self._async_client = self._async_client_loop = None
+        if client is not None and loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def aclose(self) -> None:
+        """Closes the async client, e.g. on shutdown."""
+        if self._async_client is not None and self._async_client_loop is asyncio.get_running_loop():
+            client, self._async_client, self._async_client_loop = self._async_client, None, None
+            await client.aclose()
+        else:
+            self._release_client()
+
+    def _query(self, query: str, **kwargs: Any) -> dict:
+        params = {**self.params, "q": query, **kwargs}
+        if self.query_suffix and len(self.query_suffix) > 0:
+            params["q"] += " " + self.query_suffix
+        return params
 
+    async def asearch(
+            self,
+            query: str,
+            **kwargs: Any,
+    ) -> str:
+        """
+        Async variant of `search`, returns the first `k` identifiers.
+        """
+        params = {**self._query(query, **kwargs), "k": self.k}
+        response = await self._client().get(
+            "/advancedsearch.php",
+            params={"q": params["q"], "fl[]": "identifier", "rows": params["k"], "output": "json"},
+        )
+        response.raise_for_status()
 
+        res = InternetArchiveSearchResults(params)
+        for doc in response.json().get("response", {}).get("docs", []):
+            res.add_item(doc)
 
+        self._result = res
+        return str(res)
+
+    async def aitem_metadata(
+            self,
+            query: str,
+            **kwargs: Any,
+    ) -> dict:
+        """
+        Async variant of `item_metadata`, same result shape (metadata and file table).
+        """
+        params = self._query(query, **kwargs)
+        response = await self._client().get(f"/metadata/{params['q']}")
+        response.raise_for_status()
+        item = response.json()
+        if not item:
+            raise ValueError(f"Item {params['q']} not found")
+
+        res = IAItem.from_api(item.get("metadata", {}), item.get("files", [])).to_dict()
+        self._logger.info(f"Item Metadata Results: {params['q']} with {len(res['files']['names'])} files")
+
+        return res
+
+    async def adownload(
+            self,
+            identifier: str,
+            files: List[str],
+            target_dir: Path
+    ) -> dict:
+        """
+        Async variant of `download`: streams the files into the item directory below
+        `target_dir` (see item_dir), existing files are kept.
+
+        Raises httpx.HTTPStatusError on a non-2xx answer, a partly written file is removed.
+        """
+        base_dir = item_dir(target_dir.resolve(), identifier)
+        for file in files:
+            file_path = (base_dir / file).resolve()
+            if not file_path.is_relative_to(base_dir):
+                raise ValueError(f"Download path {file_path} is outside target directory {base_dir}")
+            if await anyio.Path(file_path).exists():
+                continue
+            await anyio.Path(file_path.parent).mkdir(parents=True, exist_ok=True)
+
+            partial_path = file_path.with_name(file_path.name + ".part")
+            try:
+                async with self._client().stream("GET", f"/download/{identifier}/{file}") as response:
+                    response.raise_for_status()
+                    async with await anyio.open_file(partial_path, "wb") as fp:
+                        async for chunk in response.aiter_bytes():
+                            await fp.write(chunk)
+            except BaseException:
+                await anyio.Path(partial_path).unlink(missing_ok=True)
+                raise
+            await anyio.Path(partial_path).rename(file_path)
+
+        return {"success": True}
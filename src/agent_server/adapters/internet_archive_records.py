@@ -0,0 +1,184 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+
+# Marks the columnar file table in the JSON of the graph state, the cache and the blob store
+FILES_SCHEMA: str = "ia-files/1"
+
+_MD5_BYTES = 16
+_SHA1_BYTES = 20
+_NO_SIZE = -1
+
+
+@dataclass(slots=True, frozen=True)
+class IAFile:
+    """One file of an Internet Archive item, the fields the graph uses."""
+
+    name: str
+    format: str = ""
+    source: str = ""
+    size: Optional[int] = None
+    md5: str = ""
+    sha1: str = ""
+    old_version: bool = False
+
+    @property
+    def is_pdf(self) -> bool:
+        return "pdf" in self.format.lower() or self.name.lower().endswith(".pdf")
+
+    def to_dict(self, fields: Iterable[str] = ("name", "format", "source", "size", "md5", "sha1")) -> dict:
+        """The given fields which are set, e.g. for a prompt."""
+        values = {name: getattr(self, name) for name in fields}
+        return {name: value for name, value in values.items() if value not in (None, "")}
+
+
+def _size(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return _NO_SIZE
+
+
+def _digest(value: Any, length: int) -> bytes:
+    try:
+        digest = bytes.fromhex(str(value or ""))
+    except ValueError:
+        digest = b""
+    return digest if len(digest) == length else bytes(length)
+
+
+class IAFileTable:
+    """
+    The file list of an item as columns instead of one dict per file.
+
+    Formats and sources repeat a lot within an item, they are stored once in a
+    vocabulary and referenced by index; sizes are a 64 bit array and the hashes are
+    binary. Iterating yields IAFile rows, built on demand.
+
+    `to_dict` / `from_dict` are the JSON form (see FILES_SCHEMA), `from_files` reads
+    the file dicts of the IA API.
+    """
+
+    __slots__ = ("names", "vocabulary", "formats", "sources", "sizes", "md5", "sha1", "old_versions")
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.vocabulary: list[str] = [""]
+        self.formats = array("H")
+        self.sources = array("H")
+        self.sizes = array("q")
+        self.md5 = bytearray()
+        self.sha1 = bytearray()
+        self.old_versions: set[int] = set()
+
+    def _code(self, value: Any, codes: dict[str, int]) -> int:
+        value = str(value or "")
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.vocabulary)
+            self.vocabulary.append(value)
+        return code
+
+    @classmethod
+    def from_files(cls, files: Iterable[dict]) -> "IAFileTable":
+        table = cls()
+        codes = {"": 0}
+        for file in files or []:
+            if file.get("old_version") in (True, "true"):
+                table.old_versions.add(len(table.names))
+            table.names.append(str(file.get("name") or ""))
+            table.formats.append(table._code(file.get("format"), codes))
+            table.sources.append(table._code(file.get("source"), codes))
+            table.sizes.append(_size(file.get("size")))
+            table.md5 += _digest(file.get("md5"), _MD5_BYTES)
+            table.sha1 += _digest(file.get("sha1"), _SHA1_BYTES)
+        return table
+
+    @classmethod
+    def from_dict(cls, value: dict) -> "IAFileTable":
+        if value.get("schema") != FILES_SCHEMA:
+            raise ValueError(f"Unknown file table schema {value.get('schema')}")
+        table = cls()
+        table.names = list(value["names"])
+        table.vocabulary = list(value["vocabulary"])
+        table.formats = array("H", value["formats"])
+        table.sources = array("H", value["sources"])
+        table.sizes = array("q", value["sizes"])
+        table.md5 = bytearray.fromhex(value["md5"])
+        table.sha1 = bytearray.fromhex(value["sha1"])
+        table.old_versions = set(value.get("old_versions") or ())
+        return table
+
+    def to_dict(self) -> dict:
+        return {
+            "schema": FILES_SCHEMA,
+            "names": self.names,
+            "vocabulary": self.vocabulary,
+            "formats": self.formats.tolist(),
+            "sources": self.sources.tolist(),
+            "sizes": self.sizes.tolist(),
+            "md5": self.md5.hex(),
+            "sha1": self.sha1.hex(),
+            "old_versions": sorted(self.old_versions),
+        }
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, index: int) -> IAFile:
+        size = self.sizes[index]
+        md5 = bytes(self.md5[index * _MD5_BYTES:(index + 1) * _MD5_BYTES])
+        sha1 = bytes(self.sha1[index * _SHA1_BYTES:(index + 1) * _SHA1_BYTES])
+        return IAFile(
+            name=self.names[index],
+            format=self.vocabulary[self.formats[index]],
+            source=self.vocabulary[self.sources[index]],
+            size=None if size == _NO_SIZE else size,
+            md5=md5.hex() if any(md5) else "",
+            sha1=sha1.hex() if any(sha1) else "",
+            old_version=index in self.old_versions,
+        )
+
+    def __iter__(self) -> Iterator[IAFile]:
+        for index in range(len(self.names)):
+            yield self[index]
+
+
+def files_table(files: Any) -> IAFileTable:
+    """Reads a file list in any of its forms: table, its JSON form or the file dicts of the IA API."""
+    if isinstance(files, IAFileTable):
+        return files
+    if isinstance(files, dict):
+        return IAFileTable.from_dict(files)
+    return IAFileTable.from_files(files or [])
+
+
+@dataclass(slots=True)
+class IAItem:
+    """An Internet Archive item: its identifier, the item metadata and the file table."""
+
+    identifier: str
+    metadata: dict = field(default_factory=dict)
+    files: IAFileTable = field(default_factory=IAFileTable)
+
+    @classmethod
+    def from_api(cls, metadata: Optional[dict], files: Iterable[dict]) -> "IAItem":
+        metadata = dict(metadata or {})
+        return cls(
+            identifier=str(metadata.get("identifier") or ""),
+            metadata=metadata,
+            files=IAFileTable.from_files(files),
+        )
+
+    @classmethod
+    def from_dict(cls, value: dict) -> "IAItem":
+        metadata = dict(value.get("metadata") or {})
+        return cls(
+            identifier=str(metadata.get("identifier") or ""),
+            metadata=metadata,
+            files=files_table(value.get("files")),
+        )
+
+    def to_dict(self) -> dict:
+        """The form of a metadata entry in the graph state: {"metadata": ..., "files": <table>}."""
+        return {"metadata": self.metadata, "files": self.files.to_dict()}
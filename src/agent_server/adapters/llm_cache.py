@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import redis
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from sqlalchemy import Engine, func
+from sqlmodel import Session, create_engine, delete, select
+
+from ..metrics.registry import MetricsRegistry
+from ..models.llm_cache import LLMCacheEntry
+
+
+def _loads(value: str) -> RETURN_VAL_TYPE:
+    # cached values are generations with messages only
+    return loads(value, allowed_objects="core")
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class _LLMCacheBase(BaseCache):
+    """
+    Common bookkeeping for the persistent LLM caches.
+
+    The cache key is sha256(llm_string) + sha256(prompt). The llm_string carries the
+    model name, temperature and the bound output schema (see ManagedChatOllama), the
+    prompt is the rendered message list, so the same Finder/FileFinder prompt for the
+    same model is answered from the cache instead of the GPU.
+    """
+
+    metrics_prefix: str = "llm_cache"
+
+    def __init__(
+            self,
+            ttl: int | None = None,
+            max_entries: int | None = None,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+    ):
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.max_entries = max_entries if max_entries and max_entries > 0 else None
+        self.metrics = metrics or MetricsRegistry()
+        self.logger = logger or logging.getLogger(__name__)
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> tuple[str, str, str]:
+        llm_hash = _sha256(llm_string)
+        prompt_hash = _sha256(prompt)
+        return _sha256(llm_hash + prompt_hash), llm_hash, prompt_hash
+
+    def _record(self, event: str, value: float = 1.0):
+        self.metrics.increment(f"{self.metrics_prefix}.{event}", value)
+        hits = self.metrics.counter(f"{self.metrics_prefix}.hits")
+        misses = self.metrics.counter(f"{self.metrics_prefix}.misses")
+        if hits + misses:
+            self.metrics.set_gauge(f"{self.metrics_prefix}.hit_rate", hits / (hits + misses))
+
+    def stats(self) -> dict:
+        hits = self.metrics.counter(f"{self.metrics_prefix}.hits")
+        misses = self.metrics.counter(f"{self.metrics_prefix}.misses")
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": self.metrics.counter(f"{self.metrics_prefix}.evictions"),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+class SQLModelLLMCache(_LLMCacheBase):
+    """
+    LLM cache stored in the `llmcacheentry` table.
+
+    Works on SQLite (local development) and on Postgres (production, reusing the
+    sqlmodel engine). Expired entries are ignored on lookup and removed lazily, the
+    least recently used entries are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, engine: Engine, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.engine = engine
+        LLMCacheEntry.__table__.create(self.engine, checkfirst=True)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key, _, _ = self.make_key(prompt, llm_string)
+        now = datetime.utcnow()
+        try:
+            with Session(self.engine) as session:
+                entry = session.get(LLMCacheEntry, key)
+                if entry is None:
+                    self._record("misses")
+                    return None
+                if entry.expires_at is not None and entry.expires_at <= now:
+                    session.delete(entry)
+                    session.commit()
+                    self._record("misses")
+                    self._record("expired")
+                    return None
+
+                entry.hits += 1
+                entry.last_access_at = now
+                return_val = entry.return_val
+                session.add(entry)
+                session.commit()
+
+            self._record("hits")
+            return _loads(return_val)
+        except Exception as e:
+            self.logger.error(f"LLM cache lookup failed: {e}")
+            self._record("misses")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key, llm_hash, prompt_hash = self.make_key(prompt, llm_string)
+        now = datetime.utcnow()
+        try:
+            with Session(self.engine) as session:
+                entry = session.get(LLMCacheEntry, key) or LLMCacheEntry(
+                    key=key,
+                    llm_hash=llm_hash,
+                    prompt_hash=prompt_hash,
+                    return_val="",
+                )
+                entry.return_val = dumps(return_val)
+                entry.created_at = now
+                entry.last_access_at = now
+                entry.expires_at = now + timedelta(seconds=self.ttl) if self.ttl else None
+                session.add(entry)
+                session.commit()
+                self._evict(session)
+            self._record("writes")
+        except Exception as e:
+            self.logger.error(f"LLM cache update failed: {e}")
+
+    def _evict(self, session: Session):
+        now = datetime.utcnow()
+        expired = session.exec(
+            delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= now)
+        )
+        evicted = expired.rowcount or 0
+
+        if self.max_entries:
+            count = session.exec(select(func.count()).select_from(LLMCacheEntry)).one()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                oldest = session.exec(
+                    select(LLMCacheEntry.key)
+                    .order_by(LLMCacheEntry.last_access_at)
+                    .limit(overflow)
+                ).all()
+                session.exec(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest)))
+                evicted += len(oldest)
+
+        session.commit()
+        if evicted:
+            self._record("evictions", evicted)
+
+    def clear(self, **kwargs: Any) -> None:
+        with Session(self.engine) as session:
+            session.exec(delete(LLMCacheEntry))
+            session.commit()
+
+
+class RedisLLMCache(_LLMCacheBase):
+    """
+    LLM cache stored in Redis.
+
+    Entries are plain string keys with a Redis TTL, a sorted set ordered by last access
+    time is used for size-bounded (LRU) eviction.
+    """
+
+    def __init__(self, url: str, namespace: str = "llm_cache", **kwargs: Any):
+        super().__init__(**kwargs)
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+        self.index_key = f"{namespace}:index"
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key, _, _ = self.make_key(prompt, llm_string)
+        try:
+            value = self.client.get(self._entry_key(key))
+            if value is None:
+                self.client.zrem(self.index_key, key)
+                self._record("misses")
+                return None
+            self.client.zadd(self.index_key, {key: time.time()})
+            self._record("hits")
+            return _loads(value.decode("utf-8"))
+        except Exception as e:
+            self.logger.error(f"LLM cache lookup failed: {e}")
+            self._record("misses")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key, _, _ = self.make_key(prompt, llm_string)
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(self._entry_key(key), dumps(return_val), ex=self.ttl)
+            pipe.zadd(self.index_key, {key: time.time()})
+            pipe.execute()
+            self._record("writes")
+
+            if self.max_entries:
+                overflow = self.client.zcard(self.index_key) - self.max_entries
+                if overflow > 0:
+                    oldest = self.client.zpopmin(self.index_key, overflow)
+                    if oldest:
+                        self.client.delete(*[self._entry_key(k.decode("utf-8")) for k, _ in oldest])
+                        self._record("evictions", len(oldest))
+        except Exception as e:
+            self.logger.error(f"LLM cache update failed: {e}")
+
+    def clear(self, **kwargs: Any) -> None:
+        keys = [self._entry_key(k.decode("utf-8")) for k in self.client.zrange(self.index_key, 0, -1)]
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(self.index_key)
+
+
+class LLMCacheFactory:
+    """
+    Creates the LLM cache for the configured backend.
+
+    Backends:
+    - "sqlite": SQLModelLLMCache on its own SQLite file (`url`)
+    - "postgres": SQLModelLLMCache on the shared Postgres engine
+    - "redis": RedisLLMCache (`url`)
+    - "none": caching disabled
+    """
+
+    @staticmethod
+    def create(
+            backend: str,
+            url: str | None = None,
+            engine: Engine | None = None,
+            ttl: int | None = None,
+            max_entries: int | None = None,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+    ) -> BaseCache | None:
+        backend = (backend or "none").lower()
+        options = dict(ttl=ttl, max_entries=max_entries, metrics=metrics, logger=logger)
+
+        if backend == "none":
+            return None
+        if backend == "sqlite":
+            return SQLModelLLMCache(engine=create_engine(url or "sqlite:///llm_cache.sqlite"), **options)
+        if backend == "postgres":
+            if engine is None:
+                raise AttributeError("The postgres LLM cache needs an engine")
+            return SQLModelLLMCache(engine=engine, **options)
+        if backend == "redis":
+            if not url:
+                raise AttributeError("The redis LLM cache needs an url")
+            return RedisLLMCache(url=url, **options)
+
+        raise AttributeError(f"Unknown LLM cache backend {backend}")
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Final, Iterator
+
+from ..metrics.registry import MetricsRegistry
+
+PRIORITY_INTERACTIVE: Final[str] = "interactive"
+PRIORITY_GRAPH: Final[str] = "graph"
+PRIORITY_BATCH: Final[str] = "batch"
+
+# RunnableConfig metadata key, inherited by all child runs of a graph/agent
+PRIORITY_METADATA_KEY: Final[str] = "llm_priority"
+
+# Share of the free slots a class gets while all classes are waiting
+DEFAULT_WEIGHTS: Final[dict[str, int]] = {
+    PRIORITY_INTERACTIVE: 6,
+    PRIORITY_GRAPH: 3,
+    PRIORITY_BATCH: 1,
+}
+
+_current_priority: ContextVar[str] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+@contextmanager
+def llm_priority(priority: str) -> Iterator[None]:
+    """Runs the block (and the tasks/threads started with its context) in the given priority class."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("priority", "enqueued_at", "event", "loop", "future")
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.enqueued_at = time.perf_counter()
+        self.event: threading.Event | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.future: asyncio.Future | None = None
+
+    def grant(self):
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMGateway:
+    """
+    Schedules all LLM calls going to the shared Ollama backend.
+
+    - at most `max_concurrency` requests run at once (match OLLAMA_NUM_PARALLEL)
+    - waiting requests are queued per priority class (interactive, graph, batch)
+    - free slots are handed out by weighted round robin over the waiting classes, so
+      interactive requests go first but graph and batch work is never starved
+    - queue wait time, queue depth and active requests are recorded as metrics
+
+    Works for threads (sync `slot`) and event loops (async `aslot`) at the same time.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 1,
+            weights: dict[str, int] | None = None,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.metrics = metrics or MetricsRegistry()
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queues: dict[str, deque[_Waiter]] = {priority: deque() for priority in self.weights}
+        self._credits: dict[str, int] = dict(self.weights)
+
+    def _priority(self, priority: str | None) -> str:
+        priority = priority or current_priority()
+        return priority if priority in self._queues else PRIORITY_INTERACTIVE
+
+    def _next_waiter(self) -> _Waiter | None:
+        waiting = [priority for priority in self.weights if self._queues[priority]]
+        if not waiting:
+            return None
+        if all(self._credits[priority] <= 0 for priority in waiting):
+            self._credits = dict(self.weights)
+        for priority in waiting:
+            if self._credits[priority] > 0:
+                self._credits[priority] -= 1
+                return self._queues[priority].popleft()
+        return None
+
+    def _dispatch(self):
+        # called with the lock held
+        while self._active < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._active += 1
+            self._record_granted(waiter)
+            waiter.grant()
+        self._record_gauges()
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """Returns True if the slot was granted right away."""
+        with self._lock:
+            if self._active < self.max_concurrency and not any(self._queues.values()):
+                self._active += 1
+                self._record_granted(waiter)
+                self._record_gauges()
+                return True
+            self._queues[waiter.priority].append(waiter)
+            self._record_gauges()
+            return False
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """Removes a waiter which gave up, returns False if it already got a slot."""
+        with self._lock:
+            try:
+                self._queues[waiter.priority].remove(waiter)
+            except ValueError:
+                return False
+            self._record_gauges()
+            return True
+
+    def _record_granted(self, waiter: _Waiter):
+        wait = time.perf_counter() - waiter.enqueued_at
+        self.metrics.observe(f"llm_gateway.wait_seconds.{waiter.priority}", wait)
+        self.metrics.increment(f"llm_gateway.requests.{waiter.priority}")
+
+    def _record_gauges(self):
+        self.metrics.set_gauge("llm_gateway.active", self._active)
+        for priority, queue in self._queues.items():
+            self.metrics.set_gauge(f"llm_gateway.queue_depth.{priority}", len(queue))
+
+    @contextmanager
+    def slot(self, priority: str | None = None) -> Iterator[None]:
+        waiter = _Waiter(self._priority(priority))
+        waiter.event = threading.Event()
+        if not self._enqueue(waiter):
+            waiter.event.wait()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: str | None = None) -> AsyncIterator[None]:
+        waiter = _Waiter(self._priority(priority))
+        waiter.loop = asyncio.get_running_loop()
+        waiter.future = waiter.loop.create_future()
+        if not self._enqueue(waiter):
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if not self._cancel(waiter):
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+            }
@@ -0,0 +1,133 @@
+import json
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_ollama import ChatOllama
+from pydantic import Field
+
+from .llm_gateway import LLMGateway, PRIORITY_METADATA_KEY
+from ..metrics.llm import LLMRoleMetricsHandler
+from ..metrics.registry import MetricsRegistry
+
+# Options which change the generated answer and therefore have to be part of the cache key.
+_CACHE_KEY_FIELDS = (
+    "model",
+    "reasoning",
+    "temperature",
+    "seed",
+    "num_ctx",
+    "num_predict",
+    "top_k",
+    "top_p",
+    "tfs_z",
+    "mirostat",
+    "mirostat_eta",
+    "mirostat_tau",
+    "repeat_last_n",
+    "repeat_penalty",
+    "format",
+)
+
+
+def keep_alive(value: str) -> int | str:
+    """
+    OLLAMA_KEEP_ALIVE as sent to Ollama: a duration string ("30m", "1h") as is, a number
+    of seconds ("1800", "-1" keeps the models forever) as int, Ollama rejects a duration
+    string without unit.
+    """
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+class ManagedChatOllama(ChatOllama):
+    """
+    ChatOllama as used by the agent server.
+
+    ChatOllama is not lc-serializable, so its default llm_string only contains the type
+    and the stop words. Two different models would share cache entries. This class adds
+    the generation options (model, temperature, ...) to the llm_string. The output schema
+    bound via `with_structured_output`/`bind(format=...)` is already part of the kwargs.
+
+    With a `gateway`, every request to Ollama (cache hits excluded) waits for a slot of
+    the LLMGateway. The priority class is taken from the run metadata (`llm_priority`)
+    or from the current `llm_priority` context.
+    """
+
+    gateway: Optional[LLMGateway] = Field(default=None, exclude=True)
+
+    @classmethod
+    def for_role(
+            cls,
+            role: str,
+            model: Optional[str],
+            default_model: str,
+            metrics: Optional[MetricsRegistry] = None,
+            **kwargs: Any,
+    ) -> "ManagedChatOllama":
+        """Model of one role (agent, filter, ...), an empty `model` falls back to `default_model`."""
+        callbacks = [LLMRoleMetricsHandler(role=role, metrics=metrics)] if metrics is not None else None
+        return cls(model=model or default_model, callbacks=callbacks, **kwargs)
+
+    def _get_llm_string(self, stop: Optional[list[str]] = None, **kwargs: Any) -> str:
+        llm_string = super()._get_llm_string(stop=stop, **kwargs)
+        options = {field: getattr(self, field, None) for field in _CACHE_KEY_FIELDS}
+        return f"{llm_string}|{json.dumps(options, sort_keys=True, default=str)}"
+
+    @staticmethod
+    def _priority(run_manager: Any) -> Optional[str]:
+        metadata = getattr(run_manager, "metadata", None) or {}
+        return metadata.get(PRIORITY_METADATA_KEY)
+
+    def _generate(
+            self,
+            messages: list[BaseMessage],
+            stop: Optional[list[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        if self.gateway is None:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        with self.gateway.slot(self._priority(run_manager)):
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+            self,
+            messages: list[BaseMessage],
+            stop: Optional[list[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        if self.gateway is None:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        async with self.gateway.aslot(self._priority(run_manager)):
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(
+            self,
+            messages: list[BaseMessage],
+            stop: Optional[list[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if self.gateway is None:
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        with self.gateway.slot(self._priority(run_manager)):
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(
+            self,
+            messages: list[BaseMessage],
+            stop: Optional[list[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.gateway is None:
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        async with self.gateway.aslot(self._priority(run_manager)):
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
@@ -0,0 +1,211 @@
+import asyncio
+import copy
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import redis
+import redis.asyncio
+
+from ..metrics.registry import MetricsRegistry
+
+T = TypeVar("T")
+
+# Deletes the lock only if it is still ours (it may have expired and been taken over)
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller of a key executes the function, callers arriving while it runs
+    wait for it and get (a copy of) its result or its exception. Works for threads
+    (`do`) and for coroutines on an event loop (`ado`); a cancelled waiter does not
+    cancel the shared execution.
+    """
+
+    def __init__(self, metrics: MetricsRegistry | None = None, logger: logging.Logger | None = None):
+        self.metrics = metrics or MetricsRegistry()
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self._tasks: dict[tuple[int, str], asyncio.Task] = {}
+
+    def _coalesced(self, key: str):
+        self.metrics.increment("single_flight.coalesced")
+        self.logger.info(f"SingleFlight: joined in-flight execution {key}")
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._coalesced(key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.value)
+
+        self.metrics.increment("single_flight.executions")
+        try:
+            call.value = self._execute(key, fn)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task_key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(task_key)
+        leader = task is None
+        if leader:
+            self.metrics.increment("single_flight.executions")
+            task = asyncio.ensure_future(self._aexecute(key, fn))
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+        else:
+            self._coalesced(key)
+
+        value = await asyncio.shield(task)
+        return value if leader else copy.deepcopy(value)
+
+    def _execute(self, key: str, fn: Callable[[], T]) -> T:
+        return fn()
+
+    async def _aexecute(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        return await fn()
+
+
+class RedisSingleFlight(SingleFlight):
+    """
+    SingleFlight across processes (several uvicorn workers or replicas).
+
+    Within a process calls are coalesced as in SingleFlight. Across processes the
+    leader holds a Redis lock (SET NX with `lock_timeout`) while it executes and
+    publishes the JSON result for `result_ttl` seconds. Followers wait until the lock
+    is released and take the published result; if the leader failed without a
+    result, one of them takes over.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            namespace: str = "single_flight",
+            lock_timeout: int = 600,
+            result_ttl: int = 60,
+            poll_interval: float = 0.25,
+            **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.url = url
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.redis = redis.Redis.from_url(url)
+        self._async_redis: dict[int, redis.asyncio.Redis] = {}
+
+    def _keys(self, key: str) -> tuple[str, str]:
+        return f"{self.namespace}:lock:{key}", f"{self.namespace}:result:{key}"
+
+    def _aredis(self) -> redis.asyncio.Redis:
+        # the async connection pool belongs to its event loop
+        loop_id = id(asyncio.get_running_loop())
+        if loop_id not in self._async_redis:
+            self._async_redis[loop_id] = redis.asyncio.Redis.from_url(self.url)
+        return self._async_redis[loop_id]
+
+    def _execute(self, key: str, fn: Callable[[], T]) -> T:
+        lock_key, result_key = self._keys(key)
+        while True:
+            token = uuid.uuid4().hex
+            if self.redis.set(lock_key, token, nx=True, px=self.lock_timeout * 1000):
+                try:
+                    value = fn()
+                    self.redis.set(result_key, json.dumps(value, default=str), ex=self.result_ttl)
+                    return value
+                finally:
+                    self.redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+
+            self.metrics.increment("single_flight.coalesced_remote")
+            while self.redis.exists(lock_key):
+                time.sleep(self.poll_interval)
+            result = self.redis.get(result_key)
+            if result is not None:
+                return json.loads(result)
+
+    async def _aexecute(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        client = self._aredis()
+        lock_key, result_key = self._keys(key)
+        while True:
+            token = uuid.uuid4().hex
+            if await client.set(lock_key, token, nx=True, px=self.lock_timeout * 1000):
+                try:
+                    value = await fn()
+                    await client.set(result_key, json.dumps(value, default=str), ex=self.result_ttl)
+                    return value
+                finally:
+                    await client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+
+            self.metrics.increment("single_flight.coalesced_remote")
+            while await client.exists(lock_key):
+                await asyncio.sleep(self.poll_interval)
+            result = await client.get(result_key)
+            if result is not None:
+                return json.loads(result)
+
+
+class SingleFlightFactory:
+    """
+    Creates the request coalescing for the configured backend.
+
+    Backends:
+    - "local": SingleFlight, coalesces within the process
+    - "redis": RedisSingleFlight (`url`), coalesces across processes
+    - "none": every call executes
+    """
+
+    @staticmethod
+    def create(
+            backend: str,
+            url: str | None = None,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+    ) -> Optional[SingleFlight]:
+        backend = (backend or "none").lower()
+
+        if backend == "none":
+            return None
+        if backend == "local":
+            return SingleFlight(metrics=metrics, logger=logger)
+        if backend == "redis":
+            if not url:
+                raise AttributeError("The redis single flight needs an url")
+            return RedisSingleFlight(url=url, metrics=metrics, logger=logger)
+
+        raise AttributeError(f"Unknown single flight backend {backend}")
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Iterable
+
+import ollama
+
+from ..metrics.registry import MetricsRegistry
+
+
+def parse_hours(hours: str | None) -> tuple[int, int] | None:
+    """Parses "7-22" into (7, 22). Empty means around the clock."""
+    if not hours:
+        return None
+    start, end = (int(part) for part in hours.split("-", 1))
+    if not (0 <= start <= 24 and 0 <= end <= 24):
+        raise AttributeError(f"Invalid warm-up hours {hours}")
+    return start, end
+
+
+class ModelWarmer:
+    """
+    Loads the configured Ollama models before the first request needs them.
+
+    - chat models are loaded with an empty generate request, embedding models with a
+      tiny embed request, both with an explicit `keep_alive`
+    - `run` warms once at startup and then re-warms every `interval` seconds inside the
+      configured business hours, so the models do not get unloaded while people work
+    - `ready` stays False until the first warm-up of all models succeeded
+    - the time spent per model is recorded as `warmup.seconds.<model>`
+
+    The requests go to Ollama directly: they must neither be answered by the LLM cache
+    nor wait in the LLM gateway.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            chat_models: Iterable[str],
+            embedding_models: Iterable[str] = (),
+            keep_alive: int | str | None = None,
+            enabled: bool = True,
+            interval: int = 240,
+            hours: str | None = None,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+            client: ollama.Client | None = None,
+    ):
+        # keep the order, drop duplicates (roles may share a model)
+        self.chat_models = list(dict.fromkeys(m for m in chat_models if m))
+        self.embedding_models = list(dict.fromkeys(m for m in embedding_models if m))
+        self.keep_alive = keep_alive
+        self.enabled = enabled
+        self.interval = interval
+        self.hours = parse_hours(hours)
+        self.metrics = metrics or MetricsRegistry()
+        self.logger = logger or logging.getLogger(__name__)
+        self.client = client or ollama.Client(host=base_url)
+
+        # without warm-up the models load on the first request, nothing to wait for
+        self.ready = not enabled
+        self.last_warmup: datetime | None = None
+        self.last_duration: float | None = None
+        self.last_error: str | None = None
+
+    def in_business_hours(self, now: datetime | None = None) -> bool:
+        if self.hours is None:
+            return True
+        start, end = self.hours
+        hour = (now or datetime.now()).hour
+        if start <= end:
+            return start <= hour < end
+        # e.g. 22-6
+        return hour >= start or hour < end
+
+    def _warm_model(self, model: str, embedding: bool):
+        start = time.perf_counter()
+        if embedding:
+            self.client.embed(model=model, input="warm-up", keep_alive=self.keep_alive)
+        else:
+            self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+        seconds = time.perf_counter() - start
+        self.metrics.observe(f"warmup.seconds.{model}", seconds)
+        self.logger.info(f"ModelWarmer: {model} warm after {seconds:.2f}s")
+
+    def warm(self) -> bool:
+        start = time.perf_counter()
+        errors = []
+        models = [(m, False) for m in self.chat_models] + [(m, True) for m in self.embedding_models]
+        for model, embedding in models:
+            try:
+                self._warm_model(model, embedding)
+            except Exception as e:
+                errors.append(f"{model}: {e}")
+                self.logger.error(f"ModelWarmer: warm-up of {model} failed: {e}")
+
+        self.last_duration = time.perf_counter() - start
+        self.last_warmup = datetime.now()
+        self.last_error = "; ".join(errors) or None
+        self.metrics.observe("warmup.seconds", self.last_duration)
+        if not errors:
+            self.ready = True
+        self.metrics.set_gauge("warmup.ready", float(self.ready))
+        return not errors
+
+    async def run(self):
+        if not self.enabled:
+            return
+        self.logger.info(f"ModelWarmer: warming {self.chat_models + self.embedding_models}")
+        while not await asyncio.to_thread(self.warm):
+            # not ready yet, retry until Ollama is reachable
+            await asyncio.sleep(min(self.interval, 30))
+
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            if self.in_business_hours():
+                await asyncio.to_thread(self.warm)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "enabled": self.enabled,
+            "models": self.chat_models + self.embedding_models,
+            "keep_alive": self.keep_alive,
+            "last_warmup": self.last_warmup.isoformat() if self.last_warmup else None,
+            "last_duration_seconds": self.last_duration,
+            "last_error": self.last_error,
+        }
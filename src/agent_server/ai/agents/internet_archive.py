@@ -1,39 +1,65 @@
 import logging
-from typing import Any
+import threading
+from typing import Any, Callable, TypeVar
 
+from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage
 from langchain_core.messages.base import BaseMessage
 from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt.chat_agent_executor import create_react_agent
 from pydantic import BaseModel
 from sqlalchemy import Engine
+from ..graphs.budget import BudgetLimits
 from ..graphs.internet_archive import InternetArchiveGraphBuilder
+from ..graphs.runner import InternetArchiveGraphRunner
 from ..nodes.internet_archive.Search import SearchNode
-from ..nodes.internet_archive.Finder import FinderNode
-from ..nodes.internet_archive.Metadata import MetadataNode
+from ..nodes.internet_archive.Finder import FinderNode, FinderEarlyStop
+from ..nodes.internet_archive.Metadata import MetadataNode, MetadataPrefetchNode
 from ..nodes.internet_archive.Filter import FilterNode
 from ..nodes.internet_archive.FileFinder import FileFinderNode
 from ..nodes.internet_archive.Downloader import DownloaderNode
 from ..nodes.internet_archive.Database import DatabaseNode
 from ..prompts.internet_archive import FilterPromptFactory, FileFinderPromptFactory, FinderPromptFactory
 from ..prompts.internet_archive import AgentPromptFactory
+from ..rankers.embedding import EmbeddingRanker
 from ..toolkits.internet_archive import InternetArchiveToolkit
-from ..tools.internet_archive import InternetArchiveSearchTool
+from ..tools.digest import InternetArchiveDigest
+from ..tools.internet_archive import InternetArchiveSearchTool, InternetArchiveDetailTool
 from ...adapters.internet_archive import InternetArchiveSearchWrapper
+from ...adapters.blob_store import BlobStore
+from ...adapters.single_flight import SingleFlight
+from ...adapters.llm_gateway import PRIORITY_METADATA_KEY, PRIORITY_GRAPH
+from ...metrics.registry import MetricsRegistry
+
+
+T = TypeVar("T")
 
 
 class InternetArchiveMessage(BaseModel):
     messages: list[BaseMessage]
 
 class AgentFactory:
+    """
+    Builds the Internet Archive agent and its search graph.
+
+    `llms` binds a model per role (agent, filter, finder, file_finder), roles without
+    a binding use `llm`.
+
+    The IA wrapper, the compiled graph (with its node cache), the runner and the digest
+    are built on first use and then shared (`ia`, `graph`, `runner`, `digest`): the
+    agent's tool and the direct graph entry points run on the same warm instances.
+    """
     llm:BaseChatModel
+    llms:dict[str, BaseChatModel]
     logger:logging.Logger
     langfuse_config:RunnableConfig
     engine:Engine
     cache_dir: str | None
     data_dir: str | None
+    embeddings: Embeddings | None
 
     def __init__(
             self,
@@ -42,27 +68,93 @@ class AgentFactory:
             engine: Engine,
             langfuse_config:RunnableConfig,
             k:int=40,
+            llms:dict[str, BaseChatModel]=None,
             cache_dir:str=None,
-            data_dir:str=None
+            data_dir:str=None,
+            embeddings:Embeddings=None,
+            ranker_upper_threshold:float=0.75,
+            ranker_lower_threshold:float=0.45,
+            prefetch_depth:int=0,
+            checkpointer:BaseCheckpointSaver=None,
+            checkpoint_max_age:int=24 * 3600,
+            single_flight:SingleFlight=None,
+            blob_store:BlobStore=None,
+            metrics:MetricsRegistry=None,
+            trace_memory:bool=False,
+            budget_limits:BudgetLimits=None,
+            finder_early_stop:FinderEarlyStop=None,
     ):
+        self.budget_limits = budget_limits
+        self.finder_early_stop = finder_early_stop
+        self.single_flight = single_flight
+        self.blob_store = blob_store
+        self.metrics = metrics
+        self.trace_memory = trace_memory
+        self.checkpointer = checkpointer
+        self.checkpoint_max_age = checkpoint_max_age
+        self.prefetch_depth = prefetch_depth
+        self.embeddings = embeddings
+        self.ranker_upper_threshold = ranker_upper_threshold
+        self.ranker_lower_threshold = ranker_lower_threshold
         self.cache_dir = cache_dir
         self.engine = engine
         self.data_dir = data_dir
         self.llm=llm
+        self.llms=dict(llms or {})
         self.logger=logger
         self.k=k
         self.langfuse_config=langfuse_config
+        self._lock = threading.RLock()
+        self._shared: dict[str, Any] = {}
+
+    def _shared_instance(self, name: str, build: Callable[[], T]) -> T:
+        if name not in self._shared:
+            with self._lock:
+                if name not in self._shared:
+                    self._shared[name] = build()
+        return self._shared[name]
+
+    @property
+    def ia(self) -> InternetArchiveSearchWrapper:
+        return self._shared_instance("ia", lambda: InternetArchiveSearchWrapper(k=self.k, _logger=self.logger))
+
+    @property
+    def graph(self) -> CompiledStateGraph[Any, Any, Any, Any]:
+        return self._shared_instance("graph", self.create_graph)
+
+    @property
+    def runner(self) -> InternetArchiveGraphRunner:
+        return self._shared_instance("runner", self.create_runner)
+
+    @property
+    def digest(self) -> InternetArchiveDigest:
+        return self._shared_instance("digest", self.create_digest)
+
+    async def aclose(self):
+        """Closes the connections of the IA wrapper, if it was built."""
+        if "ia" in self._shared:
+            await self._shared["ia"].aclose()
+
+    def llm_for(self, role: str) -> BaseChatModel:
+        return self.llms.get(role) or self.llm
+
+    def create_digest(self) -> InternetArchiveDigest:
+        # without a configured blob store the details live in memory
+        return InternetArchiveDigest(store=self.blob_store or BlobStore(max_entries=256))
 
     def create(self):
+        digest = self.digest
         agent = create_react_agent(
-            self.llm,
+            self.llm_for("agent"),
             InternetArchiveToolkit(
                 tools=[
                     InternetArchiveSearchTool(
-                        llm=self.llm,
+                        llm=self.llm_for("agent"),
                         logger=self.logger,
-                        graph=self.create_graph()
-                    )
+                        runner=self.runner,
+                        digest=digest,
+                    ),
+                    InternetArchiveDetailTool(digest=digest),
                 ]
             ).get_tools()
             , prompt=AgentPromptFactory().create()
@@ -74,11 +166,18 @@ class AgentFactory:
             agent=agent
         )
 
+    def create_ranker(self) -> EmbeddingRanker | None:
+        if self.embeddings is None:
+            return None
+        return EmbeddingRanker(
+            embeddings=self.embeddings,
+            upper_threshold=self.ranker_upper_threshold,
+            lower_threshold=self.ranker_lower_threshold,
+            logger=self.logger,
+        )
+
     def create_graph(self) -> CompiledStateGraph[Any, Any, Any, Any]:
-        ia = InternetArchiveSearchWrapper(
-                    k=self.k,
-                    _logger=self.logger
-                )
+        ia = self.ia
         return InternetArchiveGraphBuilder(
             search_node=SearchNode(
                 _logger=self.logger,
@@ -86,22 +185,26 @@ class AgentFactory:
             ),
             filter_node=FilterNode(
                 logger=self.logger,
-                llm=self.llm,
+                llm=self.llm_for("filter"),
                 prompt_factory=FilterPromptFactory()
             ),
             metadata_node=MetadataNode(
                 _logger=self.logger,
+                _blob_store=self.blob_store,
                 ia=ia
             ),
             finder_node=FinderNode(
-                llm=self.llm,
+                llm=self.llm_for("finder"),
                 logger=self.logger,
                 prompt_factory=FinderPromptFactory(),
+                ranker=self.create_ranker(),
+                early_stop=self.finder_early_stop,
             ),
             file_finder_node=FileFinderNode(
-                llm=self.llm,
+                llm=self.llm_for("file_finder"),
                 logger=self.logger,
-                prompt_factory=FileFinderPromptFactory()
+                prompt_factory=FileFinderPromptFactory(),
+                blob_store=self.blob_store,
             ),
             downloader_node=DownloaderNode(
                 logger=self.logger,
@@ -112,9 +215,30 @@ class AgentFactory:
                 engine=self.engine,
                 logger=self.logger
             ),
+            metadata_prefetch_node=MetadataPrefetchNode(
+                _logger=self.logger,
+                _blob_store=self.blob_store,
+                ia=ia,
+                depth=self.prefetch_depth,
+            ) if self.prefetch_depth > 0 else None,
             logger=self.logger,
             cache_dir=self.cache_dir,
-        ).build()
+            checkpointer=self.checkpointer,
+        ).build().with_config(
+            # LLM calls of the graph nodes are scheduled in the graph priority class
+            metadata={PRIORITY_METADATA_KEY: PRIORITY_GRAPH}
+        )
+
+    def create_runner(self) -> InternetArchiveGraphRunner:
+        return InternetArchiveGraphRunner(
+            graph=self.graph,
+            logger=self.logger,
+            max_age=self.checkpoint_max_age,
+            single_flight=self.single_flight,
+            metrics=self.metrics,
+            trace_memory=self.trace_memory,
+            budget_limits=self.budget_limits,
+        )
 
 
 class InternetArchiveAgent:
@@ -142,10 +266,26 @@ class InternetArchiveAgent:
 
         return result
 
+    async def aask(self, query: str) -> str:
+        self.logger.info(f"Agent invoked with: {query}")
+        result = await self.agent.ainvoke(
+            InternetArchiveMessage(messages=[HumanMessage(query)]),
+            config=self.langfuse_config
+        )
+        self.logger.info(f"Agent Result: {len(result)}")
+
+        return result
+
     def stream(self, query: str):
+        """
+        Streams the LLM tokens and tool messages ("messages") and the progress events of
+        the search graph ("custom", see progress) as (namespace, mode, chunk), for the
+        OpenWebUiRenderer.
+        """
         return self.agent.astream(
             InternetArchiveMessage(messages=[HumanMessage(query)]),
             config=self.langfuse_config,
-            stream_mode = "values"
+            stream_mode = ["messages", "custom"],
+            subgraphs=True,
         )
 
@@ -42,10 +42,17 @@ class SQLAgent:
             config=self.langfuse_config
         )
 
+    async def aask(self, query: str):
+        return await self.executor.ainvoke(
+            SqlAgentMessage(messages=[HumanMessage(query)]),
+            config=self.langfuse_config
+        )
+
     def stream(self, query: str):
+        """Streams the LLM tokens and tool messages ("messages") as (mode, (message, metadata)), for the OpenWebUiRenderer."""
         return self.executor.astream(
             SqlAgentMessage(messages=[HumanMessage(query)]),
             config=self.langfuse_config,
-            stream_mode = "values"
+            stream_mode = ["messages"]
         )
 
@@ -0,0 +1,181 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Sequence, TypeVar
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+
+from ..prompts.compaction import estimate_tokens
+from ...metrics.llm import LLMRoleMetricsHandler
+
+T = TypeVar("T")
+
+BUDGET_CONFIG_KEY = "budget"
+
+
+@dataclass(frozen=True, slots=True)
+class BudgetLimits:
+    """Limits of one graph run, None is unlimited."""
+
+    deadline_seconds: Optional[float] = None
+    max_llm_calls: Optional[int] = None
+    max_tokens: Optional[int] = None
+    max_items: Optional[int] = None
+    max_download_bytes: Optional[int] = None
+
+
+class RunBudget:
+    """
+    The budget of one graph run, carried in `config["configurable"]["budget"]`.
+
+    The clock starts when the budget is created. The nodes ask before they spend
+    (`allows_llm`, `expired`, `take_items`, `reserve_download`) and return what they
+    have so far when the answer is no; the LLM calls and tokens are counted by the
+    BudgetCallbackHandler which `with_budget` adds to the config. `report` is written
+    to the final state.
+
+    Thread safe, the nodes of a run share the budget across the worker threads and
+    the item subgraphs.
+    """
+
+    def __init__(self, limits: BudgetLimits | None = None):
+        self.limits = limits or BudgetLimits()
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.llm_calls = 0
+        self.tokens = 0
+        self.items = 0
+        self.download_bytes = 0
+        self.exhausted: set[str] = set()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.limits.deadline_seconds is None:
+            return None
+        return max(0.0, self.limits.deadline_seconds - self.elapsed())
+
+    def _exhaust(self, reason: str) -> bool:
+        with self._lock:
+            self.exhausted.add(reason)
+        return False
+
+    def expired(self) -> bool:
+        remaining = self.remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            self._exhaust("deadline")
+            return True
+        return False
+
+    def allows_llm(self) -> bool:
+        if self.expired():
+            return False
+        limits = self.limits
+        if limits.max_llm_calls is not None and self.llm_calls >= limits.max_llm_calls:
+            return self._exhaust("llm_calls")
+        if limits.max_tokens is not None and self.tokens >= limits.max_tokens:
+            return self._exhaust("tokens")
+        return True
+
+    def charge_llm(self, calls: int = 0, tokens: int = 0):
+        with self._lock:
+            self.llm_calls += calls
+            self.tokens += tokens
+
+    def take_items(self, items: Sequence[T]) -> list[T]:
+        """The part of `items` that fits into the item budget, in order."""
+        with self._lock:
+            if self.limits.max_items is None:
+                taken = list(items)
+            else:
+                taken = list(items[:max(0, self.limits.max_items - self.items)])
+                if len(taken) < len(items):
+                    self.exhausted.add("items")
+            self.items += len(taken)
+        return taken
+
+    def reserve_download(self, size: Optional[int]) -> bool:
+        """Reserves `size` bytes (unknown sizes count as 0) for a download."""
+        with self._lock:
+            size = size or 0
+            limit = self.limits.max_download_bytes
+            if limit is not None and self.download_bytes + size > limit:
+                self.exhausted.add("download_bytes")
+                return False
+            self.download_bytes += size
+            return True
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "seconds": round(self.elapsed(), 3),
+                "llm_calls": self.llm_calls,
+                "tokens": self.tokens,
+                "items": self.items,
+                "download_bytes": self.download_bytes,
+                "exhausted": sorted(self.exhausted),
+                "limits": {
+                    "deadline_seconds": self.limits.deadline_seconds,
+                    "max_llm_calls": self.limits.max_llm_calls,
+                    "max_tokens": self.limits.max_tokens,
+                    "max_items": self.limits.max_items,
+                    "max_download_bytes": self.limits.max_download_bytes,
+                },
+            }
+
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+    """
+    Charges the LLM calls and tokens of a run to its RunBudget.
+
+    Tokens are taken from the usage metadata of the answer; models which do not report
+    usage are charged with the estimated tokens of prompt and answer.
+    """
+
+    def __init__(self, budget: RunBudget):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._prompt_tokens: dict[UUID, int] = {}
+
+    def _start(self, run_id: UUID, texts: Iterable[str]):
+        with self._lock:
+            self._prompt_tokens[run_id] = sum(estimate_tokens(text) for text in texts)
+        self.budget.charge_llm(calls=1)
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._start(run_id, (str(message.content) for batch in messages for message in batch))
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **kwargs: Any) -> Any:
+        self._start(run_id, prompts)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        with self._lock:
+            prompt_tokens = self._prompt_tokens.pop(run_id, 0)
+        input_tokens, output_tokens = LLMRoleMetricsHandler.token_usage(response)
+        if input_tokens is None and output_tokens is None:
+            input_tokens = prompt_tokens
+            output_tokens = sum(
+                estimate_tokens(generation.text) for generations in response.generations for generation in generations
+            )
+        self.budget.charge_llm(tokens=(input_tokens or 0) + (output_tokens or 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        with self._lock:
+            self._prompt_tokens.pop(run_id, None)
+
+
+def with_budget(config: Optional[RunnableConfig], budget: RunBudget) -> RunnableConfig:
+    """Puts the budget into the config and charges the LLM calls of the run to it."""
+    return merge_configs(config, {
+        "configurable": {BUDGET_CONFIG_KEY: budget},
+        "callbacks": [BudgetCallbackHandler(budget)],
+    })
+
+
+def budget_from(config: Optional[RunnableConfig]) -> Optional[RunBudget]:
+    return ((config or {}).get("configurable") or {}).get(BUDGET_CONFIG_KEY)
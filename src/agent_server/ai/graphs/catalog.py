@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from .claims import ItemClaims, with_claims
+from .runner import InternetArchiveGraphRunner, normalize_query
+from ...adapters.catalog_store import CatalogGame, CatalogSelection, CatalogStore
+from ...adapters.ia_search_store import IASearchStore, JOB_RUNNING, JOB_FAILED
+from ...adapters.llm_gateway import PRIORITY_METADATA_KEY, PRIORITY_BATCH
+from ...metrics.registry import MetricsRegistry
+
+# the LLM calls of a sweep queue behind the interactive and graph requests
+BATCH_CONFIG: RunnableConfig = {"metadata": {PRIORITY_METADATA_KEY: PRIORITY_BATCH}}
+
+
+def catalog_query(game: CatalogGame) -> str:
+    """The IA query of a game, e.g. "Tetris (Nintendo Entertainment System) Manual"."""
+    return f"{game.name} ({game.platform}) Manual" if game.platform else f"{game.name} Manual"
+
+
+@dataclass(slots=True)
+class SweepReport:
+    """Progress and throughput of a catalog sweep."""
+
+    id: str
+    status: str = "running"  # 'running' | 'done' | 'failed'
+    games: int = 0
+    queries: int = 0
+    done: int = 0
+    failed: int = 0
+    # games with at least one manual source found, the sources linked
+    manuals: int = 0
+    sources: int = 0
+    # identifiers found for more than one query, run once and linked to every game
+    shared_identifiers: int = 0
+    errors: list[str] = field(default_factory=list)
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    _manual_games: set[int] = field(default_factory=set)
+    _started: float = field(default_factory=time.monotonic)
+    _finished: Optional[float] = None
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = datetime.utcnow()
+        self._finished = time.monotonic()
+
+    def to_dict(self) -> dict:
+        seconds = (self._finished or time.monotonic()) - self._started
+        minutes = max(seconds, 1e-9) / 60
+        return {
+            "id": self.id,
+            "status": self.status,
+            "games": self.games,
+            "queries": self.queries,
+            "done": self.done,
+            "failed": self.failed,
+            "manuals": self.manuals,
+            "sources": self.sources,
+            "shared_identifiers": self.shared_identifiers,
+            "errors": self.errors[-10:],
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "seconds": round(seconds, 3),
+            "queries_per_minute": round((self.done + self.failed) / minutes, 2),
+        }
+
+
+class CatalogSweeper:
+    """
+    Searches the manuals of many games of the catalog at once.
+
+    The selected games are grouped by their normalized IA query (see catalog_query),
+    every query runs once through the graph, at most `concurrency` at a time and in
+    the batch priority class of the LLM gateway. Each run is an IASearch with its
+    results (see IASearchStore); the PDFs downloaded are linked to the manual of every
+    game of the query. An identifier found by several queries runs through its item
+    subgraph once (see ItemClaims), its PDFs are linked to the games of all of them.
+
+    Games which have a manual source are skipped, a stopped sweep is resumed by
+    running the same selection again.
+
+    The reports live in the process, the running sweeps and the last `max_reports`
+    finished ones are kept.
+    """
+
+    def __init__(
+            self,
+            runner: InternetArchiveGraphRunner | Callable[[], InternetArchiveGraphRunner],
+            search_store: IASearchStore,
+            catalog_store: CatalogStore,
+            concurrency: int = 2,
+            max_reports: int = 100,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+    ):
+        self._runner = runner
+        self.search_store = search_store
+        self.catalog_store = catalog_store
+        self.concurrency = max(1, concurrency)
+        self.metrics = metrics or MetricsRegistry()
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_reports = max(1, max_reports)
+        self._reports: OrderedDict[str, SweepReport] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def runner(self) -> InternetArchiveGraphRunner:
+        if not isinstance(self._runner, InternetArchiveGraphRunner):
+            self._runner = self._runner()
+        return self._runner
+
+    def start(self, selection: CatalogSelection) -> dict:
+        """Runs the sweep in the background, its report is available with `report`."""
+        report = self._new_report()
+        task = asyncio.create_task(self.sweep(selection, report))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return report.to_dict()
+
+    def report(self, sweep_id: str) -> Optional[dict]:
+        report = self._reports.get(sweep_id)
+        return report.to_dict() if report else None
+
+    def _new_report(self) -> SweepReport:
+        report = SweepReport(id=uuid.uuid4().hex)
+        self._reports[report.id] = report
+        return report
+
+    def _evict(self):
+        finished = [sweep_id for sweep_id, report in self._reports.items() if report.status != "running"]
+        for sweep_id in finished[:max(0, len(finished) - self.max_reports)]:
+            del self._reports[sweep_id]
+
+    async def sweep(self, selection: CatalogSelection, report: SweepReport | None = None) -> SweepReport:
+        report = report or self._new_report()
+        try:
+            games = await asyncio.to_thread(self.catalog_store.games, selection)
+            queries: dict[str, tuple[str, list[CatalogGame]]] = {}
+            for game in games:
+                query = catalog_query(game)
+                queries.setdefault(normalize_query(query), (query, []))[1].append(game)
+            report.games, report.queries = len(games), len(queries)
+            self.logger.info(f"CatalogSweeper {report.id}: {len(games)} games, {len(queries)} queries")
+
+            slots = asyncio.Semaphore(self.concurrency)
+            claims = ItemClaims()
+            # query -> its search id and the PDFs downloaded, the identifiers it left to other queries
+            downloads: dict[str, tuple[int, dict[str, list[str]]]] = {}
+            shared: dict[str, list[str]] = {}
+
+            async def run(query: str, query_games: list[CatalogGame]):
+                async with slots:
+                    result = await self._query(report, query, query_games, claims)
+                if result is not None:
+                    downloads[query], shared[query] = result
+
+            await asyncio.gather(*(run(query, query_games) for query, query_games in queries.values()))
+            for query, identifiers in shared.items():
+                await self._link_shared(report, queries[normalize_query(query)][1], identifiers, claims, downloads)
+            report.shared_identifiers = len({identifier for identifiers in shared.values() for identifier in identifiers})
+            report.finish("done")
+        except Exception as e:
+            self.logger.error(f"CatalogSweeper {report.id}: failed: {e}")
+            report.errors.append(str(e))
+            report.finish("failed")
+        self.logger.info(f"CatalogSweeper {report.id}: {report.to_dict()}")
+        if report.id in self._reports:
+            # the finished reports are evicted in the order they finished
+            self._reports.move_to_end(report.id)
+            self._evict()
+        return report
+
+    async def _query(
+            self,
+            report: SweepReport,
+            query: str,
+            games: list[CatalogGame],
+            claims: ItemClaims,
+    ) -> Optional[tuple[tuple[int, dict[str, list[str]]], list[str]]]:
+        """Runs the query and links its PDFs, returns its downloads and the identifiers it left to other queries."""
+        search = await asyncio.to_thread(self.search_store.create, query, normalize_query(query))
+        try:
+            await asyncio.to_thread(self.search_store.update, search["id"], status=JOB_RUNNING, started_at=datetime.utcnow())
+            state = await self.runner.ainvoke(query, config=with_claims(BATCH_CONFIG, claims))
+            await asyncio.to_thread(self.search_store.save_result, search["id"], state)
+        except Exception as e:
+            self.logger.warning(f"CatalogSweeper {report.id}: {query} failed: {e}")
+            await asyncio.to_thread(
+                self.search_store.update, search["id"], status=JOB_FAILED, error=str(e), finished_at=datetime.utcnow()
+            )
+            report.failed += 1
+            report.errors.append(f"{query}: {e}")
+            self.metrics.increment("catalog_sweep.failed")
+            return None
+
+        # a PDF which was not downloaded is no source, its game is searched again by the next sweep
+        downloaded = state.get("downloaded") or {}
+        pdfs = {
+            identifier: file_names
+            for identifier, file_names in (state.get("pdfs_to_download") or {}).items()
+            if identifier in downloaded
+        }
+        await self._link(report, games, search["id"], pdfs)
+
+        report.done += 1
+        self.metrics.increment("catalog_sweep.queries")
+        self.logger.info(
+            f"CatalogSweeper {report.id}: {report.done + report.failed}/{report.queries} queries, "
+            f"{report.to_dict()['queries_per_minute']}/min"
+        )
+        return (search["id"], pdfs), list(state.get("shared_items") or [])
+
+    async def _link_shared(
+            self,
+            report: SweepReport,
+            games: list[CatalogGame],
+            identifiers: list[str],
+            claims: ItemClaims,
+            downloads: dict[str, tuple[int, dict[str, list[str]]]],
+    ):
+        """Links the PDFs of the identifiers a query left to other queries, as downloaded by the query which ran them."""
+        by_search: dict[int, dict[str, list[str]]] = {}
+        for identifier in identifiers:
+            owner = downloads.get(claims.owner(identifier))
+            if owner is not None and identifier in owner[1]:
+                by_search.setdefault(owner[0], {})[identifier] = owner[1][identifier]
+        for search_id, pdfs in by_search.items():
+            await self._link(report, games, search_id, pdfs)
+
+    async def _link(self, report: SweepReport, games: list[CatalogGame], search_id: int, pdfs: dict[str, list[str]]):
+        files = [(identifier, file_name) for identifier, file_names in pdfs.items() for file_name in file_names]
+        if not files:
+            return
+        for game in games:
+            report.sources += await asyncio.to_thread(self.catalog_store.link, game.id, search_id, files)
+            report._manual_games.add(game.id)
+        report.manuals = len(report._manual_games)
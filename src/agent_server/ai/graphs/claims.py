@@ -0,0 +1,45 @@
+import threading
+from typing import Iterable, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+
+CLAIMS_CONFIG_KEY = "item_claims"
+
+
+class ItemClaims:
+    """
+    The items of a batch of graph runs (e.g. a catalog sweep), carried in
+    `config["configurable"]["item_claims"]`.
+
+    An identifier which passes the filter of several runs goes through its item
+    subgraph once: the first run to dispatch it claims it, the other runs skip it and
+    report it as `shared_items` (see InternetArchiveGraphBuilder.dispatch).
+
+    Thread safe, the dispatch nodes of the runs claim from worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owners: dict[str, str] = {}
+
+    def available(self, owner: str, identifier: str) -> bool:
+        with self._lock:
+            return self._owners.get(identifier, owner) == owner
+
+    def claim(self, owner: str, identifiers: Iterable[str]) -> list[str]:
+        """The identifiers now owned by `owner`, in order; those of other owners are left out."""
+        with self._lock:
+            return [identifier for identifier in identifiers if self._owners.setdefault(identifier, owner) == owner]
+
+    def owner(self, identifier: str) -> Optional[str]:
+        with self._lock:
+            return self._owners.get(identifier)
+
+
+def with_claims(config: Optional[RunnableConfig], claims: ItemClaims) -> RunnableConfig:
+    return merge_configs(config, {"configurable": {CLAIMS_CONFIG_KEY: claims}})
+
+
+def claims_from(config: Optional[RunnableConfig]) -> Optional[ItemClaims]:
+    return ((config or {}).get("configurable") or {}).get(CLAIMS_CONFIG_KEY)
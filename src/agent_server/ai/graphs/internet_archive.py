@@ -1,12 +1,19 @@
 import logging
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph
-from langgraph.types import CachePolicy, RetryPolicy
+from langgraph.types import CachePolicy, RetryPolicy, Send
 from langgraph.cache.memory import InMemoryCache
 
-from ..states.internet_archive import InternetArchiveState
+from .budget import budget_from
+from .claims import claims_from
+from .progress import progress
+from ..states.internet_archive import InternetArchiveState, InternetArchiveItemState, InternetArchiveItemOutput
 from ..nodes.internet_archive.Search import SearchNode
 from ..nodes.internet_archive.Finder import FinderNode
-from ..nodes.internet_archive.Metadata import MetadataNode
+from ..nodes.internet_archive.Metadata import MetadataNode, MetadataPrefetchNode
 from ..nodes.internet_archive.Filter import FilterNode
 from ..nodes.internet_archive.FileFinder import FileFinderNode
 from ..nodes.internet_archive.Downloader import DownloaderNode
@@ -21,9 +28,11 @@ class InternetArchiveGraphBuilder():
     file_finder_node: FileFinderNode
     finder_node: FinderNode
     downloader_node: DownloaderNode
+    metadata_prefetch_node: MetadataPrefetchNode | None
 
     logger: logging.Logger | None
     cache_dir: str | None
+    checkpointer: BaseCheckpointSaver | None
 
     def __init__(
             self,
@@ -36,6 +45,8 @@ class InternetArchiveGraphBuilder():
             database_node: DatabaseNode,
             logger: logging.Logger | None = None,
             cache_dir: str | None = None,
+            metadata_prefetch_node: MetadataPrefetchNode | None = None,
+            checkpointer: BaseCheckpointSaver | None = None,
     ):
         self.database_node = database_node
         self.search_node = search_node
@@ -44,12 +55,161 @@ class InternetArchiveGraphBuilder():
         self.finder_node = finder_node
         self.file_finder_node = file_finder_node
         self.downloader_node = downloader_node
+        self.metadata_prefetch_node = metadata_prefetch_node
         self.logger = logger
         self.cache_dir = cache_dir
+        self.checkpointer = checkpointer
+
+    def build_item_graph(self):
+        """
+            Create the per-item subgraph: metadata → finder → file_finder → downloader.
+
+            Every filtered identifier runs through its own instance of this graph, an item
+            leaves early (to `done`) as soon as a stage has nothing to hand on.
+        Returns:
+            A compiled graph with InternetArchiveItemOutput as output
+        """
+        graph = StateGraph(InternetArchiveItemState, output_schema=InternetArchiveItemOutput)
+
+        graph.add_node("metadata", self.metadata_node, retry_policy=RetryPolicy(max_attempts=1))
+        graph.add_node("finder", self.finder_node, retry_policy=RetryPolicy(max_attempts=1))
+        graph.add_node("file_finder", self.file_finder_node, retry_policy=RetryPolicy(max_attempts=1))
+        graph.add_node("downloader", self.downloader_node, retry_policy=RetryPolicy(max_attempts=1))
+        graph.add_node("done", self._item_done)
+
+        def continue_if(key: str, next_node: str):
+            return lambda state: next_node if state.get(key) else "done"
+
+        graph.add_conditional_edges("metadata", continue_if("metadata", "finder"), ["finder", "done"])
+        graph.add_conditional_edges("finder", continue_if("entries_to_consider", "file_finder"), ["file_finder", "done"])
+        graph.add_conditional_edges(
+            "file_finder",
+            lambda state: "downloader" if any((state.get("pdfs_to_download") or {}).values()) else "done",
+            ["downloader", "done"],
+        )
+        graph.add_edge("downloader", "done")
+
+        graph.set_entry_point("metadata")
+        graph.set_finish_point("done")
+
+        return graph.compile()
+
+    @staticmethod
+    def _item_done(state: InternetArchiveItemState) -> dict:
+        errors = state.get("error") or []
+        if not errors and not state.get("metadata"):
+            errors = ["No metadata available"]
+        return {"item_errors": [f"{state['identifier']}: {e}" for e in errors]}
+
+    def dispatch(self, state: InternetArchiveState, config: RunnableConfig | None = None) -> dict[str, Any]:
+        """
+            Picks the next wave of filtered identifiers for the item subgraphs.
+
+            Without an early stop of the finder node all identifiers form one wave. With
+            a FinderEarlyStop the identifiers go out in waves of its `wave_size` in the
+            filter ranking, until the relevant entries found so far say stop. At most
+            `max_items` of the run budget are sent.
+
+            With ItemClaims in the config, identifiers another run of the batch claimed
+            are not sent but reported as `shared_items`.
+        """
+        filtered = state.get("filtered_results") or []
+        dispatched = state.get("dispatched") or []
+        sent = set(dispatched)
+        remaining = [identifier for identifier in filtered if identifier not in sent]
+
+        claims = claims_from(config)
+        owner = state["query"]
+        shared: list[str] = []
+        if claims is not None:
+            shared = [identifier for identifier in remaining if not claims.available(owner, identifier)]
+            remaining = [identifier for identifier in remaining if identifier not in shared]
+
+        early_stop = getattr(self.finder_node, "early_stop", None)
+        if early_stop is None:
+            wave = remaining
+        else:
+            hits = len(set(state.get("entries_to_consider") or []) & sent)
+            wave = [] if early_stop.should_stop(hits, len(dispatched)) else remaining[:early_stop.wave_size(hits)]
+            if dispatched and self.logger:
+                self.logger.info(f"Dispatch: {hits} hits in {len(dispatched)} items, next wave {len(wave)}")
+
+        budget = budget_from(config)
+        if budget is not None:
+            wave = budget.take_items(wave)
+        if claims is None:
+            return {"wave": wave, "dispatched": wave}
+        claimed = claims.claim(owner, wave)
+        # claimed by another run in the meantime, dispatched again with the next wave
+        return {"wave": claimed, "dispatched": claimed, "shared_items": [*shared, *(i for i in wave if i not in claimed)]}
+
+    @staticmethod
+    def fan_out(state: InternetArchiveState) -> list[Send] | str:
+        """Sends every identifier of the wave into its own item subgraph."""
+        wave = state.get("wave") or []
+        if not wave:
+            return "collect"
+        prefetched = state.get("prefetched_metadata") or {}
+        return [
+            Send("item", {
+                "query": state["query"],
+                "identifier": identifier,
+                "filtered_results": [identifier],
+                "prefetched_metadata": {identifier: prefetched[identifier]} if identifier in prefetched else None,
+            })
+            for identifier in wave
+        ]
+
+    @staticmethod
+    def collect(state: InternetArchiveState, config: RunnableConfig | None = None) -> dict[str, Any]:
+        """Gathers the item results in the filter ranking and reports the consumed run budget."""
+        filtered = state.get("filtered_results") or []
+        metadata = state.get("metadata") or {}
+        entries = set(state.get("entries_to_consider") or [])
+        pdfs = state.get("pdfs_to_download") or {}
+
+        result: dict[str, Any] = {
+            "prefetched_metadata": None,
+            "wave": None,
+            "metadata": {item_id: metadata[item_id] for item_id in filtered if item_id in metadata},
+            "entries_to_consider": [item_id for item_id in filtered if item_id in entries],
+            "pdfs_to_download": {item_id: pdfs[item_id] for item_id in filtered if item_id in pdfs},
+        }
+
+        # appended to the errors of search and filter, see append_errors
+        errors = state.get("item_errors") or []
+        if not filtered:
+            result["error"] = "No filtered results to get metadata for"
+        elif errors:
+            result["error"] = errors
+
+        budget = budget_from(config)
+        if budget is not None:
+            result["budget"] = budget.report()
+
+        progress("done", f"done: {len(result['entries_to_consider'])} items", items=len(result["entries_to_consider"]))
+
+        return result
 
     def build(self):
         """
             Create a graph for Internet Archive search with search, filter, and metadata nodes.
+
+            With a metadata_prefetch_node, the metadata of the top search results is fetched
+            in parallel to the filter LLM call (speculative prefetch).
+
+            After the filter every identifier is sent (`Send`) into its own item subgraph, so
+            items do not wait for each other between the stages. The item results are
+            gathered by the reducers of InternetArchiveState and ordered in `collect`.
+            With an early stop of the finder node the items are sent in waves, see `dispatch`.
+
+            With a checkpointer every superstep is persisted, see InternetArchiveGraphRunner.
+
+            The nodes report their progress and the chosen files per item as custom
+            stream events (see progress), stream with stream_mode "custom".
+
+            With a RunBudget in the config (see `with_budget`), the nodes return what they
+            have when it is exhausted and `collect` writes the consumed budget to `budget`.
         Returns:
             A StateGraph for Internet Archive search
         """
@@ -61,39 +221,37 @@ class InternetArchiveGraphBuilder():
             _cache_file_name="query.json",
             _cached_results_key="cached_results",
             _cache_key_getter=lambda s: s.get("cache_key") or s.get("query"),
+            _exclude_keys=("prefetched_metadata",),
         )
 
         graph.add_node("cache", cache_reader, retry_policy=RetryPolicy(max_attempts=1))
         graph.add_node("search", self.search_node, cache_policy=CachePolicy(ttl=120), retry_policy=RetryPolicy(max_attempts=1))
         graph.add_node("state_writer", cache_writer, retry_policy=RetryPolicy(max_attempts=1))
         graph.add_node("filter", self.filter_node, cache_policy=CachePolicy(ttl=120), retry_policy=RetryPolicy(max_attempts=1))
-        graph.add_node("metadata", self.metadata_node, retry_policy=RetryPolicy(max_attempts=1))
-        graph.add_node("finder", self.finder_node, retry_policy=RetryPolicy(max_attempts=1))
-        graph.add_node("file_finder", self.file_finder_node, retry_policy=RetryPolicy(max_attempts=1))
-        graph.add_node("downloader", self.downloader_node, retry_policy=RetryPolicy(max_attempts=1))
+        graph.add_node("dispatch", self.dispatch)
+        graph.add_node("item", self.build_item_graph())
+        graph.add_node("collect", self.collect)
 
         def route_next(state: InternetArchiveState):
-            return "metadata" if state.get("cached_results") \
+            # a retry of the failed items (see InternetArchiveGraphRunner) brings its filter results along
+            return "dispatch" if state.get("cached_results") or state.get("filtered_results") is not None \
                 else "search"
 
-        graph.add_conditional_edges(
-            "cache",
-            route_next,
-            {
-                "metadata": "metadata",
-                "search": "search"
-            }
-        )
+        graph.add_conditional_edges("cache", route_next, ["search", "dispatch"])
 
         graph.add_edge("search", "filter")
-        graph.add_edge("filter", "state_writer")
-        graph.add_edge("state_writer", "metadata")
-        graph.add_edge("metadata", "finder")
-        graph.add_edge("finder", "file_finder")
-        graph.add_edge("file_finder", "downloader")
-        graph.add_edge("file_finder", "downloader")
+        if self.metadata_prefetch_node is not None:
+            graph.add_node("prefetch", self.metadata_prefetch_node, retry_policy=RetryPolicy(max_attempts=1))
+            graph.add_edge("search", "prefetch")
+            graph.add_edge(["filter", "prefetch"], "state_writer")
+        else:
+            graph.add_edge("filter", "state_writer")
+        graph.add_edge("state_writer", "dispatch")
+        graph.add_conditional_edges("dispatch", self.fan_out, ["item", "collect"])
+        # back to dispatch after every wave, it decides on the next one or collect
+        graph.add_edge("item", "dispatch")
 
         graph.set_entry_point("cache")
-        graph.set_finish_point("downloader")
+        graph.set_finish_point("collect")
 
-        return graph.compile(cache=InMemoryCache())
+        return graph.compile(cache=InMemoryCache(), checkpointer=self.checkpointer)
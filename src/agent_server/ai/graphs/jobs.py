@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Optional
+
+from .progress import PROGRESS_EVENT
+from .runner import InternetArchiveGraphRunner, normalize_query
+from ...adapters.ia_search_store import (
+    IASearchStore, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED, ACTIVE_STATUSES,
+)
+from ...metrics.registry import MetricsRegistry
+
+# `type` of the status events of a job stream, the progress events of the graph are passed on as they are
+STATUS_EVENT = "ia_job_status"
+
+
+class _Job:
+    """A job of this process: its task and the events so far, for the event streams."""
+
+    def __init__(self, job_id: int, query: str):
+        self.id = job_id
+        self.query = query
+        self.events: list[dict] = []
+        self.finished = False
+        self.task: asyncio.Task | None = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: dict, finished: bool = False):
+        async with self._changed:
+            self.events.append(event)
+            self.finished = self.finished or finished
+            self._changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[dict]:
+        """All events of the job, the past ones first, until it is finished."""
+        seen = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.events) > seen or self.finished)
+                events, finished = self.events[seen:], self.finished
+            seen += len(events)
+            for event in events:
+                yield event
+            if finished and seen == len(self.events):
+                return
+
+
+class IAJobManager:
+    """
+    Runs Internet Archive searches as background jobs.
+
+    A job is an IASearch row (see IASearchStore), `submit` returns right away and the
+    graph runs in a pool of `workers` on the event loop, its sync parts in the default
+    executor. The progress events of the graph are kept per job for `events` and the
+    last one is written to the row; the final state is written to the IASearch tables.
+
+    Jobs are idempotent per normalized query: submitting a query with a queued or
+    running job, or one done in the last `max_age` seconds, returns that job. A failed
+    or cancelled job is started again.
+
+    `recover` restarts the jobs which were queued or running when the server stopped,
+    the runner resumes them from their checkpoints.
+    """
+
+    def __init__(
+            self,
+            runner: InternetArchiveGraphRunner | Callable[[], InternetArchiveGraphRunner],
+            store: IASearchStore,
+            workers: int = 2,
+            max_age: int = 24 * 3600,
+            metrics: MetricsRegistry | None = None,
+            logger: logging.Logger | None = None,
+    ):
+        # a provider is resolved on the first run, the graph is not built before it is needed
+        self._runner = runner
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_age = max_age
+        self.metrics = metrics or MetricsRegistry()
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._jobs: dict[int, _Job] = {}
+        self._submit_lock: asyncio.Lock | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    @property
+    def runner(self) -> InternetArchiveGraphRunner:
+        if not isinstance(self._runner, InternetArchiveGraphRunner):
+            self._runner = self._runner()
+        return self._runner
+
+    def _record_gauges(self):
+        self.metrics.set_gauge("ia_jobs.active", len(self._jobs))
+
+    async def submit(self, query: str) -> tuple[dict, bool]:
+        """The job for the query and whether it was created by this call."""
+        normalized = normalize_query(query)
+        if self._submit_lock is None:
+            self._submit_lock = asyncio.Lock()
+        async with self._submit_lock:
+            for job in self._jobs.values():
+                if normalize_query(job.query) == normalized:
+                    return await self.get(job.id, results=False), False
+            existing = await asyncio.to_thread(self.store.latest, normalized, self.max_age)
+            if existing is not None:
+                if existing["status"] != JOB_DONE:
+                    # left queued or running by a stopped server, this worker takes it over
+                    self._start(existing["id"], existing["query"])
+                return existing, False
+            created = await asyncio.to_thread(self.store.create, query, normalized)
+            self._start(created["id"], query)
+            self.metrics.increment("ia_jobs.submitted")
+            return created, True
+
+    async def recover(self) -> int:
+        """Restarts the jobs a stopped server left queued or running, returns their count."""
+        jobs = await asyncio.to_thread(self.store.unfinished)
+        for job in jobs:
+            if job["id"] not in self._jobs:
+                self.logger.info(f"IAJobManager: recovering job {job['id']} {job['query']}")
+                self._start(job["id"], job["query"])
+        return len(jobs)
+
+    def _start(self, job_id: int, query: str):
+        job = self._jobs[job_id] = _Job(job_id, query)
+        job.task = asyncio.create_task(self._run(job))
+        self._record_gauges()
+
+    async def _status(self, job: _Job, status: str, **fields: Any):
+        await asyncio.to_thread(self.store.update, job.id, status=status, **fields)
+        await job.publish(
+            {"type": STATUS_EVENT, "id": job.id, "status": status, **{k: v for k, v in fields.items() if k == "error"}},
+            finished=status not in ACTIVE_STATUSES,
+        )
+
+    async def _run(self, job: _Job):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            await job.publish({"type": STATUS_EVENT, "id": job.id, "status": JOB_QUEUED})
+            async with self._slots:
+                await self._status(job, JOB_RUNNING, started_at=datetime.utcnow())
+                state: dict = {}
+                async for mode, chunk in self.runner.astream(job.query):
+                    if mode == "values":
+                        state = chunk
+                        continue
+                    await job.publish(chunk)
+                    if chunk.get("type") == PROGRESS_EVENT:
+                        await asyncio.to_thread(
+                            self.store.update, job.id, stage=chunk.get("stage"), progress=chunk.get("text")
+                        )
+                await asyncio.to_thread(self.store.save_result, job.id, state)
+            await job.publish({"type": STATUS_EVENT, "id": job.id, "status": JOB_DONE}, finished=True)
+            self.metrics.increment("ia_jobs.done")
+        except asyncio.CancelledError:
+            await asyncio.shield(self._status(job, JOB_CANCELLED, finished_at=datetime.utcnow()))
+            self.metrics.increment("ia_jobs.cancelled")
+        except Exception as e:
+            self.logger.error(f"IAJobManager: job {job.id} failed: {e}")
+            await self._status(job, JOB_FAILED, error=str(e), finished_at=datetime.utcnow())
+            self.metrics.increment("ia_jobs.failed")
+        finally:
+            self._jobs.pop(job.id, None)
+            self._record_gauges()
+
+    async def get(self, job_id: int, results: bool = True) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id, results)
+
+    async def cancel(self, job_id: int) -> Optional[dict]:
+        """Cancels a queued or running job, a finished job is returned as it is."""
+        job = self._jobs.get(job_id)
+        if job is not None and job.task is not None:
+            job.task.cancel()
+            await asyncio.wait({job.task})
+        else:
+            current = await self.get(job_id, results=False)
+            if current is not None and current["status"] in ACTIVE_STATUSES:
+                # left over by a stopped server
+                await asyncio.to_thread(
+                    self.store.update, job_id, status=JOB_CANCELLED, finished_at=datetime.utcnow()
+                )
+        return await self.get(job_id, results=False)
+
+    async def events(self, job_id: int) -> AsyncIterator[dict]:
+        """The events of a job until it is finished; for a job of no worker here only its status."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            async for event in job.follow():
+                yield event
+            return
+        current = await self.get(job_id, results=False)
+        if current is not None:
+            yield {"type": STATUS_EVENT, "id": job_id, "status": current["status"], "error": current["error"]}
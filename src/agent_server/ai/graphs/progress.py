@@ -0,0 +1,45 @@
+from typing import Any, Iterable, Optional
+
+from langgraph.config import get_stream_writer
+
+from ...adapters.internet_archive_records import IAFile
+
+# `type` of the custom stream events of the Internet Archive graph
+PROGRESS_EVENT = "ia_progress"
+FOUND_EVENT = "ia_found"
+
+
+def emit(event: dict[str, Any]) -> None:
+    """Writes the event to the custom stream of the running graph, outside of a graph run it is dropped."""
+    try:
+        writer = get_stream_writer()
+    except (RuntimeError, KeyError):
+        return
+    writer(event)
+
+
+def progress(stage: str, text: str, **data: Any) -> None:
+    """A progress event of a node, e.g. progress("search", "search: 37 hits", hits=37)."""
+    emit({"type": PROGRESS_EVENT, "stage": stage, "text": text, **data})
+
+
+def found(identifier: str, title: Optional[str], files: Iterable[IAFile]) -> None:
+    """A partial result: the files chosen for an item."""
+    emit({
+        "type": FOUND_EVENT,
+        "identifier": identifier,
+        "title": title or identifier,
+        "files": [file.to_dict(("name", "format", "size")) for file in files],
+    })
+
+
+def format_size(size: Optional[int]) -> str:
+    """Human readable file size, e.g. "4.2 MB"."""
+    if size is None:
+        return ""
+    value, unit = float(size), "B"
+    for unit in ("B", "kB", "MB", "GB"):
+        if value < 1000 or unit == "GB":
+            break
+        value /= 1000
+    return f"{value:.0f} {unit}" if unit == "B" or value >= 10 else f"{value:.1f} {unit}"
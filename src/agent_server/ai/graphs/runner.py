@@ -0,0 +1,354 @@
+import asyncio
+import copy
+import hashlib
+import logging
+import re
+import unicodedata
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import StateSnapshot
+
+from .budget import BudgetLimits, RunBudget, budget_from, with_budget
+from .progress import emit
+from ..states.internet_archive import InternetArchiveState
+from ...adapters.single_flight import SingleFlight
+from ...metrics.memory import state_size, traced_peak
+from ...metrics.registry import MetricsRegistry
+
+
+# the keys of the configurable which tie a run to the graph it is called from (see config_for)
+_STREAM_KEYS = ("__pregel_stream", "__pregel_runtime")
+_PARENT_RUN_KEYS = ("checkpoint_ns", "checkpoint_id", "checkpoint_map")
+
+
+def normalize_query(query: str) -> str:
+    """Case, unicode form, quotes and whitespace do not make a different query."""
+    query = unicodedata.normalize("NFKC", query or "").casefold()
+    query = re.sub(r"[\"'`´“”„‘’]", "", query)
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def thread_id_for(query: str) -> str:
+    return "ia-" + hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:32]
+
+
+class _SharedRun:
+    """An async run of a thread: its events so far, replayed to every caller that follows it."""
+
+    def __init__(self):
+        self.events: list[tuple[str, Any]] = []
+        self.task: asyncio.Task | None = None
+        self.followers = 0
+        self.done = False
+        self.error: BaseException | None = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: tuple[str, Any]):
+        self.events.append(event)
+        self._changed.set()
+
+    def finish(self, error: BaseException | None = None):
+        self.done, self.error = True, error
+        self._changed.set()
+
+    async def follow(self) -> AsyncIterator[tuple[str, Any]]:
+        self.followers += 1
+        seen = 0
+        try:
+            while True:
+                while seen < len(self.events):
+                    seen += 1
+                    yield self.events[seen - 1]
+                if self.done:
+                    break
+                self._changed.clear()
+                await self._changed.wait()
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.followers -= 1
+            if not self.followers and not self.done and self.task is not None:
+                self.task.cancel()
+
+
+class InternetArchiveGraphRunner:
+    """
+    Runs the Internet Archive graph for a query.
+
+    With a checkpointer compiled into the graph, every query gets its own thread (the
+    thread id is derived from the normalized query):
+
+    - a run which failed or was interrupted is resumed from its last completed node
+    - a finished run whose items failed (`item_errors`, or PDFs which were not
+      downloaded) is retried: the thread starts over from the search results of the
+      run with the items that succeeded, only the failed items run again
+    - a finished run younger than `max_age` seconds is answered from its checkpoint,
+      unless its budget was exhausted or it left `shared_items` to another run of its
+      batch (see ItemClaims): it starts over for the caller
+    - otherwise the thread is cleared and the graph starts from the beginning
+
+    Without a checkpointer the graph is simply invoked.
+
+    With `single_flight`, concurrent runs of the same normalized query share one
+    execution (the config of the first caller is used) and all get its result. The
+    async runs (`ainvoke`, `astream`) of a thread share one execution in any case,
+    two runs on one checkpoint thread would resume each other's steps.
+
+    With `metrics`, the size of the final state of every run is recorded as
+    `ia_graph.state_bytes`; `trace_memory` additionally records the allocation peak
+    of the run as `ia_graph.peak_memory_bytes` (see traced_peak).
+
+    Every run gets a RunBudget of `limits` (or of the runner's `budget_limits`) unless
+    the config already carries one, the consumed budget is reported in the final
+    state as `budget`. A caller may pass its own `limits` for its run.
+    """
+
+    graph: CompiledStateGraph
+    logger: logging.Logger
+    max_age: int
+    single_flight: SingleFlight | None
+    metrics: MetricsRegistry | None
+    trace_memory: bool
+    budget_limits: BudgetLimits | None
+
+    def __init__(
+            self,
+            graph: CompiledStateGraph,
+            logger: logging.Logger | None = None,
+            max_age: int = 24 * 3600,
+            single_flight: SingleFlight | None = None,
+            metrics: MetricsRegistry | None = None,
+            trace_memory: bool = False,
+            budget_limits: BudgetLimits | None = None,
+    ):
+        self.graph = graph
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_age = max_age
+        self.single_flight = single_flight
+        self.metrics = metrics
+        self.trace_memory = trace_memory
+        self.budget_limits = budget_limits
+        self._runs: dict[tuple[int, str], _SharedRun] = {}
+
+    @property
+    def checkpointer(self) -> Any:
+        return getattr(self.graph, "checkpointer", None) or None
+
+    def config_for(self, query: str, config: Optional[RunnableConfig] = None) -> RunnableConfig:
+        """
+        The config of a checkpointed run: the config of the caller with the thread of the
+        query. Called from a node of another graph (the agent's tool), the run keeps the
+        stream and callbacks of that graph but not its checkpoint and task keys, it is a
+        root run on its own thread.
+        """
+        config = dict(config or {})
+        config["configurable"] = {
+            key: value for key, value in (config.get("configurable") or {}).items()
+            if key not in _PARENT_RUN_KEYS and (not key.startswith("__pregel_") or key in _STREAM_KEYS)
+        }
+        return merge_configs(config, {"configurable": {"thread_id": thread_id_for(query)}})
+
+    def _is_fresh(self, snapshot: StateSnapshot) -> bool:
+        if not snapshot.created_at:
+            return False
+        created_at = datetime.fromisoformat(snapshot.created_at)
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - created_at).total_seconds() <= self.max_age
+
+    @staticmethod
+    def failed_items(state: dict) -> set[str]:
+        """The identifiers of a finished run whose item subgraph failed or whose PDFs were not all downloaded."""
+        item_errors = state.get("item_errors") or []
+        failed = {
+            identifier for identifier in state.get("dispatched") or []
+            if any(error.startswith(f"{identifier}: ") for error in item_errors)
+        }
+        downloaded = state.get("downloaded") or {}
+        for identifier, files in (state.get("pdfs_to_download") or {}).items():
+            if files and len(downloaded.get(identifier) or []) < len(files):
+                failed.add(identifier)
+        return failed
+
+    def _plan(self, snapshot: StateSnapshot) -> str:
+        if not snapshot.values or not self._is_fresh(snapshot):
+            return "start"
+        if snapshot.next:
+            return "resume"
+        values = snapshot.values
+        if (values.get("budget") or {}).get("exhausted"):
+            # cut short by the budget of its caller, the state must not answer other callers
+            return "start"
+        if values.get("shared_items"):
+            # items were left to the other runs of a batch, the state misses them
+            return "start"
+        item_errors = set(values.get("item_errors") or [])
+        if any(error not in item_errors for error in values.get("error") or []):
+            # search or filter failed, nothing of the run is worth keeping
+            return "start"
+        return "retry" if self.failed_items(values) else "finished"
+
+    def _retry_input(self, state: dict) -> InternetArchiveState:
+        """The input of a run which keeps the search results and the items that succeeded and runs the failed items again."""
+        failed = self.failed_items(state)
+
+        def succeeded(values: Optional[dict]) -> dict:
+            return {identifier: value for identifier, value in (values or {}).items() if identifier not in failed}
+
+        self.logger.info(f"InternetArchiveGraphRunner: retrying {sorted(failed)}")
+        return InternetArchiveState(
+            query=state["query"],
+            results=state.get("results"),
+            cached_results=state.get("cached_results"),
+            filtered_results=state.get("filtered_results"),
+            cached_filtered_results=state.get("cached_filtered_results"),
+            dispatched=[identifier for identifier in state.get("dispatched") or [] if identifier not in failed],
+            metadata=succeeded(state.get("metadata")),
+            cached_metadata=state.get("cached_metadata"),
+            relevance_scores=succeeded(state.get("relevance_scores")),
+            entries_to_consider=[identifier for identifier in state.get("entries_to_consider") or [] if identifier not in failed],
+            pdfs_to_download=succeeded(state.get("pdfs_to_download")),
+            downloaded=succeeded(state.get("downloaded")),
+        )
+
+    def budgeted(self, config: Optional[RunnableConfig] = None, limits: BudgetLimits | None = None) -> Optional[RunnableConfig]:
+        """The config with a fresh RunBudget, unless it has one already or there are no limits."""
+        limits = limits or self.budget_limits
+        if limits is None or budget_from(config) is not None:
+            return config
+        return with_budget(config, RunBudget(limits))
+
+    def invoke(self, query: str, config: Optional[RunnableConfig] = None, limits: BudgetLimits | None = None) -> dict:
+        if self.single_flight is None:
+            return self._measured(query, self.budgeted(config, limits))
+        # the budget starts with the execution, not with the call
+        return self.single_flight.do(thread_id_for(query), lambda: self._measured(query, self.budgeted(config, limits)))
+
+    async def ainvoke(self, query: str, config: Optional[RunnableConfig] = None, limits: BudgetLimits | None = None) -> dict:
+        if self.single_flight is None:
+            return await self._final_state(query, config, limits)
+        return await self.single_flight.ado(thread_id_for(query), lambda: self._final_state(query, config, limits))
+
+    async def _final_state(self, query: str, config: Optional[RunnableConfig], limits: BudgetLimits | None) -> dict:
+        state: dict = {}
+        async for mode, chunk in self.astream(query, config, limits):
+            if mode == "values":
+                state = chunk
+            else:
+                # called from a node (the agent's tool), the progress goes to the stream of its graph
+                emit(chunk)
+        return state
+
+    def _record(self, result: dict, peak) -> dict:
+        if self.metrics is not None:
+            self.metrics.observe("ia_graph.state_bytes", state_size(result))
+            if peak is not None:
+                self.metrics.observe("ia_graph.peak_memory_bytes", peak.bytes)
+        return result
+
+    def _measured(self, query: str, config: Optional[RunnableConfig] = None) -> dict:
+        with traced_peak() if self.trace_memory else nullcontext() as peak:
+            result = self._invoke(query, config)
+        return self._record(result, peak)
+
+    def _invoke(self, query: str, config: Optional[RunnableConfig] = None) -> dict:
+        if self.checkpointer is None:
+            return self.graph.invoke(InternetArchiveState(query=query), config=config)
+
+        run_config = self.config_for(query, config)
+        snapshot = self.graph.get_state(run_config)
+        plan = self._plan(snapshot)
+        self.logger.info(f"InternetArchiveGraphRunner: {plan} {run_config['configurable']['thread_id']}")
+        if plan == "finished":
+            return snapshot.values
+        if plan == "resume":
+            return self.graph.invoke(None, config=run_config)
+
+        graph_input = self._retry_input(snapshot.values) if plan == "retry" else InternetArchiveState(query=query)
+        self.checkpointer.delete_thread(run_config["configurable"]["thread_id"])
+        return self.graph.invoke(graph_input, config=run_config)
+
+    async def _aprepare(self, query: str, config: Optional[RunnableConfig] = None) -> tuple[Any, Optional[RunnableConfig], Optional[dict]]:
+        """The graph input and config of a run, or the final state when the run is answered from its checkpoint."""
+        if self.checkpointer is None:
+            return InternetArchiveState(query=query), config, None
+
+        run_config = self.config_for(query, config)
+        snapshot = await self.graph.aget_state(run_config)
+        plan = self._plan(snapshot)
+        self.logger.info(f"InternetArchiveGraphRunner: {plan} {run_config['configurable']['thread_id']}")
+        if plan == "finished":
+            return None, run_config, snapshot.values
+        if plan == "resume":
+            return None, run_config, None
+
+        graph_input = self._retry_input(snapshot.values) if plan == "retry" else InternetArchiveState(query=query)
+        await self.checkpointer.adelete_thread(run_config["configurable"]["thread_id"])
+        return graph_input, run_config, None
+
+    async def astream(
+            self,
+            query: str,
+            config: Optional[RunnableConfig] = None,
+            limits: BudgetLimits | None = None,
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Runs the graph like `ainvoke` and yields its progress as ("custom", event) while
+        it runs (see progress), the last item is ("values", final state).
+
+        The async runs of a thread are coalesced on the event loop: a stream or `ainvoke`
+        of a query which runs already follows that run, its past events first. The run
+        uses the config of the first caller and is cancelled when all callers are gone.
+        """
+        key = (id(asyncio.get_running_loop()), thread_id_for(query))
+        run = self._runs.get(key)
+        if run is None:
+            run = self._runs[key] = _SharedRun()
+            # the budget starts with the execution, not with the call
+            run.task = asyncio.ensure_future(self._execute(run, query, self.budgeted(config, limits)))
+            run.task.add_done_callback(lambda _: self._runs.pop(key, None))
+            leader = True
+        else:
+            leader = False
+            if self.metrics is not None:
+                self.metrics.increment("ia_graph.coalesced_streams")
+            self.logger.info(f"InternetArchiveGraphRunner: following the running {key[1]}")
+
+        async for mode, chunk in run.follow():
+            yield mode, chunk if leader or mode != "values" else copy.deepcopy(chunk)
+
+    async def _execute(self, run: _SharedRun, query: str, config: Optional[RunnableConfig]):
+        try:
+            with traced_peak() if self.trace_memory else nullcontext() as peak:
+                state = None
+                async for mode, chunk in self._astream(query, config):
+                    if mode == "values":
+                        state = chunk
+                    else:
+                        run.publish((mode, chunk))
+            run.publish(("values", self._record(state or {}, peak)))
+            run.finish()
+        except asyncio.CancelledError as e:
+            run.finish(e)
+            raise
+        except Exception as e:
+            # raised to every follower
+            run.finish(e)
+
+    async def _astream(self, query: str, config: Optional[RunnableConfig] = None) -> AsyncIterator[tuple[str, Any]]:
+        graph_input, run_config, state = await self._aprepare(query, config)
+        if state is None:
+            stream = self.graph.astream(graph_input, config=run_config, stream_mode=["custom", "values"], subgraphs=True)
+            # the item subgraphs report their progress too, their states are not of interest
+            async for namespace, mode, chunk in stream:
+                if mode == "custom":
+                    yield mode, chunk
+                elif not namespace:
+                    state = chunk
+        yield "values", state
+
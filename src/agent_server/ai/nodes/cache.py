@@ -7,6 +7,8 @@ from typing import Any, Optional, Callable
 from langchain_core.runnables import RunnableSerializable
 from pydantic import PrivateAttr
 
+from ..graphs.budget import budget_from
+
 DATA_ROOT = "/data/ia/cache"
 
 
@@ -20,7 +22,7 @@ class CacheReaderNode(RunnableSerializable):
 
     - Computes a hash from a cache key derived via `_cache_key_getter` (defaults to state["query"]).
     - Looks for /data/ia/<hash>/<cache_file_name>.
-    - If present, loads it, merges into the state, and sets the `_cached_results_key` flag so the graph can route.
+    - If present, loads it, returns it as the state update, and sets the `_cached_results_key` flag so the graph can route.
       Otherwise, it sets the flag to False and continues.
     """
 
@@ -47,12 +49,12 @@ class CacheReaderNode(RunnableSerializable):
     def invoke(self, state: dict, config: Any = None) -> dict:
         cache_key: Optional[str] = self._cache_key_getter(state)
         if not cache_key:
-            return {**state, self._cached_results_key: False}
+            return {self._cached_results_key: False}
 
         key_hash = _hash_query(cache_key)
         cache_dir = os.path.join(self._data_root, key_hash)
         cache_file = os.path.join(cache_dir, self._cache_file_name)
-        merged = {**state, "cache_key_hash": key_hash}
+        merged = {"cache_key_hash": key_hash}
 
         try:
             if os.path.isfile(cache_file):
@@ -78,28 +80,40 @@ class CacheWriterNode(RunnableSerializable):
     Persists the current state to /data/ia/<hash>/<cache_file_name> using the cache key hash.
 
     Should run after Search and before Filter so that future runs can skip Search.
+    Keys listed in `_exclude_keys` (e.g. transient prefetch data) are not persisted.
+    The state is not changed, the node returns an empty update. Nothing is written when
+    the run budget (see RunBudget) was exhausted, the state may be degraded.
     """
 
     _logger: logging.Logger = PrivateAttr()
     _data_root: str = PrivateAttr()
     _cache_file_name: str = PrivateAttr()
     _cache_key_getter: Callable[[dict], Optional[str]] = PrivateAttr()
+    _exclude_keys: tuple[str, ...] = PrivateAttr()
 
     def __init__(self, **data):
         logger = data.pop("_logger", None)
         data_root = data.pop("_data_root", None)
         cache_file_name = data.pop("_cache_file_name", "query.json")
         cache_key_getter = data.pop("_cache_key_getter", None)
+        exclude_keys = data.pop("_exclude_keys", ())
         super().__init__(**data)
         self._logger = logger or logging.getLogger(__name__)
         self._data_root = data_root or DATA_ROOT
         self._cache_file_name = cache_file_name
         self._cache_key_getter = cache_key_getter or (lambda s: s.get("query"))
+        self._exclude_keys = tuple(exclude_keys)
 
     def invoke(self, state: dict, config: Any = None) -> dict:
         cache_key: Optional[str] = self._cache_key_getter(state)
         if not cache_key:
-            return state
+            return {}
+
+        budget = budget_from(config)
+        if budget is not None and budget.exhausted:
+            # a state degraded by the run budget must not be answered from the cache later
+            self._logger.info(f"StateWriterNode: budget exhausted ({', '.join(sorted(budget.exhausted))}), not caching")
+            return {}
 
         key_hash: str = state.get("cache_key_hash") or _hash_query(cache_key)
         cache_dir = os.path.join(self._data_root, key_hash)
@@ -108,11 +122,11 @@ class CacheWriterNode(RunnableSerializable):
             os.makedirs(cache_dir, exist_ok=True)
             # Only persist a subset that is useful. But spec doesn't restrict, so write full state.
             with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(dict(state), f, ensure_ascii=False, indent=2)
+                json.dump({k: v for k, v in state.items() if k not in self._exclude_keys}, f, ensure_ascii=False, indent=2)
             self._logger.info(f"StateWriterNode: wrote cache to {cache_file}")
         except Exception as e:
             self._logger.error(f"StateWriterNode error writing cache: {e}")
-        return state
+        return {}
 
 
 class CacheFactory:
@@ -124,6 +138,7 @@ class CacheFactory:
     - _cached_results_key: "cached_results"
     - _cache_key_getter: lambda s: s.get("cache_key") or s.get("query")
     - _data_root: DATA_ROOT ("/data/ia") unless overridden
+    - _exclude_keys: () (state keys the writer does not persist)
     """
 
     @staticmethod
@@ -134,6 +149,7 @@ class CacheFactory:
         _cache_file_name: str = "query.json",
         _cached_results_key: str = "cached_results",
         _cache_key_getter: Callable[[dict], Optional[str]] = lambda s: s.get("cache_key") or s.get("query"),
+        _exclude_keys: tuple[str, ...] = (),
     ) -> tuple[CacheReaderNode, CacheWriterNode]:
         reader = CacheReaderNode(
             _logger=_logger,
@@ -147,5 +163,6 @@ class CacheFactory:
             _data_root=_directory,
             _cache_file_name=_cache_file_name,
             _cache_key_getter=_cache_key_getter,
+            _exclude_keys=_exclude_keys,
         )
         return reader, writer
@@ -1,4 +1,4 @@
-import logging
+import asyncio
 import logging
 import os
 from pathlib import Path
@@ -7,12 +7,20 @@ from typing import Any, Optional
 from langchain_core.runnables import RunnableConfig, Runnable
 from langchain_core.runnables.utils import Output
 
+from ...graphs.budget import budget_from
+from ...graphs.progress import progress
 from ...states.internet_archive import InternetArchiveState
-from ....adapters.internet_archive import InternetArchiveSearchWrapper
+from ....adapters.internet_archive import InternetArchiveSearchWrapper, item_dir
 
 DATA_ROOT = "/data/ia/data"
 
 class DownloaderNode(Runnable):
+    """
+    Downloads the selected PDFs of every entry into its directory below `target_dir`
+    (see item_dir), `downloaded` holds their paths.
+
+    Past the deadline of the run budget (see RunBudget) nothing more is downloaded.
+    """
     target_dir: Path
     logger: logging.Logger
     ia: InternetArchiveSearchWrapper
@@ -23,7 +31,7 @@ class DownloaderNode(Runnable):
             data_dir: Path|None = None,
             logger: logging.Logger = None
     ):
-        data_dir = data_dir if data_dir is Path else Path(DATA_ROOT)
+        data_dir = Path(data_dir) if data_dir else Path(DATA_ROOT)
         self.ia = ia
         self.logger = logger or logging.getLogger(__name__)
         if not data_dir.exists():
@@ -34,11 +42,29 @@ class DownloaderNode(Runnable):
             raise AttributeError(f"Target directory {data_dir} is not writable")
         self.target_dir = data_dir
 
+    def _result(self, downloaded: dict[str, list[str]], error: list) -> dict:
+        for identifier, files in downloaded.items():
+            progress("download", f"downloaded: {identifier}", identifier=identifier, files=len(files))
+        result: dict[str, Any] = {
+            "downloaded": {
+                identifier: [str(item_dir(self.target_dir, identifier) / file) for file in files]
+                for identifier, files in downloaded.items()
+            },
+        }
+        if error:
+            result["error"] = error
+        return result
+
     def invoke(self, state: InternetArchiveState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Output:
        pdfs_to_download = state.get("pdfs_to_download") or {}
-       error = state.get("error") or []
+       downloaded: dict[str, list[str]] = {}
+       error: list = []
+       budget = budget_from(config)
 
        for identifier, files in pdfs_to_download.items():
+           if budget is not None and budget.expired():
+               self.logger.info(f"Downloader deadline reached, not downloading {identifier}")
+               break
            try:
                self.ia.download(
                    identifier=identifier,
@@ -46,14 +72,37 @@ class DownloaderNode(Runnable):
                    target_dir=self.target_dir,
                )
                self.logger.info(f"Downloading: {files}")
+               downloaded[identifier] = files
            except Exception as e:
               error.append(str(e))
 
-       result = {
-           **state,
-       }
+       return self._result(downloaded, error)
+
+    async def ainvoke(self, state: InternetArchiveState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Output:
+        pdfs_to_download = state.get("pdfs_to_download") or {}
+        error: list = []
+        budget = budget_from(config)
+        if budget is not None and budget.expired():
+            self.logger.info(f"Downloader deadline reached, not downloading {list(pdfs_to_download)}")
+            return self._result({}, error)
+
+        async def download(identifier: str, files: list[str]):
+            await self.ia.adownload(
+                identifier=identifier,
+                files=files,
+                target_dir=self.target_dir,
+            )
+            self.logger.info(f"Downloading: {files}")
 
-       if error:
-           result["error"] = error
+        downloads = await asyncio.gather(
+            *(download(identifier, files) for identifier, files in pdfs_to_download.items()),
+            return_exceptions=True,
+        )
+        error.extend(str(e) for e in downloads if isinstance(e, Exception))
+        downloaded = {
+            identifier: files
+            for (identifier, files), outcome in zip(pdfs_to_download.items(), downloads)
+            if not isinstance(outcome, Exception)
+        }
 
-       return result
\ No newline at end of file
+        return self._result(downloaded, error)
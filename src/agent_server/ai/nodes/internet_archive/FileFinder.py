@@ -1,33 +1,131 @@
+import asyncio
 import logging
 from typing import Any, List, Optional, Dict
 
 from langchain_core.language_models import BaseChatModel
-from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.runnables import RunnableConfig, Runnable
 from langchain_core.runnables.utils import Output
 from pydantic import BaseModel, Field
 
+from ..structured import StructuredOutput
+from ...graphs.budget import RunBudget, budget_from
+from ...graphs.progress import found
+from ...prompts.compaction import DEFAULT_COMPACTOR
 from ...prompts.interface import IPromptTemplateFactoryInterface
 from ...states.internet_archive import InternetArchiveState
+from ....adapters.blob_store import BlobStore
+from ....adapters.internet_archive_records import IAFileTable, files_table
 
 
 class FileFinderNodeStructuredOutput(BaseModel):
    pdfs_to_download: List[str] = Field(description="List of PDF file names to download for this item")
 
 class FileFinderNode(Runnable):
+    """
+    Selects the PDF files to download per entry to consider.
+
+    The file list of an entry is read from the metadata, or from the `blob_store` when
+    the MetadataNode moved it there (`files_ref`), into an IAFileTable.
+
+    With a run budget (see RunBudget), entries reached after the LLM budget is exhausted
+    get the first candidate PDF (originals first) without an LLM call, and the selected
+    files are kept only as long as their sizes fit the download budget.
+    """
     llm: BaseChatModel
     prompt_factory: IPromptTemplateFactoryInterface
     logger: logging.Logger
+    blob_store: BlobStore | None
+    structured: StructuredOutput[FileFinderNodeStructuredOutput]
 
     def __init__(
             self,
             llm: BaseChatModel,
             prompt_factory: IPromptTemplateFactoryInterface,
-            logger: logging.Logger = None
+            logger: logging.Logger = None,
+            max_concurrency: int = 4,
+            blob_store: BlobStore | None = None,
     ):
         self.logger = logger or logging.getLogger(__name__)
         self.llm = llm
         self.prompt_factory = prompt_factory
+        self.max_concurrency = max_concurrency
+        self.blob_store = blob_store
+        self.structured = StructuredOutput(llm, FileFinderNodeStructuredOutput)
+
+    @staticmethod
+    def _no_entries() -> dict:
+        return {
+            "pdfs_to_download": {},
+            "error": "No entries_to_consider information to check"
+        }
+
+    def _files_to_choose_from(self, metadata: dict, name: str, aggregated_pdfs: Dict[str, List[str]], error: list) -> IAFileTable | None:
+        entry = metadata.get(name) or {}
+        if self.blob_store is not None:
+            files = files_table(self.blob_store.load(entry, "files"))
+        else:
+            files = files_table(entry.get("files"))
+
+        if not files:
+            # No Files present
+            error.append(f"No files present for entry {name}")
+            return None
+
+        if not DEFAULT_COMPACTOR.candidate_files(files):
+            # Nothing to choose from, skip the LLM call
+            self.logger.info(f"File Finder Node: no PDF files for entry {name}")
+            aggregated_pdfs.setdefault(name, [])
+            return None
+
+        return files
+
+    def _prompt(self, state: InternetArchiveState, name: str, files: IAFileTable):
+        return self.prompt_factory.create(
+            query=state["query"],
+            name=name,
+            files=files,
+            parser=self.structured.parser,
+        )
+
+    @staticmethod
+    def _fallback(files: IAFileTable) -> List[str]:
+        return [file["name"] for file in DEFAULT_COMPACTOR.compact_files(files)[:1]]
+
+    @staticmethod
+    def _within_budget(files: IAFileTable, selected: List[str], budget: RunBudget | None) -> List[str]:
+        if budget is None:
+            return selected
+        sizes = {file.name: file.size for file in files}
+        return [name for name in selected if budget.reserve_download(sizes.get(name))]
+
+    @classmethod
+    def _aggregate(cls, aggregated_pdfs: Dict[str, List[str]], name: str, selected: Any, files: IAFileTable, budget: RunBudget | None):
+        # Sanity check and aggregate
+        if isinstance(selected, list):
+            # make sure they are strings
+            selected = cls._within_budget(files, [s for s in selected if isinstance(s, str)], budget)
+            if name not in aggregated_pdfs:
+                aggregated_pdfs[name] = []
+            aggregated_pdfs[name].extend(selected)
+
+    @staticmethod
+    def _found(metadata: dict, name: str, files: IAFileTable, aggregated_pdfs: Dict[str, List[str]]):
+        # partial result for the stream: the chosen files with their sizes
+        selected = set(aggregated_pdfs.get(name) or [])
+        chosen = [file for file in files if file.name in selected]
+        if chosen:
+            found(name, ((metadata.get(name) or {}).get("metadata") or {}).get("title"), chosen)
+
+    @staticmethod
+    def _result(aggregated_pdfs: Dict[str, List[str]], error: list) -> dict:
+        result = {
+            "pdfs_to_download": aggregated_pdfs,
+        }
+
+        if error:
+            result["error"] = error
+
+        return result
 
     def invoke(self, state: InternetArchiveState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Output:
         entries_to_consider = state.get("entries_to_consider") or []
@@ -36,69 +134,63 @@ class FileFinderNode(Runnable):
         metadata_length = len(metadata)
         self.logger.info(f"File Finder Node invoked with entries len: {entries_to_consider_length} within metadata len: {metadata_length}")
         if not entries_to_consider or entries_to_consider_length == 0:
-            return {
-                **state,
-                "pdfs_to_download": [],
-                "error": state.get("error") or "No entries_to_consider information to check"
-            }
+            return self._no_entries()
 
-        #aggregated_pdfs: List[str] = []
         aggregated_pdfs: Dict[str, List[str]] = {}
-        error = state.get("error") or []
+        error: list = []
+        budget = budget_from(config)
 
         for name in entries_to_consider:
             try:
-                entry = metadata.get(name) or {}
-                files = entry.get("files") or []
-
-                if not files:
-                    # No Files present
-                    error.append(f"No files present for entry {name}")
+                files = self._files_to_choose_from(metadata, name, aggregated_pdfs, error)
+                if files is None:
                     continue
 
-                try:
-                    llm_structured = self.llm.with_structured_output(FileFinderNodeStructuredOutput)
-
-                    prompt = self.prompt_factory.create(
-                        query=state["query"],
-                        name=name,
-                        files=files,
-                    )
-                    response_obj: FileFinderNodeStructuredOutput = FileFinderNodeStructuredOutput(**llm_structured.invoke(prompt))
-                    selected = getattr(response_obj, "pdfs_to_download", [])
-
-                except Exception as e:
-                    self.logger.error(f"FileFinderNode structured output failed: {e}, fallback to JsonOutputParser")
-
-                    parser = JsonOutputParser(pydantic_object=FileFinderNodeStructuredOutput)
-
-                    prompt = self.prompt_factory.create(
-                        query=state["query"],
-                        name=name,
-                        files=files,
-                        parser=parser
-                    )
-
-                    llm_response = self.llm.invoke(prompt)
-                    parsed: dict = parser.parse(llm_response.content)
-                    selected = parsed.get("pdfs_to_download", [])
-
-                # Sanity check and aggregate
-                if isinstance(selected, list):
-                    # make sure they are strings
-                    selected = [s for s in selected if isinstance(s, str)]
-                    if name not in aggregated_pdfs:
-                        aggregated_pdfs[name] = []
-                    aggregated_pdfs[name].extend(selected)
+                if budget is not None and not budget.allows_llm():
+                    selected = self._fallback(files)
+                else:
+                    selected = self.structured.invoke(self._prompt(state, name, files)).pdfs_to_download
+                self._aggregate(aggregated_pdfs, name, selected, files, budget)
+                self._found(metadata, name, files, aggregated_pdfs)
             except Exception as e:
                 error.append(str(e))
 
-        result = {
-            **state,
-            "pdfs_to_download": aggregated_pdfs,
-        }
+        return self._result(aggregated_pdfs, error)
 
-        if error:
-            result["error"] = error
+    async def ainvoke(self, state: InternetArchiveState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Output:
+        entries_to_consider = state.get("entries_to_consider") or []
+        metadata = state.get("metadata") or {}
+        self.logger.info(f"File Finder Node invoked async with entries len: {len(entries_to_consider)} within metadata len: {len(metadata)}")
+        if not entries_to_consider:
+            return self._no_entries()
+
+        aggregated_pdfs: Dict[str, List[str]] = {}
+        error: list = []
+        budget = budget_from(config)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
 
-        return result
\ No newline at end of file
+        async def select(name: str, files: IAFileTable) -> Any:
+            async with semaphore:
+                if budget is not None and not budget.allows_llm():
+                    return self._fallback(files)
+                return (await self.structured.ainvoke(self._prompt(state, name, files))).pdfs_to_download
+
+        candidates = {}
+        for name in entries_to_consider:
+            files = self._files_to_choose_from(metadata, name, aggregated_pdfs, error)
+            if files is not None:
+                candidates[name] = files
+
+        answers = await asyncio.gather(
+            *(select(name, files) for name, files in candidates.items()),
+            return_exceptions=True,
+        )
+        for name, answer in zip(candidates, answers):
+            if isinstance(answer, Exception):
+                error.append(str(answer))
+            else:
+                self._aggregate(aggregated_pdfs, name, answer, candidates[name], budget)
+                self._found(metadata, name, candidates[name], aggregated_pdfs)
+
+        # keep the order of entries_to_consider
+        return self._result({name: aggregated_pdfs[name] for name in entries_to_consider if name in aggregated_pdfs}, error)
@@ -1,71 +1,182 @@
 import json
 import logging
+import time
 from typing import Any, List
 
 from langchain_core.language_models import BaseChatModel
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.runnables import RunnableSerializable, RunnableConfig, Runnable
+from langchain_core.runnables import RunnableSerializable, RunnableConfig, Runnable, RunnableLambda
 from pydantic import PrivateAttr, BaseModel, Field
 
+from ..structured import StructuredOutput
+from ...graphs.budget import RunBudget, budget_from
+from ...graphs.progress import progress
+from ...prompts.compaction import estimate_tokens
 from ...prompts.interface import IPromptTemplateFactoryInterface
 from ...states.internet_archive import InternetArchiveState
 
 class FilterResultsStructuredOutput(BaseModel):
    filtered_results: List[str] = Field(description="List of item identifiers filtered as relevant")
 
+def _identifier(result: Any) -> str:
+    if isinstance(result, dict):
+        return str(result.get("identifier"))
+    return str(result)
+
 class FilterNode(Runnable):
+    """
+    Filters the search results with the LLM in a map-reduce fashion.
+
+    The results are split into chunks that fit `chunk_token_budget`, the chunks are
+    evaluated concurrently (at most `max_concurrency` at once) and the kept identifiers
+    are merged back in the original search ranking. A chunk that cannot be evaluated is
+    kept unfiltered, so one bad answer does not drop or pass through the whole list.
+
+    Chunks reached after the run budget is exhausted (see RunBudget) are kept unfiltered
+    without an LLM call.
+    """
     llm: BaseChatModel
     prompt_factory: IPromptTemplateFactoryInterface
     logger: logging.Logger
+    chunk_token_budget: int
+    max_concurrency: int
+    structured: StructuredOutput[FilterResultsStructuredOutput]
 
-    def __init__(self, llm, prompt_factory, logger):
+    def __init__(self, llm, prompt_factory, logger, chunk_token_budget: int = 1500, max_concurrency: int = 2):
         self.logger = logger or logging.getLogger(__name__)
         self.llm = llm
         self.prompt_factory = prompt_factory
+        self.chunk_token_budget = chunk_token_budget
+        self.max_concurrency = max_concurrency
+        self.structured = StructuredOutput(llm, FilterResultsStructuredOutput)
+
+    def chunk_results(self, results: List[Any]) -> List[List[Any]]:
+        chunks: List[List[Any]] = []
+        current: List[Any] = []
+        used = 0
+        for result in results:
+            tokens = estimate_tokens(json.dumps(result)) + 1
+            if current and used + tokens > self.chunk_token_budget:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(result)
+            used += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _prompt(self, query: str, chunk: List[Any]):
+        return self.prompt_factory.create(
+            query=query,
+            results=json.dumps(chunk),
+            parser=self.structured.parser,
+        )
+
+    @staticmethod
+    def _kept(filtered_results: Any) -> List[str]:
+        if not isinstance(filtered_results, list):
+            filtered_results = []
+
+        return [r for r in filtered_results if isinstance(r, str)]
+
+    def _filter_chunk(self, query: str, chunk: List[Any]) -> List[str]:
+        return self._kept(self.structured.invoke(self._prompt(query, chunk)).filtered_results)
+
+    async def _afilter_chunk(self, query: str, chunk: List[Any]) -> List[str]:
+        return self._kept((await self.structured.ainvoke(self._prompt(query, chunk))).filtered_results)
+
+    def _evaluation(self, index: int, chunk: List[Any], kept: List[str] | None, error: Exception | None, start: float) -> dict:
+        if error is not None:
+            kept = [_identifier(r) for r in chunk]  # Fall back to the unfiltered chunk
+        seconds = time.perf_counter() - start
+        self.logger.info(f"FilterNode chunk {index}: {len(chunk)} results, kept {len(kept)} in {seconds:.2f}s")
+        return {
+            "chunk": index,
+            "size": len(chunk),
+            "kept": kept,
+            "seconds": seconds,
+            "error": f"Filter error in chunk {index}: {str(error)}" if error is not None else None,
+        }
+
+    def _unevaluated(self, index: int, chunk: List[Any], start: float) -> dict:
+        return self._evaluation(index, chunk, [_identifier(r) for r in chunk], None, start) | {"budget_exhausted": True}
+
+    def _evaluate_chunk(self, query: str, index: int, chunk: List[Any], budget: RunBudget | None = None) -> dict:
+        start = time.perf_counter()
+        if budget is not None and not budget.allows_llm():
+            return self._unevaluated(index, chunk, start)
+        try:
+            return self._evaluation(index, chunk, self._filter_chunk(query, chunk), None, start)
+        except Exception as e:
+            return self._evaluation(index, chunk, None, e, start)
+
+    async def _aevaluate_chunk(self, query: str, index: int, chunk: List[Any], budget: RunBudget | None = None) -> dict:
+        start = time.perf_counter()
+        if budget is not None and not budget.allows_llm():
+            return self._unevaluated(index, chunk, start)
+        try:
+            return self._evaluation(index, chunk, await self._afilter_chunk(query, chunk), None, start)
+        except Exception as e:
+            return self._evaluation(index, chunk, None, e, start)
+
+    @staticmethod
+    def _no_results() -> dict:
+        return {
+            "filtered_results": [],
+            "error": "No results to filter"
+        }
+
+    def _evaluator(self, query: str, budget: RunBudget | None) -> Runnable:
+        async def aevaluate(indexed):
+            return await self._aevaluate_chunk(query, *indexed, budget=budget)
+
+        return RunnableLambda(lambda indexed: self._evaluate_chunk(query, *indexed, budget=budget), afunc=aevaluate)
+
+    def _merge(self, results: List[Any], evaluations: List[dict]) -> dict:
+        # Reduce: keep the original search ranking, ignore identifiers the LLM made up
+        kept = {identifier for evaluation in evaluations for identifier in evaluation["kept"]}
+        filtered_results = [_identifier(r) for r in results if _identifier(r) in kept]
+        progress(
+            "filter", f"filter: {len(filtered_results)} of {len(results)} relevant",
+            kept=len(filtered_results), total=len(results),
+        )
+
+        result = {
+            "filtered_results": filtered_results,
+            "filter_timings": [
+                {k: v for k, v in evaluation.items() if k != "kept"} | {"kept": len(evaluation["kept"])}
+                for evaluation in evaluations
+            ],
+        }
+
+        errors = [evaluation["error"] for evaluation in evaluations if evaluation["error"]]
+        if errors:
+            result["error"] = errors
+
+        return result
 
     def invoke(self, state: InternetArchiveState, config: Any = None, **kwargs: Any) -> dict:
         results = state.get("results")
         results_len = len(state.get("results", []))
         self.logger.info(f"FilterNode invoked with results len: {results_len}")
         if not results or results_len == 0:
-            return {
-                **state,
-                "filtered_results": [],
-                "error": state.get("error") or "No results to filter"
-            }
+            return self._no_results()
 
-        try:
-            # First, try structured output via Pydantic
-            try:
-                # Second, try structured llm
-                llm_structured = self.llm.with_structured_output(FilterResultsStructuredOutput)
-                prompt = self.prompt_factory.create(
-                    query=state["query"],
-                    results=json.dumps(state["results"]),
-                )
-                response = FilterResultsStructuredOutput(**llm_structured.invoke(prompt))
-                filtered_results = getattr(response, "filtered_results", [])
-
-            except Exception as e:
-                # Fallback to JsonOutputParser with format instructions
-                self.logger.error(f"FilterNode structured output failed: {e}, fallback to JsonOutputParser")
-                parser = JsonOutputParser(pydantic_object=FilterResultsStructuredOutput)
-                prompt = self.prompt_factory.create(
-                    query=state["query"],
-                    results=json.dumps(state["results"]),
-                    parser=parser,
-                )
-                llm_response = self.llm.invoke(prompt)
-                parsed: dict = parser.parse(llm_response.content)
-                filtered_results = parsed.get("filtered_results", [])
-
-            if not isinstance(filtered_results, list):
-                filtered_results = []
-
-            return {**state, "filtered_results": filtered_results}
-        except Exception as e:
-            return {
-                **state,
-                "filtered_results": state.get("results", []),  # Fall back to unfiltered results
-                "error": f"Filter error: {str(e)}"
-            }
\ No newline at end of file
+        chunks = self.chunk_results(results)
+        evaluations = self._evaluator(state["query"], budget_from(config)).batch(
+            list(enumerate(chunks)),
+            config={"max_concurrency": self.max_concurrency},
+        )
+        return self._merge(results, evaluations)
+
+    async def ainvoke(self, state: InternetArchiveState, config: Any = None, **kwargs: Any) -> dict:
+        results = state.get("results")
+        self.logger.info(f"FilterNode invoked async with results len: {len(results or [])}")
+        if not results:
+            return self._no_results()
+
+        chunks = self.chunk_results(results)
+        evaluations = await self._evaluator(state["query"], budget_from(config)).abatch(
+            list(enumerate(chunks)),
+            config={"max_concurrency": self.max_concurrency},
+        )
+        return self._merge(results, evaluations)
@@ -1,89 +1,234 @@
+import asyncio
 import logging
+from dataclasses import dataclass
 from typing import Any, Optional
 
 from langchain_core.language_models import BaseChatModel
-from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.runnables import RunnableConfig, Runnable
 from langchain_core.runnables.utils import Output
 from pydantic import BaseModel, Field
 
+from ..structured import StructuredOutput
+from ...graphs.budget import budget_from
+from ...graphs.progress import progress
 from ...prompts.interface import IPromptTemplateFactoryInterface
+from ...rankers.embedding import EmbeddingRanker
 from ...states.internet_archive import InternetArchiveState
 
 
 class FinderNodeStructuredOutput(BaseModel):
    is_this_entry_relevant: bool = Field(description="Whether the entry is relevant to the query")
 
+@dataclass(frozen=True, slots=True)
+class FinderEarlyStop:
+    """
+    When to stop judging entries: `max_hits` relevant entries were found, or another
+    hit has become unlikely.
+
+    The probability of a hit in the next entry is the hit rate of the entries judged
+    so far with Laplace smoothing, (hits + 1) / (judged + 2): 0.5 before the first
+    answer, falling with every miss. Entries are judged `window` at a time, at most as
+    many as hits are missing to `max_hits`.
+    """
+
+    max_hits: int = 2
+    min_hit_probability: float = 0.1
+    window: int = 2
+
+    @staticmethod
+    def hit_probability(hits: int, judged: int) -> float:
+        return (hits + 1) / (judged + 2)
+
+    def should_stop(self, hits: int, judged: int) -> bool:
+        return hits >= self.max_hits or self.hit_probability(hits, judged) < self.min_hit_probability
+
+    def wave_size(self, hits: int) -> int:
+        """The entries of the next window, no more than the hits still missing."""
+        return max(1, min(self.window, self.max_hits - hits))
+
+
 class FinderNode(Runnable):
+    """
+    Decides per metadata entry whether it is relevant for the query.
+
+    With a `ranker`, entries are first scored by embedding similarity. Clear hits are
+    accepted and clear misses rejected without an LLM call, only the uncertain band is
+    judged by the LLM.
+
+    With `early_stop`, the entries are judged in rank order (ranker score, else the
+    filter ranking) and judging stops as soon as the FinderEarlyStop says so, at most
+    `max_hits` entries are handed on to the file finder.
+
+    Once the run budget is exhausted (see RunBudget) no further entries are judged, the
+    entries accepted so far are returned.
+    """
     llm: BaseChatModel
     prompt_factory: IPromptTemplateFactoryInterface
     logger: logging.Logger
+    ranker: EmbeddingRanker | None
+    structured: StructuredOutput[FinderNodeStructuredOutput]
 
     def __init__(
             self,
             llm: BaseChatModel,
             prompt_factory: IPromptTemplateFactoryInterface,
-            logger: logging.Logger = None
+            logger: logging.Logger = None,
+            ranker: EmbeddingRanker | None = None,
+            max_concurrency: int = 4,
+            early_stop: FinderEarlyStop | None = None,
     ):
         self.logger = logger or logging.getLogger(__name__)
         self.llm = llm
         self.prompt_factory = prompt_factory
+        self.ranker = ranker
+        self.max_concurrency = max_concurrency
+        self.early_stop = early_stop
+        self.structured = StructuredOutput(llm, FinderNodeStructuredOutput)
+
+    @staticmethod
+    def _no_metadata() -> dict:
+        return {
+            "entries_to_consider": [],
+            "error": "No metadata information to check"
+        }
+
+    @staticmethod
+    def _ranker_entries(metadata: dict) -> dict:
+        return {name: (info or {}).get("metadata") for name, info in metadata.items()}
+
+    def _prompt(self, state: InternetArchiveState, name: str, metadata_info: dict):
+        return self.prompt_factory.create(
+            query=state["query"],
+            name=name,
+            metadata=metadata_info.get("metadata") or {},
+            parser=self.structured.parser,
+        )
+
+    @staticmethod
+    def _in_rank_order(names: list[str], scores: dict[str, float]) -> list[str]:
+        return sorted(names, key=lambda name: -scores.get(name, 0.0)) if scores else list(names)
+
+    def _stops(self, hits: int, judged: int, remaining: int) -> bool:
+        if self.early_stop is None or not self.early_stop.should_stop(hits, judged):
+            return False
+        self.logger.info(f"Finder Node early stop after {hits} hits in {judged} entries, {remaining} entries not judged")
+        return True
+
+    def _result(
+            self,
+            metadata: dict,
+            accepted: list[str],
+            entries_to_consider: list[str],
+            scores: dict[str, float],
+            error: list,
+    ) -> dict:
+        relevant = [*accepted, *entries_to_consider]
+        if self.early_stop is not None:
+            relevant = relevant[:self.early_stop.max_hits]
+        # keep the ranking of the metadata (filtered results)
+        relevant = set(relevant)
+        entries_to_consider = [name for name in metadata.keys() if name in relevant]
+        progress(
+            "finder", f"relevant: {len(entries_to_consider)} of {len(metadata)}",
+            items=len(metadata), relevant=len(entries_to_consider),
+        )
+
+        result = {
+            "entries_to_consider":entries_to_consider,
+        }
+
+        if scores:
+            result["relevance_scores"] = scores
+
+        if error:
+            result["error"] = error
+
+        return result
 
     def invoke(self, state: InternetArchiveState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Output:
         metadata = state.get("metadata") or {}
         metadata_length = len(metadata)
         self.logger.info(f"Finder Node invoked with results len: {metadata_length}")
         if not metadata or metadata_length == 0:
-            return {
-                **state,
-                "entries_to_consider": [],
-                "error": state.get("error") or "No metadata information to check"
-            }
+            return self._no_metadata()
 
         entries_to_consider = []
-        error = state.get("error") or []
+        error: list = []
+        accepted: list[str] = []
+        to_evaluate: list[str] = list(metadata.keys())
+        scores: dict[str, float] = {}
 
-        for name, metadata_info in metadata.items():
+        if self.ranker is not None:
             try:
-                actual_metadata = metadata_info.get("metadata") or {}
-
-                try:
-                    llm = self.llm.with_structured_output(FinderNodeStructuredOutput)
-
-                    prompt = self.prompt_factory.create(
-                        query=state["query"],
-                        name=name,
-                        metadata=actual_metadata,
-                    )
-                    response: FinderNodeStructuredOutput = FinderNodeStructuredOutput(**llm.invoke(prompt))
-
-                except Exception as e:
-                    self.logger.error(f"Error setting structured output: {e}, fallback to Json output parser")
+                ranked = self.ranker.partition(state["query"], self._ranker_entries(metadata))
+                accepted, to_evaluate, scores = ranked.accepted, ranked.uncertain, ranked.scores
+            except Exception as e:
+                self.logger.error(f"Finder Node ranking failed: {e}, evaluating all entries with the LLM")
+
+        accepted, to_evaluate = self._in_rank_order(accepted, scores), self._in_rank_order(to_evaluate, scores)
+        # accepted and rejected by the ranker
+        judged = len(metadata) - len(to_evaluate)
+        budget = budget_from(config)
+        for position, name in enumerate(to_evaluate):
+            if budget is not None and not budget.allows_llm():
+                self.logger.info(f"Finder Node budget exhausted, {len(to_evaluate) - position} entries not judged")
+                break
+            if self._stops(len(accepted) + len(entries_to_consider), judged + position, len(to_evaluate) - position):
+                break
+            try:
+                response = self.structured.invoke(self._prompt(state, name, metadata[name]))
 
-                    parser = JsonOutputParser(pydantic_object=FinderNodeStructuredOutput)
+                if response.is_this_entry_relevant:
+                    entries_to_consider.append(name)
+            except Exception as e:
+                error.append(str(e))
 
-                    prompt = self.prompt_factory.create(
-                        query=state["query"],
-                        name=name,
-                        metadata=actual_metadata,
-                        parser=parser
-                    )
+        return self._result(metadata, accepted, entries_to_consider, scores, error)
 
-                    llm_response = self.llm.invoke(prompt)
+    async def ainvoke(self, state: InternetArchiveState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Output:
+        metadata = state.get("metadata") or {}
+        self.logger.info(f"Finder Node invoked async with results len: {len(metadata)}")
+        if not metadata:
+            return self._no_metadata()
 
-                    response: dict = parser.parse(llm_response.content)
+        error: list = []
+        accepted: list[str] = []
+        to_evaluate: list[str] = list(metadata.keys())
+        scores: dict[str, float] = {}
 
-                if response.get("is_this_entry_relevant"):
-                   entries_to_consider.append(name)
+        if self.ranker is not None:
+            try:
+                ranked = await self.ranker.apartition(state["query"], self._ranker_entries(metadata))
+                accepted, to_evaluate, scores = ranked.accepted, ranked.uncertain, ranked.scores
             except Exception as e:
-                    error.append(str(e))
+                self.logger.error(f"Finder Node ranking failed: {e}, evaluating all entries with the LLM")
 
-        result = {
-            **state,
-            "entries_to_consider":entries_to_consider,
-        }
+        accepted, to_evaluate = self._in_rank_order(accepted, scores), self._in_rank_order(to_evaluate, scores)
+        judged = len(metadata) - len(to_evaluate)
+        budget = budget_from(config)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
 
-        if error:
-            result["error"] = error
+        async def evaluate(name: str) -> bool:
+            async with semaphore:
+                if budget is not None and not budget.allows_llm():
+                    return False
+                response = await self.structured.ainvoke(self._prompt(state, name, metadata[name]))
+                return response.is_this_entry_relevant
 
-        return result
\ No newline at end of file
+        entries_to_consider = []
+        start = 0
+        while start < len(to_evaluate):
+            hits = len(accepted) + len(entries_to_consider)
+            if self._stops(hits, judged + start, len(to_evaluate) - start):
+                break
+            window = self.early_stop.wave_size(hits) if self.early_stop is not None else len(to_evaluate)
+            names = to_evaluate[start:start + window]
+            start += len(names)
+            answers = await asyncio.gather(*(evaluate(name) for name in names), return_exceptions=True)
+            for name, answer in zip(names, answers):
+                if isinstance(answer, Exception):
+                    error.append(str(answer))
+                elif answer:
+                    entries_to_consider.append(name)
+
+        return self._result(metadata, accepted, entries_to_consider, scores, error)
@@ -1,25 +1,54 @@
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, List, Tuple, Optional, Iterator
 
 from langchain_core.runnables import RunnableSerializable
 from pydantic import PrivateAttr
 
+from ...graphs.budget import RunBudget, budget_from
+from ...graphs.progress import progress
 from ...states.internet_archive import InternetArchiveState
+from ....adapters.blob_store import BlobStore
 from ....adapters.internet_archive import InternetArchiveSearchWrapper
 
 
+def offload_files(metadata: dict, blob_store: BlobStore | None) -> dict:
+    """Moves the file lists of the metadata entries into the blob store (`files_ref`)."""
+    if blob_store is None:
+        return metadata
+    return {item_id: blob_store.offload(item, "files") for item_id, item in metadata.items()}
+
+
 class MetadataNode(RunnableSerializable):
+    """
+    Fetches the metadata of the filtered results.
+
+    With a `_blob_store`, the file list of every entry is kept out of the graph state,
+    the entry carries the handle as `files_ref` (see FileFinderNode).
+
+    Past the deadline of the run budget (see RunBudget) only the prefetched entries are
+    used, nothing more is fetched.
+    """
 
     ia: InternetArchiveSearchWrapper
+    # concurrent IA requests of `ainvoke`
+    max_concurrency: int = 8
     _logger: logging.Logger = PrivateAttr()
+    _blob_store: BlobStore | None = PrivateAttr()
 
     def __init__(self, **data):
         logger = data.pop("_logger", None)
+        blob_store = data.pop("_blob_store", None)
         super().__init__(**data)
         self._logger = logger or logging.getLogger(__name__)
+        self._blob_store = blob_store
 
-    def receive_metadata(self,filtered:List[str]) -> Iterator[Tuple[Optional[str], Optional[dict], bool]]:
+    def receive_metadata(self,filtered:List[str], budget: RunBudget | None = None) -> Iterator[Tuple[Optional[str], Optional[dict], bool]]:
         for item_id in filtered:
+            if budget is not None and budget.expired():
+                self._logger.info(f"MetadataNode deadline reached, not fetching {item_id}")
+                break
             try:
                 metadata = self.ia.item_metadata(item_id)
                 yield item_id, metadata, True
@@ -30,30 +59,144 @@ class MetadataNode(RunnableSerializable):
 
         yield None, None, False
 
+    def _reuse_prefetched(self, state: InternetArchiveState, filtered: List[str]) -> Tuple[dict, List[str]]:
+        # Speculatively prefetched metadata: reuse what the filter kept, discard the rest
+        prefetched = state.get("prefetched_metadata") or {}
+        metadata: dict[str, Any] = {
+            item_id: prefetched[item_id] for item_id in filtered if item_id in prefetched
+        }
+        missing = [item_id for item_id in filtered if item_id not in metadata]
+        if prefetched:
+            self._logger.info(
+                f"MetadataNode reused {len(metadata)} prefetched, discarded {len(set(prefetched) - set(metadata))}, fetching {len(missing)}"
+            )
+        return metadata, missing
+
+    def _metadata_result(self, filtered: List[str], metadata: dict) -> dict:
+        # keep the filter ranking
+        metadata = {item_id: metadata[item_id] for item_id in filtered if item_id in metadata}
+        meta_len = len(metadata)
+        self._logger.info(f"MetadataNode result: {meta_len}")
+        progress("metadata", f"metadata: {', '.join(metadata)}", items=meta_len)
+        return {"metadata": offload_files(metadata, self._blob_store), "prefetched_metadata": None}
+
+    @staticmethod
+    def _no_filtered_results() -> dict:
+        return {
+            "metadata": {},
+            "error": "No filtered results to get metadata for",
+        }
+
     def invoke(self, state: InternetArchiveState, config: Any = None, **kwargs) -> dict:
         filtered = state.get("filtered_results") or []
         filter_len = len(filtered)
         self._logger.info(f"MetadataNode invoked with state: {filter_len}")
 
         if len(filtered) == 0:
-            return {
-                **state,
-                "metadata": {},
-                "error": state.get("error") or "No filtered results to get metadata for",
-            }
+            return self._no_filtered_results()
+
+        metadata, missing = self._reuse_prefetched(state, filtered)
 
-        metadata: dict[str, Any] = {}
         try:
-            for (item_id, item, success) in self.receive_metadata(filtered):
+            for (item_id, item, success) in self.receive_metadata(missing, budget_from(config)):
                 if success:
                     metadata[item_id] = item
                 else:
                     break
 
-            meta_len = len(metadata)
-            self._logger.info(f"MetadataNode result: {meta_len}")
-            return {**state, "metadata": metadata}
+            return self._metadata_result(filtered, metadata)
         except Exception as e:
             error = str(e)
             self._logger.error(f"MetadataNode Error: {error}")
-            return {**state, "metadata": {}, "error": f"Metadata error: {error}"}
+            return {"metadata": {}, "prefetched_metadata": None, "error": f"Metadata error: {error}"}
+
+    async def ainvoke(self, state: InternetArchiveState, config: Any = None, **kwargs) -> dict:
+        filtered = state.get("filtered_results") or []
+        self._logger.info(f"MetadataNode invoked async with state: {len(filtered)}")
+
+        if len(filtered) == 0:
+            return self._no_filtered_results()
+
+        metadata, missing = self._reuse_prefetched(state, filtered)
+        budget = budget_from(config)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+        async def fetch(item_id: str) -> Tuple[str, Optional[dict]]:
+            async with semaphore:
+                if budget is not None and budget.expired():
+                    return item_id, None
+                try:
+                    return item_id, await self.ia.aitem_metadata(item_id)
+                except Exception as e:
+                    self._logger.error(f"receive Metadata Error: {e}")
+                    return item_id, None
+
+        for item_id, item in await asyncio.gather(*(fetch(item_id) for item_id in missing)):
+            if item is not None:
+                metadata[item_id] = item
+
+        return self._metadata_result(filtered, metadata)
+
+
+class MetadataPrefetchNode(RunnableSerializable):
+    """
+    Fetches the metadata of the top `depth` search results while the filter LLM runs.
+
+    Runs in parallel to the FilterNode and only writes `prefetched_metadata`, the
+    MetadataNode picks up the entries which survived the filter.
+    """
+
+    ia: InternetArchiveSearchWrapper
+    depth: int = 10
+    max_workers: int = 4
+    _logger: logging.Logger = PrivateAttr()
+    _blob_store: BlobStore | None = PrivateAttr()
+
+    def __init__(self, **data):
+        logger = data.pop("_logger", None)
+        blob_store = data.pop("_blob_store", None)
+        super().__init__(**data)
+        self._logger = logger or logging.getLogger(__name__)
+        self._blob_store = blob_store
+
+    def _fetch(self, item_id: str) -> Tuple[str, Optional[dict]]:
+        try:
+            return item_id, self.ia.item_metadata(item_id)
+        except Exception as e:
+            self._logger.error(f"Prefetch Metadata Error for {item_id}: {e}")
+            return item_id, None
+
+    def invoke(self, state: InternetArchiveState, config: Any = None, **kwargs) -> dict:
+        candidates = (state.get("results") or [])[:self.depth]
+        self._logger.info(f"MetadataPrefetchNode prefetching: {len(candidates)}")
+        if not candidates:
+            return {"prefetched_metadata": {}}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(candidates)))) as executor:
+            fetched = executor.map(self._fetch, candidates)
+            prefetched = {item_id: item for item_id, item in fetched if item is not None}
+
+        self._logger.info(f"MetadataPrefetchNode result: {len(prefetched)}")
+        return {"prefetched_metadata": offload_files(prefetched, self._blob_store)}
+
+    async def ainvoke(self, state: InternetArchiveState, config: Any = None, **kwargs) -> dict:
+        candidates = (state.get("results") or [])[:self.depth]
+        self._logger.info(f"MetadataPrefetchNode prefetching async: {len(candidates)}")
+        if not candidates:
+            return {"prefetched_metadata": {}}
+
+        semaphore = asyncio.Semaphore(max(1, self.max_workers))
+
+        async def fetch(item_id: str) -> Tuple[str, Optional[dict]]:
+            async with semaphore:
+                try:
+                    return item_id, await self.ia.aitem_metadata(item_id)
+                except Exception as e:
+                    self._logger.error(f"Prefetch Metadata Error for {item_id}: {e}")
+                    return item_id, None
+
+        fetched = await asyncio.gather(*(fetch(item_id) for item_id in candidates))
+        prefetched = {item_id: item for item_id, item in fetched if item is not None}
+
+        self._logger.info(f"MetadataPrefetchNode result: {len(prefetched)}")
+        return {"prefetched_metadata": offload_files(prefetched, self._blob_store)}
@@ -5,6 +5,7 @@ from typing import Any
 from langchain_core.runnables import RunnableSerializable
 from pydantic import PrivateAttr
 
+from ...graphs.progress import progress
 from ...states.internet_archive import InternetArchiveState
 from ....adapters.internet_archive import InternetArchiveSearchWrapper
 
@@ -20,27 +21,36 @@ class SearchNode(RunnableSerializable):
         super().__init__(**data)
         self._logger = logger or logging.getLogger(__name__)
 
+    def _search_result(self, result: str) -> dict:
+        result_dict = json.loads(str(result))
+        items = result_dict.get("items", [])
+        result_len = len(items)
+        self._logger.info(f"SearchNode result: {result_len}")
+        progress("search", f"search: {result_len} hits", hits=result_len)
+
+        result = {"results": items}
+        if result_dict.get("error"):
+            result["error"] = result_dict["error"]
+        return result
+
     def invoke(self, state: InternetArchiveState, config: Any = None, **kwargs) -> dict:
         query = state.get("query")
         self._logger.info(f"SearchNode invoked with state: {query}")
         if not query:
-            return {**state, "results": [], "error": state.get("error") or "Missing query"}
+            return {"results": [], "error": "Missing query"}
+
+        try:
+            return self._search_result(self.ia.search(query))
+        except Exception as e:
+            return {"results": [], "error": f"Search error: {str(e)}"}
+
+    async def ainvoke(self, state: InternetArchiveState, config: Any = None, **kwargs) -> dict:
+        query = state.get("query")
+        self._logger.info(f"SearchNode invoked async with state: {query}")
+        if not query:
+            return {"results": [], "error": "Missing query"}
 
         try:
-            result = self.ia.search(query)
-            result_dict = json.loads(str(result))
-            items = result_dict.get("items", [])
-            result_len = len(items)
-            self._logger.info(f"SearchNode result: {result_len}")
-
-            return {
-                **state,
-                "results": items,
-                "error": result_dict.get("error"),
-            }
+            return self._search_result(await self.ia.asearch(query))
         except Exception as e:
-            return {
-                **state,
-                "results": [],
-                "error": f"Search error: {str(e)}",
-            }
\ No newline at end of file
+            return {"results": [], "error": f"Search error: {str(e)}"}
@@ -0,0 +1,65 @@
+from functools import lru_cache
+from typing import Any, Generic, Optional, Type, TypeVar
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_ollama import ChatOllama
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def json_schema(schema: Type[BaseModel]) -> dict:
+    """JSON schema of a pydantic model, built once per model."""
+    return schema.model_json_schema()
+
+
+class StructuredOutput(Generic[T]):
+    """
+    Asks an LLM for an answer matching a pydantic model, in exactly one round trip.
+
+    - ChatOllama gets the JSON schema as `format`, Ollama then constrains decoding to
+      the schema and the answer is validated straight into the model
+    - other chat models use their native `with_structured_output`
+    - models without structured output support (e.g. test fakes) get the format
+      instructions of a JsonOutputParser in the prompt, see `parser`
+
+    The mode is decided once when the node is built, a failed answer is not retried.
+    """
+
+    schema: Type[T]
+    runnable: Runnable
+    parser: Optional[JsonOutputParser]
+
+    def __init__(self, llm: BaseChatModel, schema: Type[T]):
+        self.schema = schema
+        self.parser = None
+        if isinstance(llm, ChatOllama):
+            self.runnable = llm.bind(format=json_schema(schema))
+            self.mode = "ollama_format"
+            return
+        try:
+            self.runnable = llm.with_structured_output(schema)
+            self.mode = "structured_output"
+        except NotImplementedError:
+            self.parser = JsonOutputParser(pydantic_object=schema)
+            self.runnable = llm
+            self.mode = "json_parser"
+
+    def parse(self, response: Any) -> T:
+        if isinstance(response, self.schema):
+            return response
+        if isinstance(response, dict):
+            return self.schema.model_validate(response)
+        content = getattr(response, "content", response)
+        if self.parser is not None:
+            return self.schema.model_validate(self.parser.parse(content))
+        return self.schema.model_validate_json(content)
+
+    def invoke(self, prompt: Any, config: Optional[RunnableConfig] = None) -> T:
+        return self.parse(self.runnable.invoke(prompt, config=config))
+
+    async def ainvoke(self, prompt: Any, config: Optional[RunnableConfig] = None) -> T:
+        return self.parse(await self.runnable.ainvoke(prompt, config=config))
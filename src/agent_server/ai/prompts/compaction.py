@@ -0,0 +1,127 @@
+import json
+import re
+from typing import Any, Final, Iterable
+
+from ...adapters.internet_archive_records import IAFileTable, files_table
+
+# Roughly one BPE token per word or punctuation mark, and ~4 characters per token for
+# long identifiers/hashes. Good enough to keep prompts inside a budget without a tokenizer.
+_TOKEN_PATTERN: Final = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(len(_TOKEN_PATTERN.findall(text)), len(text) // 4)
+
+
+# Metadata fields in priority order; fields at the end are dropped first.
+METADATA_FIELDS: Final[tuple[str, ...]] = (
+    "identifier",
+    "title",
+    "mediatype",
+    "description",
+    "subject",
+    "creator",
+    "date",
+    "year",
+    "language",
+    "publisher",
+    "collection",
+)
+
+FILE_FIELDS: Final[tuple[str, ...]] = ("name", "format", "source", "size")
+
+
+class MetadataCompactor:
+    """
+    Shrinks Internet Archive metadata before it is rendered into a prompt.
+
+    - item metadata: whitelisted fields only, long texts truncated, long lists capped
+    - file lists: only candidate (PDF) files with the fields needed to pick one, read
+      from the columnar IAFileTable without building a dict per file
+    - both are cut down to a token budget (estimated locally, see `estimate_tokens`),
+      the budget of the metadata is a hard cap: identifier and title are truncated last
+    """
+
+    def __init__(
+            self,
+            metadata_token_budget: int = 600,
+            files_token_budget: int = 1200,
+            description_max_chars: int = 500,
+            list_max_entries: int = 10,
+    ):
+        self.metadata_token_budget = metadata_token_budget
+        self.files_token_budget = files_token_budget
+        self.description_max_chars = description_max_chars
+        self.list_max_entries = list_max_entries
+
+    def _compact_value(self, value: Any, max_chars: int) -> Any:
+        if isinstance(value, str):
+            value = " ".join(value.split())
+            return value if len(value) <= max_chars else value[:max_chars].rstrip() + "…"
+        if isinstance(value, (list, tuple)):
+            return [self._compact_value(v, max_chars) for v in value[:self.list_max_entries]]
+        return value
+
+    def compact_metadata(self, metadata: dict | None) -> dict:
+        metadata = metadata or {}
+        compacted = {
+            field: self._compact_value(metadata[field], self.description_max_chars)
+            for field in METADATA_FIELDS
+            if metadata.get(field) not in (None, "", [])
+        }
+
+        # Over budget: first shorten the description, then drop low priority fields.
+        if self._tokens(compacted) > self.metadata_token_budget and "description" in compacted:
+            compacted["description"] = self._compact_value(
+                compacted["description"], self.description_max_chars // 4
+            )
+        for field in reversed(METADATA_FIELDS[2:]):
+            if self._tokens(compacted) <= self.metadata_token_budget:
+                break
+            compacted.pop(field, None)
+
+        return self._fit_mandatory(compacted)
+
+    def _fit_mandatory(self, compacted: dict) -> dict:
+        """Truncates the title, then the identifier, until the metadata fits its budget."""
+        for field in reversed(METADATA_FIELDS[:2]):
+            while field in compacted and self._tokens(compacted) > self.metadata_token_budget:
+                value = compacted[field]
+                text = (" ".join(map(str, value)) if isinstance(value, list) else str(value)).removesuffix("…")
+                if not text:
+                    break
+                keep = min(len(text) - 1, len(text) * self.metadata_token_budget // self._tokens(compacted))
+                compacted[field] = self._compact_value(text, keep)
+        return compacted
+
+    def candidate_files(self, files: IAFileTable | dict | Iterable[dict] | None) -> list[dict]:
+        return [
+            file.to_dict(FILE_FIELDS)
+            for file in files_table(files)
+            if file.is_pdf and not file.old_version
+        ]
+
+    def compact_files(self, files: IAFileTable | dict | Iterable[dict] | None) -> list[dict]:
+        candidates = self.candidate_files(files)
+        # original uploads first, they are usually the best scan
+        candidates.sort(key=lambda f: f.get("source") != "original")
+
+        compacted: list[dict] = []
+        used = 2
+        for file in candidates:
+            tokens = self._tokens(file) + 1
+            if compacted and used + tokens > self.files_token_budget:
+                break
+            compacted.append(file)
+            used += tokens
+
+        return compacted
+
+    @staticmethod
+    def _tokens(value: Any) -> int:
+        return estimate_tokens(json.dumps(value, ensure_ascii=False))
+
+
+DEFAULT_COMPACTOR: Final[MetadataCompactor] = MetadataCompactor()
@@ -6,6 +6,8 @@ from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 
 from agent_server.ai.prompts.interface import IPromptTemplateFactoryInterface
+from agent_server.ai.prompts.compaction import MetadataCompactor, DEFAULT_COMPACTOR
+from agent_server.adapters.internet_archive_records import IAFileTable
 
 _TEMPLATE_FILTER: Final[str] = """You are a helpful assistant that filters Internet Archive search results.
 The user is looking for: {query}
@@ -79,14 +81,16 @@ class FinderPromptFactory(IPromptTemplateFactoryInterface, BaseModel):
             query: str,
             name: str,
             metadata:dict,
-            parser:Optional[JsonOutputParser],
+            parser:Optional[JsonOutputParser] = None,
+            compactor:Optional[MetadataCompactor] = None,
     ) -> str:
         template: str = _TEMPLATE_FINDER
+        compactor = compactor or DEFAULT_COMPACTOR
 
         params=dict(
             query=query,
             name=name,
-            metadata=json.dumps(metadata),
+            metadata=json.dumps(compactor.compact_metadata(metadata), ensure_ascii=False),
         )
 
         if parser is not None:
@@ -119,7 +123,7 @@ User query:
 Item identifier/name:
 {name}
 
-All available files for this item (JSON array):
+Candidate files for this item (JSON array, non-PDF derivatives are already removed):
 {files}
 
 Instructions:
@@ -141,14 +145,16 @@ class FileFinderPromptFactory(IPromptTemplateFactoryInterface, BaseModel):
         cls,
         query: str,
         name: str,
-        files: list[dict],
+        files: IAFileTable | list[dict],
         parser: Optional[JsonOutputParser] = None,
+        compactor: Optional[MetadataCompactor] = None,
     ) -> str:
         template: str = _TEMPLATE_FILE_FINDER
+        compactor = compactor or DEFAULT_COMPACTOR
         params = dict(
             query=query,
             name=name,
-            files=json.dumps(files),
+            files=json.dumps(compactor.compact_files(files), ensure_ascii=False),
         )
         if parser is not None:
             template = template + "\n{format_instructions}"
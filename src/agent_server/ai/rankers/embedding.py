@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..prompts.compaction import MetadataCompactor, DEFAULT_COMPACTOR
+
+_TEXT_FIELDS = ("title", "description", "subject", "creator", "date", "mediatype")
+
+
+class RankedEntries(NamedTuple):
+    accepted: list[str]
+    uncertain: list[str]
+    rejected: list[str]
+    scores: dict[str, float]
+
+
+class EmbeddingRanker:
+    """
+    Scores Internet Archive entries against the query by embedding similarity.
+
+    One compact text per entry is embedded in a single batched call, cosine similarity
+    is computed with NumPy. Entries scoring at least `upper_threshold` are accepted,
+    entries below `lower_threshold` are rejected and only the band in between has to
+    be judged by the LLM.
+
+    The graph ranks every item in its own subgraph, one entry per call. So the query
+    vector is embedded once and kept (the last `query_cache_size` queries), and on the
+    event loop the entries ranked within `batch_window` seconds are embedded together
+    in one call. Items whose metadata arrives later go into the next batch.
+    """
+
+    def __init__(
+            self,
+            embeddings: Embeddings,
+            upper_threshold: float = 0.75,
+            lower_threshold: float = 0.45,
+            query_prefix: str = "search_query: ",
+            document_prefix: str = "search_document: ",
+            compactor: MetadataCompactor | None = None,
+            logger: logging.Logger | None = None,
+            query_cache_size: int = 256,
+            batch_window: float = 0.02,
+    ):
+        if lower_threshold > upper_threshold:
+            raise AttributeError(f"lower_threshold {lower_threshold} is above upper_threshold {upper_threshold}")
+        self.embeddings = embeddings
+        self.upper_threshold = upper_threshold
+        self.lower_threshold = lower_threshold
+        # nomic-embed-text expects task prefixes
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+        self.compactor = compactor or DEFAULT_COMPACTOR
+        self.logger = logger or logging.getLogger(__name__)
+        self.query_cache_size = query_cache_size
+        self.batch_window = batch_window
+        self._lock = threading.Lock()
+        self._query_vectors: OrderedDict[str, list[float]] = OrderedDict()
+        # per event loop: the entry texts waiting for the next batched call
+        self._batches: dict[int, list[tuple[str, asyncio.Future]]] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    def item_text(self, name: str, metadata: dict | None) -> str:
+        compacted = self.compactor.compact_metadata(metadata)
+        parts = [name]
+        for field in _TEXT_FIELDS:
+            value = compacted.get(field)
+            if isinstance(value, list):
+                value = ", ".join(str(v) for v in value)
+            if value:
+                parts.append(str(value))
+        return "\n".join(parts)
+
+    def _documents(self, entries: dict[str, Any]) -> list[str]:
+        return [self.document_prefix + self.item_text(name, metadata) for name, metadata in entries.items()]
+
+    def _cached_query(self, text: str) -> list[float] | None:
+        with self._lock:
+            vector = self._query_vectors.get(text)
+            if vector is not None:
+                self._query_vectors.move_to_end(text)
+            return vector
+
+    def _cache_query(self, text: str, vector: list[float]) -> list[float]:
+        with self._lock:
+            self._query_vectors[text] = vector
+            while len(self._query_vectors) > self.query_cache_size:
+                self._query_vectors.popitem(last=False)
+        return vector
+
+    def _query_vector(self, query: str) -> list[float]:
+        text = self.query_prefix + query
+        vector = self._cached_query(text)
+        return vector if vector is not None else self._cache_query(text, self.embeddings.embed_documents([text])[0])
+
+    async def _aquery_vector(self, query: str) -> list[float]:
+        text = self.query_prefix + query
+        vector = self._cached_query(text)
+        if vector is None:
+            # the items of a wave miss the cache together, their query text is embedded once in the batch
+            vector = self._cache_query(text, (await self._aembed_batched([text]))[0])
+        return vector
+
+    async def _aembed_batched(self, texts: list[str]) -> list[list[float]]:
+        """Embeds the texts in the next batched call of the event loop."""
+        loop = asyncio.get_running_loop()
+        key = id(loop)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = []
+            loop.call_later(self.batch_window, self._flush, key)
+        futures = [loop.create_future() for _ in texts]
+        batch.extend(zip(texts, futures))
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self, key: int):
+        task = asyncio.ensure_future(self._embed_batch(self._batches.pop(key, [])))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _embed_batch(self, batch: list[tuple[str, asyncio.Future]]):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(texts, await self.embeddings.aembed_documents(texts)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if len(texts) > 1:
+            self.logger.info(f"EmbeddingRanker: {len(texts)} texts embedded in one call")
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+    @staticmethod
+    def _similarities(names: list[str], query: list[float], embedded: list[list[float]]) -> dict[str, float]:
+        vectors = np.asarray([query, *embedded], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms[:, None]
+        similarities = vectors[1:] @ vectors[0]
+        return {name: float(similarity) for name, similarity in zip(names, similarities)}
+
+    def score(self, query: str, entries: dict[str, Any]) -> dict[str, float]:
+        if not entries:
+            return {}
+        query_vector = self._query_vector(query)
+        return self._similarities(list(entries), query_vector, self.embeddings.embed_documents(self._documents(entries)))
+
+    async def ascore(self, query: str, entries: dict[str, Any]) -> dict[str, float]:
+        if not entries:
+            return {}
+        query_vector, embedded = await asyncio.gather(
+            self._aquery_vector(query), self._aembed_batched(self._documents(entries)),
+        )
+        return self._similarities(list(entries), query_vector, embedded)
+
+    def _partition(self, entries: dict[str, Any], scores: dict[str, float]) -> RankedEntries:
+        accepted, uncertain, rejected = [], [], []
+        for name in entries:
+            score = scores[name]
+            if score >= self.upper_threshold:
+                accepted.append(name)
+            elif score < self.lower_threshold:
+                rejected.append(name)
+            else:
+                uncertain.append(name)
+        self.logger.info(
+            f"EmbeddingRanker: {len(accepted)} accepted, {len(uncertain)} uncertain, {len(rejected)} rejected"
+        )
+        return RankedEntries(accepted, uncertain, rejected, scores)
+
+    def partition(self, query: str, entries: dict[str, Any]) -> RankedEntries:
+        return self._partition(entries, self.score(query, entries))
+
+    async def apartition(self, query: str, entries: dict[str, Any]) -> RankedEntries:
+        return self._partition(entries, await self.ascore(query, entries))
@@ -1,14 +1,95 @@
-from typing import TypedDict, List, Dict, Optional, Any
+import operator
+from typing import TypedDict, List, Dict, Optional, Any, Annotated
+
+
+def merge_dicts(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Reducer: the per-item results are merged into one dict."""
+    if left is None or right is None:
+        return right if left is None else left
+    return {**left, **right}
+
+
+def merge_unique(left: Optional[List[str]], right: Optional[List[str]]) -> Optional[List[str]]:
+    """Reducer: appends the entries of the items, an entry written twice is kept once."""
+    if left is None or right is None:
+        return right if left is None else left
+    return list(dict.fromkeys([*left, *right]))
+
+
+def _as_errors(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(error) for error in value if error]
+    return [str(value)]
+
+
+def append_errors(left: Any, right: Any) -> List[str]:
+    """Reducer: the errors of all nodes are appended, a node may write a single str."""
+    return _as_errors(left) + _as_errors(right)
+
 
 class InternetArchiveState(TypedDict):
-    """State for the Internet Archive search graph."""
+    """
+    State for the Internet Archive search graph.
+
+    The nodes return only the keys they change, keys with a reducer are combined with
+    the current value instead of being replaced.
+    """
     query: str
     results: Optional[List[str]]
     cached_results: Optional[bool]
     filtered_results: Optional[List[str]]
+    filter_timings: Optional[List[Dict[str, Any]]]
     cached_filtered_results: Optional[bool]
-    metadata: Optional[Dict[str, Any]]
+    prefetched_metadata: Optional[Dict[str, Any]]
+    # identifiers sent to the item subgraphs: the current wave and all so far
+    wave: Optional[List[str]]
+    dispatched: Annotated[Optional[List[str]], merge_unique]
+    # passed the filter but run by another run of the batch, see ItemClaims
+    shared_items: Annotated[Optional[List[str]], merge_unique]
+    # written by the per-item subgraphs, see InternetArchiveItemState
+    metadata: Annotated[Optional[Dict[str, Any]], merge_dicts]
     cached_metadata: Optional[bool]
+    relevance_scores: Annotated[Optional[Dict[str, float]], merge_dicts]
+    entries_to_consider: Annotated[Optional[List[str]], merge_unique]
+    pdfs_to_download: Annotated[Optional[Dict[str, List[str]]], merge_dicts]
+    # local paths of the downloaded files per identifier
+    downloaded: Annotated[Optional[Dict[str, List[str]]], merge_dicts]
+    item_errors: Annotated[List[str], operator.add]
+    error: Annotated[List[str], append_errors]
+    # consumed run budget, see RunBudget.report
+    budget: Optional[Dict[str, Any]]
+
+
+class InternetArchiveItemState(TypedDict, total=False):
+    """
+    State of the per-item subgraph (metadata → finder → file_finder → downloader).
+
+    Uses the keys of InternetArchiveState restricted to one identifier, so the nodes of
+    the search graph work unchanged on a single item.
+
+    The metadata entries carry `files_ref` (a BlobStore handle) instead of the file
+    list when the nodes have a blob store.
+    """
+    query: str
+    identifier: str
+    filtered_results: List[str]
+    prefetched_metadata: Optional[Dict[str, Any]]
+    metadata: Optional[Dict[str, Any]]
+    relevance_scores: Optional[Dict[str, float]]
+    entries_to_consider: Optional[List[str]]
+    pdfs_to_download: Optional[Dict[str, List[str]]]
+    downloaded: Optional[Dict[str, List[str]]]
+    item_errors: List[str]
+    error: Annotated[List[str], append_errors]
+
+
+class InternetArchiveItemOutput(TypedDict, total=False):
+    """What an item subgraph hands back to the search graph."""
+    metadata: Optional[Dict[str, Any]]
+    relevance_scores: Optional[Dict[str, float]]
     entries_to_consider: Optional[List[str]]
     pdfs_to_download: Optional[Dict[str, List[str]]]
-    error: Optional[str]
\ No newline at end of file
+    downloaded: Optional[Dict[str, List[str]]]
+    item_errors: List[str]
@@ -0,0 +1,164 @@
+import json
+import math
+from typing import Any, Optional
+
+from ..prompts.compaction import DEFAULT_COMPACTOR
+from ...adapters.blob_store import BlobStore
+from ...adapters.internet_archive_records import files_table
+
+# Keys of the graph state which are not worth keeping for the detail lookup
+_TRANSIENT_KEYS = ("prefetched_metadata", "item_errors", "cache_key_hash")
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _shrink(value: Any, over: int) -> Any:
+    """
+    `value` about `over` characters shorter: a string is truncated, a list or dict
+    dominated by one entry shrinks that entry, else its last entries are dropped.
+    """
+    if isinstance(value, str):
+        return _truncate(value, max(0, len(value) - over - 1))
+    if not isinstance(value, (list, dict)) or not value:
+        return None
+    size = max(len(_dumps(value)), 1)
+    keys = list(value) if isinstance(value, dict) else list(range(len(value)))
+    largest = max(keys, key=lambda k: len(_dumps(value[k])))
+    if len(_dumps(value[largest])) * 2 > size:
+        shrunk = _shrink(value[largest], over)
+        if shrunk is not None:
+            if isinstance(value, dict):
+                return {**value, largest: shrunk}
+            return [shrunk if i == largest else v for i, v in enumerate(value)]
+    keep = max(len(value) - max(1, math.ceil(len(value) * over / size)), 0)
+    return dict(list(value.items())[:keep]) if isinstance(value, dict) else value[:keep]
+
+
+class InternetArchiveDigest:
+    """
+    Turns the final state of the Internet Archive graph into what the agent reads.
+
+    The digest holds the selected items (title, chosen PDFs, download paths) and the
+    errors, capped at `max_chars`. The full state is kept in the `store`, the digest
+    carries its handle so the agent can ask for the detail of the run or of one item
+    (see InternetArchiveDetailTool), again capped at `detail_max_chars` by shrinking its
+    largest fields, so it stays valid JSON.
+    """
+
+    def __init__(
+            self,
+            store: BlobStore,
+            max_chars: int = 2000,
+            max_errors: int = 5,
+            title_max_chars: int = 120,
+            error_max_chars: int = 200,
+            detail_max_chars: int = 8000,
+    ):
+        self.store = store
+        self.max_chars = max_chars
+        self.max_errors = max_errors
+        self.title_max_chars = title_max_chars
+        self.error_max_chars = error_max_chars
+        self.detail_max_chars = detail_max_chars
+
+    @staticmethod
+    def _title(entry: Optional[dict]) -> str:
+        return str(((entry or {}).get("metadata") or {}).get("title") or "")
+
+    def _item(self, state: dict, identifier: str) -> dict:
+        item: dict[str, Any] = {
+            "identifier": identifier,
+            "title": _truncate(self._title((state.get("metadata") or {}).get(identifier)), self.title_max_chars),
+            "pdfs": (state.get("pdfs_to_download") or {}).get(identifier) or [],
+        }
+        if identifier in (state.get("downloaded") or {}):
+            item["paths"] = state["downloaded"][identifier]
+        return item
+
+    @staticmethod
+    def _omit(digest: dict, key: str, counter: str):
+        digest[key] = digest[key][:-1]
+        digest[counter] = digest.get(counter, 0) + 1
+
+    def digest(self, state: dict) -> dict:
+        handle = self.store.put({k: v for k, v in state.items() if k not in _TRANSIENT_KEYS})
+        items = [self._item(state, identifier) for identifier in state.get("entries_to_consider") or []]
+        errors = state.get("error") or []
+        if isinstance(errors, str):
+            errors = [errors]
+        digest: dict[str, Any] = {
+            "query": state.get("query"),
+            "results": len(state.get("results") or []),
+            "filtered": len(state.get("filtered_results") or []),
+            "items": items,
+            "errors": [_truncate(str(error), self.error_max_chars) for error in errors[:self.max_errors]],
+            "detail": handle,
+        }
+        if len(errors) > self.max_errors:
+            digest["omitted_errors"] = len(errors) - self.max_errors
+
+        # over the cap: the lowest ranked items, then the last errors are left to the detail lookup
+        while len(_dumps(digest)) > self.max_chars and digest["items"]:
+            self._omit(digest, "items", "omitted_items")
+        while len(_dumps(digest)) > self.max_chars and digest["errors"]:
+            self._omit(digest, "errors", "omitted_errors")
+        return digest
+
+    def render(self, state: dict) -> str:
+        return _dumps(self.digest(state))
+
+    def _item_detail(self, state: dict, identifier: str) -> dict:
+        entry = (state.get("metadata") or {}).get(identifier)
+        if entry is None:
+            return {"error": f"No metadata for {identifier}"}
+        files = self.store.load(entry, "files")
+        return {
+            "identifier": identifier,
+            "metadata": entry.get("metadata") or {},
+            "pdf_files": DEFAULT_COMPACTOR.candidate_files(files_table(files)) if files else [],
+            "relevance_score": (state.get("relevance_scores") or {}).get(identifier),
+            "pdfs": (state.get("pdfs_to_download") or {}).get(identifier) or [],
+            "paths": (state.get("downloaded") or {}).get(identifier) or [],
+        }
+
+    def detail(self, handle: str, identifier: str | None = None) -> str:
+        state = self.store.get(handle)
+        if state is None:
+            return _dumps({"error": f"Unknown or expired detail handle {handle}"})
+
+        if identifier:
+            detail = self._item_detail(state, identifier)
+        else:
+            detail = {
+                key: state.get(key)
+                for key in ("query", "results", "filtered_results", "entries_to_consider",
+                            "relevance_scores", "pdfs_to_download", "downloaded", "error")
+            }
+            detail["titles"] = {
+                item_id: self._title(entry) for item_id, entry in (state.get("metadata") or {}).items()
+            }
+        return _dumps(self._fit(detail))
+
+    def _fit(self, detail: dict) -> dict:
+        """Shrinks the largest fields until the detail fits `detail_max_chars`, they are listed in `truncated`."""
+        truncated: list[str] = []
+        while True:
+            fitted = {**detail, "truncated": truncated} if truncated else detail
+            over = len(_dumps(fitted)) - self.detail_max_chars
+            if over <= 0 or not detail:
+                return fitted
+            key = max(detail, key=lambda k: len(_dumps(detail[k])))
+            shrunk = _shrink(detail[key], over)
+            if shrunk is None or shrunk == detail[key]:
+                # nothing left to shrink, the field goes
+                detail = {k: v for k, v in detail.items() if k != key}
+            else:
+                detail = {**detail, key: shrunk}
+            if key not in truncated:
+                truncated.append(key)
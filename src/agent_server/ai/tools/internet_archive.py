@@ -2,18 +2,20 @@ import logging
 import traceback
 from typing import Type, Optional, Any
 
-from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.callbacks import CallbackManagerForToolRun, AsyncCallbackManagerForToolRun
 from langchain_core.language_models import BaseChatModel
-from langgraph.graph.state import CompiledStateGraph
+from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field, ConfigDict
 from langchain_core.tools import BaseTool
-from ..states.internet_archive import InternetArchiveState
+from .digest import InternetArchiveDigest
+from ..graphs.runner import InternetArchiveGraphRunner
 
 class BaseInternetArchiveTool(BaseModel):
     """Base tool for interacting with a SQL database."""
 
     llm: BaseChatModel = Field(exclude=True)
-    graph: CompiledStateGraph = Field(exclude=True)
+    runner: InternetArchiveGraphRunner = Field(exclude=True)
+    digest: InternetArchiveDigest = Field(exclude=True)
     logger: logging.Logger|None = Field(exclude=True)
 
     model_config = ConfigDict(
@@ -28,7 +30,10 @@ class InternetArchiveSearchTool(BaseInternetArchiveTool, BaseTool):  # type: ign
     """Tool for general internet archive search."""
 
     name: str = "internet_archive_search"
-    description: str = "Input is an search term, an json object with results matching the search term, and a json object with filtered results matching the search term."
+    description: str = (
+        "Input is an search term. Returns a json digest of the search: the selected items with title, "
+        "chosen PDFs and download paths, the errors, and a `detail` handle for internet_archive_detail."
+    )
     args_schema: Type[BaseModel] = _InternetArchiveSearchToolInput
 
     model_config = ConfigDict(
@@ -37,20 +42,60 @@ class InternetArchiveSearchTool(BaseInternetArchiveTool, BaseTool):  # type: ign
 
     def _run(
         self,
+        config: RunnableConfig,
         tool_input: str = "",
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> str:
-        internet_archive_state = InternetArchiveState(
-            query=tool_input,
-        )
-
         ret:Optional[str] = None
 
         try :
-            ret = self.graph.invoke(internet_archive_state)
+            # the run inherits the config of the agent: its callbacks and its stream
+            ret = self.digest.render(self.runner.invoke(tool_input, config=config))
         except Exception as ex:
             e = traceback.format_exc()
             self.logger.error(f"Error invoking internet archive search tool: {e}")
             return f"{e}"
 
-        return ret
\ No newline at end of file
+        return ret
+
+    async def _arun(
+        self,
+        config: RunnableConfig,
+        tool_input: str = "",
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        try :
+            return self.digest.render(await self.runner.ainvoke(tool_input, config=config))
+        except Exception as ex:
+            e = traceback.format_exc()
+            self.logger.error(f"Error invoking internet archive search tool: {e}")
+            return f"{e}"
+
+
+class _InternetArchiveDetailToolInput(BaseModel):
+    handle: str = Field(description="The `detail` handle of an internet_archive_search result")
+    identifier: str = Field("", description="An item identifier for the detail of one item, empty for the whole search")
+
+
+class InternetArchiveDetailTool(BaseTool):  # type: ignore[override, override]
+    """Tool for the full detail behind an internet archive search digest."""
+
+    name: str = "internet_archive_detail"
+    description: str = (
+        "Input is the `detail` handle of an internet_archive_search result and optionally an item identifier. "
+        "Returns the metadata, PDF files and relevance of the item, or all results of the search."
+    )
+    args_schema: Type[BaseModel] = _InternetArchiveDetailToolInput
+    digest: InternetArchiveDigest = Field(exclude=True)
+
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+    )
+
+    def _run(
+        self,
+        handle: str,
+        identifier: str = "",
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> str:
+        return self.digest.detail(handle, identifier or None)
\ No newline at end of file
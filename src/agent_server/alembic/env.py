@@ -20,6 +20,8 @@ if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
 from agent_server.models.manual import *
+from agent_server.models.llm_cache import *
+from agent_server.models.checkpoint import *
 target_metadata = SQLModel.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,47 @@
+"""
+Catalog sweep from the command line: finds the manuals of the selected games, e.g.
+
+    python -m agent_server.catalog --platform "Nintendo Entertainment System" --year 1989 --concurrency 2
+
+Games which have a manual source are skipped (--force searches them again), so an
+interrupted sweep continues where it stopped when it is started again.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from .adapters.catalog_store import CatalogSelection
+from .container.container import container
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m agent_server.catalog", description="Find manuals for catalog games")
+    parser.add_argument("--platform", action="append", default=[], help="platform name or id, repeatable")
+    parser.add_argument("--year", action="append", type=int, default=[], help="release year, repeatable")
+    parser.add_argument("--ids", type=lambda v: [int(i) for i in v.split(",") if i], default=[], help="game ids, e.g. 1,2,3")
+    parser.add_argument("--limit", type=int, default=None, help="at most this many games")
+    parser.add_argument("--concurrency", type=int, default=None, help="queries at once")
+    parser.add_argument("--force", action="store_true", help="also search games which have a manual")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    sweeper = container.catalog_sweeper()
+    if args.concurrency:
+        sweeper.concurrency = max(1, args.concurrency)
+
+    report = asyncio.run(sweeper.sweep(CatalogSelection(
+        platforms=tuple(args.platform),
+        years=tuple(args.year),
+        game_ids=tuple(args.ids),
+        limit=args.limit,
+        force=args.force,
+    )))
+    print(json.dumps(report.to_dict(), indent=2))
+    return 0 if report.status == "done" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
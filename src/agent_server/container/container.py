@@ -1,10 +1,10 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from dependency_injector import containers, providers
 from langchain_community.utilities import SQLDatabase
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableConfig
-from langchain_ollama import ChatOllama
 from langchain_ollama import OllamaEmbeddings
 from langchain_postgres import PGEngine
 from langfuse import Langfuse
@@ -14,8 +14,43 @@ from sqlalchemy import Engine
 from ..ai.prompts.sql_agent import SqlAgent
 from ..ai.agents.sql_agent import SQLAgent
 from ..ai.agents.internet_archive import AgentFactory
+from ..ai.graphs.budget import BudgetLimits
+from ..ai.nodes.internet_archive.Finder import FinderEarlyStop
 from ..renderer.open_webui import OpenWebUiRenderer
 from ..log.factory import LoggerFactory
+from ..metrics.registry import MetricsRegistry
+from ..adapters.llm_cache import LLMCacheFactory
+from ..adapters.ollama import ManagedChatOllama, keep_alive
+from ..adapters.llm_gateway import LLMGateway
+from ..adapters.warmup import ModelWarmer
+from ..adapters.checkpoint import CheckpointSaverFactory
+from ..adapters.single_flight import SingleFlightFactory
+from ..adapters.blob_store import BlobStoreFactory
+from ..adapters.admission import AdmissionController
+from ..adapters.ia_search_store import IASearchStore
+from ..ai.graphs.jobs import IAJobManager
+from ..adapters.catalog_store import CatalogStore
+from ..ai.graphs.catalog import CatalogSweeper
+
+# Roles with their own Ollama model, see ManagedChatOllama.for_role
+LLM_ROLES = ("agent", "filter", "finder", "file_finder", "sql")
+
+
+def _role_llms(config: providers.Configuration, **kwargs) -> dict[str, providers.Singleton]:
+    """The LLM provider of every role, its model is read from OLLAMA_MODEL_<ROLE>."""
+    llms = {}
+    for role in LLM_ROLES:
+        model = getattr(config.ollama.roles, role)
+        model.from_env(f"OLLAMA_MODEL_{role.upper()}", default="")
+        llms[role] = providers.Singleton(
+            ManagedChatOllama.for_role,
+            role=role,
+            model=model,
+            default_model=config.ollama.model,
+            **kwargs,
+        )
+    return llms
+
 
 class Container(containers.DeclarativeContainer):
     config = providers.Configuration()
@@ -28,29 +63,12 @@ class Container(containers.DeclarativeContainer):
     )
 
     ########################
-    # 🧠 Ollama LLM
+    # 📈 Metrics
     ########################
-    config.ollama.model.from_env("OLLAMA_MODEL", default="llama3.2:3b")
-    config.ollama.url.from_env("OLLAMA_URL", default="http://localhost:11434")
-    config.openai.model.from_env("OPENAI_MODEL", default="gpt-4.1")
-    config.openai.api_key.from_env("OPENAI_KEY", required=False)
-
-    ollamaLLM = providers.Singleton(
-        ChatOllama,
-        model=config.ollama.model,
-        base_url=config.ollama.url
+    metrics = providers.Singleton(
+        MetricsRegistry
     )
 
-    if config.openai.api_key:
-        openAiLLM = providers.Singleton(
-            ChatOpenAI,
-            model=config.openai.model,
-            api_key=config.openai.api_key,
-        )
-
-    llm = ollamaLLM
-    #llm = openAiLLM
-
     ########################
     # 🐘 Postgres / PGVector
     ########################
@@ -71,6 +89,81 @@ class Container(containers.DeclarativeContainer):
         config.pgvector.url
     )
 
+    ########################
+    # 🗄️ LLM Response Cache
+    ########################
+    # backend: sqlite (local), postgres or redis (production), none
+    config.llm_cache.backend.from_env("LLM_CACHE_BACKEND", default="sqlite")
+    config.llm_cache.url.from_env("LLM_CACHE_URL", default="sqlite:////data/llm_cache.sqlite")
+    config.llm_cache.ttl.from_env("LLM_CACHE_TTL", as_=int, default=7 * 24 * 3600)
+    config.llm_cache.max_entries.from_env("LLM_CACHE_MAX_ENTRIES", as_=int, default=50000)
+
+    llm_cache = providers.Singleton(
+        LLMCacheFactory.create,
+        backend=config.llm_cache.backend,
+        url=config.llm_cache.url,
+        engine=providers.Callable(
+            lambda backend, engine: engine() if backend == "postgres" else None,
+            backend=config.llm_cache.backend,
+            engine=sqlmodel_engine_postgres.provider,
+        ),
+        ttl=config.llm_cache.ttl,
+        max_entries=config.llm_cache.max_entries,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    ########################
+    # 🧠 Ollama LLM
+    ########################
+    config.ollama.model.from_env("OLLAMA_MODEL", default="llama3.2:3b")
+    config.ollama.url.from_env("OLLAMA_URL", default="http://localhost:11434")
+    config.openai.model.from_env("OPENAI_MODEL", default="gpt-4.1")
+    config.openai.api_key.from_env("OPENAI_KEY", required=False)
+
+    # Requests Ollama handles at once, keep in sync with OLLAMA_NUM_PARALLEL of the server
+    config.ollama.num_parallel.from_env("OLLAMA_NUM_PARALLEL", as_=int, default=4)
+    # How long Ollama keeps the models loaded after a request ("30m", seconds), -1 keeps them forever
+    config.ollama.keep_alive.from_env("OLLAMA_KEEP_ALIVE", as_=keep_alive, default="30m")
+
+    llm_gateway = providers.Singleton(
+        LLMGateway,
+        max_concurrency=config.ollama.num_parallel,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    ollamaLLM = providers.Singleton(
+        ManagedChatOllama,
+        model=config.ollama.model,
+        base_url=config.ollama.url,
+        keep_alive=config.ollama.keep_alive,
+        cache=llm_cache,
+        gateway=llm_gateway,
+    )
+
+    # Model per role (OLLAMA_MODEL_<ROLE>), empty uses OLLAMA_MODEL. Relevance judgments
+    # (filter, finder, file_finder) can run on a small model, the agents on a larger one.
+    llms = providers.Dict(_role_llms(
+        config,
+        base_url=config.ollama.url,
+        keep_alive=config.ollama.keep_alive,
+        cache=llm_cache,
+        gateway=llm_gateway,
+        metrics=metrics,
+    ))
+
+    if config.openai.api_key:
+        openAiLLM = providers.Singleton(
+            ChatOpenAI,
+            model=config.openai.model,
+            api_key=config.openai.api_key,
+            cache=llm_cache,
+        )
+
+    llm = ollamaLLM
+    #llm = openAiLLM
+
     ########################
     # 🔑 Langfuse
     ########################
@@ -101,46 +194,235 @@ class Container(containers.DeclarativeContainer):
         langfuseClass
      )
 
+    ########################
+    # 🧠 Ollama Embeddings
+    ########################
+    config.ollama.embedding.model.from_env("OLLAMA_EMBEDDING_MODEL", default="nomic-embed-text:latest")
+    config.ollama.embedding.vector_size.from_env("OLLAMA_EMBEDDING_VECTOR_SIZE", as_=int, default=768)
+    ollamaEmbeddings = providers.Singleton(
+        OllamaEmbeddings,
+        model=config.ollama.embedding.model,
+        base_url=config.ollama.url,
+        keep_alive=config.ollama.keep_alive,
+    )
+    vectorSize = providers.Object(config.ollama.embedding.vector_size)
+
+    ########################
+    # 🔥 Model Warm-up
+    ########################
+    config.ollama.warmup.enabled.from_env(
+        "OLLAMA_WARMUP_ENABLED", as_=lambda v: str(v).lower() in ("1", "true", "yes"), default="true"
+    )
+    # Re-warm every N seconds (0 only warms at startup) within the hours, e.g. "7-22", empty for always
+    config.ollama.warmup.interval.from_env("OLLAMA_WARMUP_INTERVAL", as_=int, default=240)
+    config.ollama.warmup.hours.from_env("OLLAMA_WARMUP_HOURS", default="")
+
+    model_warmer = providers.Singleton(
+        ModelWarmer,
+        base_url=config.ollama.url,
+        chat_models=providers.List(*(llm.provided.model for llm in llms.kwargs.values())),
+        embedding_models=providers.List(config.ollama.embedding.model),
+        keep_alive=config.ollama.keep_alive,
+        enabled=config.ollama.warmup.enabled,
+        interval=config.ollama.warmup.interval,
+        hours=config.ollama.warmup.hours,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    # Finder: accept above upper, reject below lower, ask the LLM in between
+    config.ia.ranker.upper_threshold.from_env("IA_RANKER_UPPER_THRESHOLD", as_=float, default=0.75)
+    config.ia.ranker.lower_threshold.from_env("IA_RANKER_LOWER_THRESHOLD", as_=float, default=0.45)
+    # Metadata of the top N search results is fetched while the filter runs, 0 disables it
+    config.ia.prefetch_depth.from_env("IA_PREFETCH_DEPTH", as_=int, default=10)
+    # Finder early stop: judge the items WINDOW at a time in rank order, stop after HITS relevant
+    # items or once another hit is less likely than PROBABILITY; 0 hits judges every item
+    config.ia.early_stop.hits.from_env("IA_FINDER_EARLY_STOP_HITS", as_=int, default=0)
+    config.ia.early_stop.probability.from_env("IA_FINDER_EARLY_STOP_PROBABILITY", as_=float, default=0.1)
+    config.ia.early_stop.window.from_env("IA_FINDER_EARLY_STOP_WINDOW", as_=int, default=2)
+
+    ia_finder_early_stop = providers.Callable(
+        lambda hits, probability, window: FinderEarlyStop(
+            max_hits=hits, min_hit_probability=probability, window=window
+        ) if hits > 0 else None,
+        hits=config.ia.early_stop.hits,
+        probability=config.ia.early_stop.probability,
+        window=config.ia.early_stop.window,
+    )
+
+    ########################
+    # 💾 Graph Checkpoints
+    ########################
+    # backend: sqlite (local), postgres (production), none
+    config.ia.checkpoint.backend.from_env("IA_CHECKPOINT_BACKEND", default="sqlite")
+    config.ia.checkpoint.url.from_env("IA_CHECKPOINT_URL", default="sqlite:////data/ia/checkpoints.sqlite")
+    # a finished run younger than this is answered from its checkpoint
+    config.ia.checkpoint.max_age.from_env("IA_CHECKPOINT_MAX_AGE", as_=int, default=24 * 3600)
+
+    ia_checkpointer = providers.Singleton(
+        CheckpointSaverFactory.create,
+        backend=config.ia.checkpoint.backend,
+        url=config.ia.checkpoint.url,
+        engine=providers.Callable(
+            lambda backend, engine: engine() if backend == "postgres" else None,
+            backend=config.ia.checkpoint.backend,
+            engine=sqlmodel_engine_postgres.provider,
+        ),
+        logger=logger,
+    )
+
+    ########################
+    # 🛬 Request Coalescing
+    ########################
+    # backend: local (per process), redis (across processes), none
+    config.ia.single_flight.backend.from_env("IA_SINGLE_FLIGHT_BACKEND", default="local")
+    config.ia.single_flight.url.from_env("IA_SINGLE_FLIGHT_URL", default="redis://redis:6379/0")
+
+    ia_single_flight = providers.Singleton(
+        SingleFlightFactory.create,
+        backend=config.ia.single_flight.backend,
+        url=config.ia.single_flight.url,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    ########################
+    # 🗄️ Blob Store
+    ########################
+    # backend: file, memory (only with IA_CHECKPOINT_BACKEND=none), none (file lists stay in the graph state)
+    config.ia.blob.backend.from_env("IA_BLOB_BACKEND", default="file")
+    config.ia.blob.directory.from_env("IA_BLOB_DIR", default="/data/ia/blobs")
+    # records the allocation peak of every graph run, diagnostic only
+    config.ia.trace_memory.from_env(
+        "IA_TRACE_MEMORY", as_=lambda v: str(v).lower() in ("1", "true", "yes"), default="false"
+    )
+
+    ia_blob_store = providers.Singleton(
+        BlobStoreFactory.create,
+        backend=config.ia.blob.backend,
+        directory=config.ia.blob.directory,
+        # the payloads of a checkpoint which may still answer a query are kept
+        max_age=config.ia.checkpoint.max_age,
+        checkpoint_backend=config.ia.checkpoint.backend,
+        logger=logger,
+    )
+
+    ########################
+    # ⏱️ Run Budget
+    ########################
+    # limits of every IA graph run, empty is unlimited; exhausted limits degrade the run
+    # to its results so far, the consumed budget is reported in the final state
+    config.ia.budget.deadline_seconds.from_env(
+        "IA_BUDGET_DEADLINE_SECONDS", as_=lambda v: float(v) if v else None, default=""
+    )
+    config.ia.budget.max_llm_calls.from_env("IA_BUDGET_MAX_LLM_CALLS", as_=lambda v: int(v) if v else None, default="")
+    config.ia.budget.max_tokens.from_env("IA_BUDGET_MAX_TOKENS", as_=lambda v: int(v) if v else None, default="")
+    config.ia.budget.max_items.from_env("IA_BUDGET_MAX_ITEMS", as_=lambda v: int(v) if v else None, default="")
+    config.ia.budget.max_download_bytes.from_env(
+        "IA_BUDGET_MAX_DOWNLOAD_BYTES", as_=lambda v: int(v) if v else None, default=""
+    )
+
+    ia_budget_limits = providers.Singleton(
+        BudgetLimits,
+        deadline_seconds=config.ia.budget.deadline_seconds,
+        max_llm_calls=config.ia.budget.max_llm_calls,
+        max_tokens=config.ia.budget.max_tokens,
+        max_items=config.ia.budget.max_items,
+        max_download_bytes=config.ia.budget.max_download_bytes,
+    )
+
     ################################################
     #  📚 Internet Archive Agent
     ################################################
+    # one factory: the agent's tool and the direct graph providers share the IA wrapper,
+    # the compiled graph and its caches, all built on first use
+    internet_archive_factory = providers.Singleton(
+        AgentFactory,
+        llm=llm,
+        llms=llms,
+        logger=logger,
+        engine=sqlmodel_engine_postgres,
+        langfuse_config=langfuse_config,
+        k=40,
+        cache_dir="/data/ia/cache",
+        data_dir = "/data/ia/data",
+        embeddings=ollamaEmbeddings,
+        ranker_upper_threshold=config.ia.ranker.upper_threshold,
+        ranker_lower_threshold=config.ia.ranker.lower_threshold,
+        prefetch_depth=config.ia.prefetch_depth,
+        checkpointer=ia_checkpointer,
+        checkpoint_max_age=config.ia.checkpoint.max_age,
+        single_flight=ia_single_flight,
+        blob_store=ia_blob_store,
+        metrics=metrics,
+        trace_memory=config.ia.trace_memory,
+        budget_limits=ia_budget_limits,
+        finder_early_stop=ia_finder_early_stop,
+    )
+
     internet_archive_agent = providers.Singleton(
         lambda factory: factory.create(),
-        factory=providers.Singleton(
-            AgentFactory,
-            engine=sqlmodel_engine_postgres,
-            llm=llm,
-            logger=logger,
-            langfuse_config=langfuse_config,
-            k=40,
-        )
+        factory=internet_archive_factory,
     )
 
-    internet_archive_graph = providers.Singleton(
-        lambda factory: factory.create_graph(),
-        factory=providers.Singleton(
-            AgentFactory,
-            llm=llm,
-            logger=logger,
-            engine=sqlmodel_engine_postgres,
-            langfuse_config=langfuse_config,
-            k=40,
-            cache_dir="/data/ia/cache",
-            data_dir = "/data/ia/data",
-        )
+    internet_archive_graph = providers.Callable(
+        lambda factory: factory.graph,
+        factory=internet_archive_factory,
+    )
+
+    internet_archive_runner = providers.Callable(
+        lambda factory: factory.runner,
+        factory=internet_archive_factory,
     )
 
     ########################
-    # 🧠 Ollama Embeddings
+    # 📋 Internet Archive Jobs
     ########################
-    config.ollama.embedding.model.from_env("OLLAMA_EMBEDDING_MODEL", default="nomic-embed-text:latest")
-    config.ollama.embedding.vector_size.from_env("OLLAMA_EMBEDDING_VECTOR_SIZE", as_=int, default=768)
-    ollamaEmbeddings = providers.Singleton(
-        OllamaEmbeddings,
-        model=config.ollama_embedding_model,
-        base_url=config.ollama_url,
+    # searches run in the background (POST /jobs), at most IA_JOB_WORKERS at once; a job
+    # done within the checkpoint max age answers a repeated query
+    config.ia.jobs.workers.from_env("IA_JOB_WORKERS", as_=int, default=2)
+
+    ia_search_store = providers.Singleton(
+        IASearchStore,
+        engine=sqlmodel_engine_postgres,
+        blob_store=ia_blob_store,
+        logger=logger,
+    )
+    ia_jobs = providers.Singleton(
+        IAJobManager,
+        # resolved on the first job run
+        runner=internet_archive_runner.provider,
+        store=ia_search_store,
+        workers=config.ia.jobs.workers,
+        max_age=config.ia.checkpoint.max_age,
+        metrics=metrics,
+        logger=logger,
+    )
+
+    ########################
+    # 🗂️ Catalog Sweep
+    ########################
+    # manuals for many games at once (POST /catalog/sweep, python -m agent_server.catalog),
+    # CATALOG_SWEEP_CONCURRENCY queries at once in the batch priority class
+    config.catalog.concurrency.from_env("CATALOG_SWEEP_CONCURRENCY", as_=int, default=2)
+    # finished sweep reports kept for GET, the oldest go first
+    config.catalog.max_reports.from_env("CATALOG_SWEEP_MAX_REPORTS", as_=int, default=100)
+
+    catalog_store = providers.Singleton(
+        CatalogStore,
+        engine=sqlmodel_engine_postgres,
+        logger=logger,
+    )
+    catalog_sweeper = providers.Singleton(
+        CatalogSweeper,
+        runner=internet_archive_runner.provider,
+        search_store=ia_search_store,
+        catalog_store=catalog_store,
+        concurrency=config.catalog.concurrency,
+        max_reports=config.catalog.max_reports,
+        metrics=metrics,
+        logger=logger,
     )
-    vectorSize = providers.Object(config.ollama_embedding_vector_size)
 
     ########################
     # 🚀 FastAPI Server
@@ -149,6 +431,46 @@ class Container(containers.DeclarativeContainer):
     config.fastapi.port.from_env("FASTAPI_PORT", as_=int, default=8000)
     fastapi_host = providers.Object(config.fastapi.host)
     fastapi_port = providers.Object(config.fastapi.port)
+    # the default executor of the event loop: sync-only code (the SQL toolkit tools, sync graph
+    # nodes) runs there, bounded so that a burst of requests can not start unlimited threads
+    config.fastapi.executor_workers.from_env("FASTAPI_EXECUTOR_WORKERS", as_=int, default=16)
+    executor = providers.Singleton(
+        ThreadPoolExecutor,
+        max_workers=config.fastapi.executor_workers,
+        thread_name_prefix="agent-sync",
+    )
+
+    ########################
+    # 🚦 Admission Control
+    ########################
+    # Runs per endpoint class at once, the requests which may wait for a slot and for how
+    # long (seconds); beyond that requests get 429 with Retry-After. 0 in flight is unlimited.
+    # chat: /ask, /stream; graph: the Internet Archive graph runs (/ia/stream, /test)
+    config.admission.chat.max_in_flight.from_env("ADMISSION_CHAT_MAX_IN_FLIGHT", as_=int, default=4)
+    config.admission.chat.max_queue.from_env("ADMISSION_CHAT_MAX_QUEUE", as_=int, default=8)
+    config.admission.chat.queue_timeout.from_env("ADMISSION_CHAT_QUEUE_TIMEOUT", as_=float, default=10.0)
+    config.admission.graph.max_in_flight.from_env("ADMISSION_GRAPH_MAX_IN_FLIGHT", as_=int, default=2)
+    config.admission.graph.max_queue.from_env("ADMISSION_GRAPH_MAX_QUEUE", as_=int, default=4)
+    config.admission.graph.queue_timeout.from_env("ADMISSION_GRAPH_QUEUE_TIMEOUT", as_=float, default=10.0)
+
+    chat_admission = providers.Singleton(
+        AdmissionController,
+        name="chat",
+        max_in_flight=config.admission.chat.max_in_flight,
+        max_queue=config.admission.chat.max_queue,
+        queue_timeout=config.admission.chat.queue_timeout,
+        metrics=metrics,
+        logger=logger,
+    )
+    graph_admission = providers.Singleton(
+        AdmissionController,
+        name="graph",
+        max_in_flight=config.admission.graph.max_in_flight,
+        max_queue=config.admission.graph.max_queue,
+        queue_timeout=config.admission.graph.queue_timeout,
+        metrics=metrics,
+        logger=logger,
+    )
 
     ########################
     #  🤖 SQL Agent
@@ -161,7 +483,7 @@ class Container(containers.DeclarativeContainer):
     sql_agent = providers.Singleton(
         SQLAgent,
         db=langchain_postgres,
-        llm=llm,
+        llm=llms.kwargs["sql"],
         prompt=sql_agent_prompt,
         langfuse_config=langfuse_config,
         logger=logger,
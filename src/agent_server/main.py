@@ -2,7 +2,9 @@
 title: Agent API Server
 description: FastAPI server for the agent
 """
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 import uvicorn
@@ -11,12 +13,12 @@ from .log.logfilter import apply_log_filter
 
 from .container.container import container
 
-container.wire(modules=[__name__], packages=[".routers.chat", ".routers.test", ".routers.root"])
+container.wire(modules=[__name__], packages=[".routers.chat", ".routers.internet_archive", ".routers.test", ".routers.root", ".routers.metrics", ".routers.healthcheck", ".routers.jobs", ".routers.catalog"])
 
-from .routers import test, healthcheck, chat, root
+from .routers import test, healthcheck, chat, root, metrics, internet_archive, jobs, catalog
 
 load_dotenv('.env')
-apply_log_filter(["/healthcheck"])
+apply_log_filter(["/healthcheck", "/readiness"])
 
 debug_port_env = os.getenv("AGENT_SERVER_PYDEVD_DEBUG_PORT")
 if debug_port_env.isnumeric():
@@ -35,9 +37,31 @@ if debug_port_env.isnumeric():
         print(f"Failed to start debug on port {debug_port} and Host {debug_host}")
 
 
+async def recover_jobs():
+    try:
+        await container.ia_jobs().recover()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Internet Archive jobs not recovered: {e}")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # the sync-only code of the agents runs in the bounded default executor, not on the event loop
+    asyncio.get_running_loop().set_default_executor(container.executor())
+    # Warm the models in the background, /readiness reports when they are loaded
+    warmup = asyncio.create_task(container.model_warmer().run())
+    # Restart the Internet Archive jobs a stopped server left unfinished
+    recovery = asyncio.create_task(recover_jobs())
+    yield
+    recovery.cancel()
+    warmup.cancel()
+    await container.internet_archive_factory().aclose()
+
+
 app = FastAPI(
     title="Agent API Server",
     description="FastAPI server for the SQL and search agent",
+    lifespan=lifespan,
 )
 
 def main() -> None:
@@ -45,7 +69,10 @@ def main() -> None:
     app.include_router(root.Routes()())
     app.include_router(chat.Routes()())
     app.include_router(healthcheck.Routes()())
-    # TODO: add the internet Archive Search here.
+    app.include_router(metrics.Routes()())
+    app.include_router(internet_archive.Routes()())
+    app.include_router(jobs.Routes()())
+    app.include_router(catalog.Routes()())
     app.include_router(test.Routes()())
     fastapi_port = container.config.fastapi.port()
     fastapi_host = container.config.fastapi.host()
@@ -0,0 +1,71 @@
+import threading
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .registry import MetricsRegistry
+
+
+class LLMRoleMetricsHandler(BaseCallbackHandler):
+    """
+    Records latency and token usage of one LLM role (agent, filter, finder, ...).
+
+    Attached as callback to the role's model, so every call is counted no matter which
+    node or agent makes it:
+
+    - `llm.<role>.calls`, `llm.<role>.errors`
+    - `llm.<role>.seconds` (summary, includes cache hits and gateway wait)
+    - `llm.<role>.input_tokens`, `llm.<role>.output_tokens` (summaries)
+    """
+
+    def __init__(self, role: str, metrics: MetricsRegistry):
+        self.role = role
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._started: dict[UUID, float] = {}
+
+    def _start(self, run_id: UUID):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def _stop(self, run_id: UUID) -> float | None:
+        with self._lock:
+            start = self._started.pop(run_id, None)
+        return None if start is None else time.perf_counter() - start
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._start(run_id)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **kwargs: Any) -> Any:
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        seconds = self._stop(run_id)
+        self.metrics.increment(f"llm.{self.role}.calls")
+        if seconds is not None:
+            self.metrics.observe(f"llm.{self.role}.seconds", seconds)
+
+        input_tokens, output_tokens = self.token_usage(response)
+        if input_tokens is not None:
+            self.metrics.observe(f"llm.{self.role}.input_tokens", input_tokens)
+        if output_tokens is not None:
+            self.metrics.observe(f"llm.{self.role}.output_tokens", output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        self._stop(run_id)
+        self.metrics.increment(f"llm.{self.role}.errors")
+
+    @staticmethod
+    def token_usage(response: LLMResult) -> tuple[int | None, int | None]:
+        input_tokens = output_tokens = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                input_tokens = (input_tokens or 0) + usage.get("input_tokens", 0)
+                output_tokens = (output_tokens or 0) + usage.get("output_tokens", 0)
+        return input_tokens, output_tokens
@@ -0,0 +1,38 @@
+import json
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+def state_size(state: Any) -> int:
+    """Bytes of the JSON serialized state, about what the cache and a checkpoint store per run."""
+    return len(json.dumps(state, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class _Peak:
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+@contextmanager
+def traced_peak() -> Iterator[_Peak]:
+    """
+    Measures the peak of the Python allocations within the block with tracemalloc.
+
+    tracemalloc is process wide and slows allocations down: concurrent runs are
+    included in the peak, so this is a diagnostic for single runs, not for production.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peak = _Peak()
+    try:
+        yield peak
+    finally:
+        peak.bytes = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+        if started:
+            tracemalloc.stop()
@@ -0,0 +1,42 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+
+class GraphCheckpoint(SQLModel, table=True):
+    thread_id: str = Field(primary_key=True)
+    checkpoint_ns: str = Field(primary_key=True, default="")
+    checkpoint_id: str = Field(primary_key=True)
+    parent_checkpoint_id: Optional[str] = None
+
+    # serde type and payload, channel values are stored as blobs
+    checkpoint_type: str
+    checkpoint: bytes
+    metadata_type: str
+    checkpoint_metadata: bytes
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class GraphCheckpointBlob(SQLModel, table=True):
+    thread_id: str = Field(primary_key=True)
+    checkpoint_ns: str = Field(primary_key=True, default="")
+    channel: str = Field(primary_key=True)
+    version: str = Field(primary_key=True)
+
+    type: str
+    blob: bytes
+
+
+class GraphCheckpointWrite(SQLModel, table=True):
+    thread_id: str = Field(primary_key=True)
+    checkpoint_ns: str = Field(primary_key=True, default="")
+    checkpoint_id: str = Field(primary_key=True)
+    task_id: str = Field(primary_key=True)
+    idx: int = Field(primary_key=True)
+
+    channel: str
+    type: str
+    value: bytes
+    task_path: str = ""
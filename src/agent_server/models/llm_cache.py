@@ -0,0 +1,18 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+
+class LLMCacheEntry(SQLModel, table=True):
+    # sha256 over llm_hash and prompt_hash
+    key: str = Field(primary_key=True)
+    llm_hash: str = Field(index=True)
+    prompt_hash: str
+
+    return_val: str
+    hits: int = Field(default=0)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_access_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
@@ -50,6 +50,11 @@ class Platform(SQLModel, table=True):
 class IASearch(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     query: str
+    # the job of the search, see IASearchStore
+    normalized_query: Optional[str] = Field(default=None, index=True)
+    status: Optional[str] = Field(default=None, index=True)  # 'queued' | 'running' | 'done' | 'failed' | 'cancelled'
+    stage: Optional[str] = None
+    progress: Optional[str] = None
 
     cached_results: Optional[bool] = None
     cached_filtered: Optional[bool] = None
@@ -57,6 +62,8 @@ class IASearch(SQLModel, table=True):
 
     error: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
     results: list["IASearchResult"] = Relationship(back_populates="search")
     filtered: list["IAFilteredResult"] = Relationship(back_populates="search")
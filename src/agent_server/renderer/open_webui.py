@@ -1,23 +1,149 @@
 import json
 from typing import Any, AsyncIterator
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, BaseMessage
 
 from logging import Logger
 
+from ..ai.graphs.progress import PROGRESS_EVENT, FOUND_EVENT, format_size
+
+
+class _Progress:
+    """Counts the per-item progress events of one stream, e.g. "metadata 12/20"."""
+
+    def __init__(self):
+        self.total: int | None = None
+        self.done: dict[str, int] = {}
+
+    def describe(self, event: dict) -> str:
+        stage = event.get("stage")
+        if stage == "filter":
+            self.total = event.get("kept")
+        if stage in ("metadata", "finder") and self.total:
+            self.done[stage] = self.done.get(stage, 0) + int(event.get("items") or 0)
+            return f"{stage} {self.done[stage]}/{self.total}"
+        return str(event.get("text") or stage)
+
 
 class OpenWebUiRenderer:
+    """
+    Renders an agent stream as the server-sent events of the Open WebUI API.
+
+    The stream yields the agent state (stream_mode "values"), or (mode, chunk) resp.
+    (namespace, mode, chunk) tuples for several stream modes:
+
+    - "messages": the tokens of the LLM nodes in `answer_nodes` are forwarded as
+      content deltas as they arrive, tool calls become status events and tool
+      results reasoning content; LLM calls within the tools are not shown
+    - "custom": the events of the Internet Archive graph, progress events become
+      status events, the files found per item are written to the content right away
+    """
     logger: Logger
+    answer_nodes: tuple[str, ...]
 
     def __init__(
             self,
-            logger: Logger
+            logger: Logger,
+            answer_nodes: tuple[str, ...] = ("agent",),
     ):
         self.logger = logger
+        self.answer_nodes = answer_nodes
 
     @staticmethod
     def send_message(message: Any) -> str :
         return f"data: {json.dumps(message)}\n"
 
+    @staticmethod
+    def status_message(description: str, done: bool) -> dict:
+        return {
+            "event": {
+                "type": "status",
+                "data": {
+                    "description": description,
+                    "done": done,
+                },
+            }
+        }
+
+    @staticmethod
+    def delta_message(delta: dict) -> dict:
+        return {
+            'choices': [
+                {
+                    'delta': delta,
+                    'finish_reason': None
+                }
+            ]
+        }
+
+    @staticmethod
+    def found_content(event: dict) -> str:
+        """One line per item: "- found: [Tetris Manual](https://archive.org/details/...) (PDF, 4.2 MB)"."""
+        files = event.get("files") or []
+        details = sorted({
+            "PDF" if "pdf" in f"{file.get('format', '')} {file.get('name', '')}".lower() else file.get("format") or "file"
+            for file in files
+        })
+        sizes = [file["size"] for file in files if file.get("size") is not None]
+        if sizes:
+            details.append(format_size(sum(sizes)))
+        link = f"[{event.get('title')}](https://archive.org/details/{event.get('identifier')})"
+        return f"- found: {link} ({', '.join(details)})\n" if details else f"- found: {link}\n"
+
+    @staticmethod
+    def tool_content(message: ToolMessage) -> str:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        return content if "```" in content else f"\n```\n{content}\n```\n"
+
+    @staticmethod
+    def text(content: Any) -> str:
+        if isinstance(content, str):
+            return content
+        # content blocks, e.g. [{"type": "text", "text": "..."}]
+        return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content or [])
+
+    def render_values(self, event: dict) -> str | None:
+        if "messages" not in event:
+            return None
+        message = event["messages"][-1]
+        if isinstance(message, HumanMessage):
+            return None
+        if not (hasattr(message, "content") and message.content):
+            return None
+
+        if isinstance(message, ToolMessage):
+            return self.send_message(self.delta_message({'reasoning_content': self.tool_content(message)}))
+        if hasattr(message, "tool_calls") and message.tool_calls:
+            return self.send_message(self.delta_message({'reasoning_content': message.content}))
+        return self.send_message(self.delta_message({'content': message.content}))
+
+    def render_message(self, message: BaseMessage, metadata: dict) -> list[str]:
+        """One token chunk (or a complete tool message) of stream_mode "messages"."""
+        if isinstance(message, HumanMessage):
+            return []
+        if isinstance(message, ToolMessage):
+            return [self.send_message(self.delta_message({'reasoning_content': self.tool_content(message)}))]
+        if (metadata or {}).get("langgraph_node") not in self.answer_nodes:
+            return []
+
+        rendered = [
+            self.send_message(self.status_message(f"tool: {tool_call['name']}", False))
+            for tool_call in getattr(message, "tool_call_chunks", None) or []
+            if tool_call.get("name")
+        ]
+        content = self.text(message.content)
+        if content:
+            rendered.append(self.send_message(self.delta_message({'content': content})))
+        return rendered
+
+    def render_custom(self, event: Any, progress: _Progress) -> str | None:
+        if not isinstance(event, dict):
+            return None
+        if event.get("type") == PROGRESS_EVENT:
+            return self.send_message(self.status_message(progress.describe(event), False))
+        if event.get("type") == FOUND_EVENT:
+            return self.send_message(self.delta_message({'content': self.found_content(event)}))
+        return None
+
     async def render(self, event_stream: AsyncIterator[dict[str, Any] | Any]):
         try:
             stream_start_msg = {
@@ -30,70 +156,30 @@ class OpenWebUiRenderer:
             }
 
             yield self.send_message(stream_start_msg)
+            yield self.send_message(self.status_message("Datenbank Zugriff gestartet", False))
 
-            status_message = {
-                "event": {
-                    "type": "status",
-                    "data": {
-                        "description": "Datenbank Zugriff gestartet",
-                        "done": False,
-                    },
-                }
-            }
-
-            yield self.send_message(status_message)
-
+            progress = _Progress()
             async for event in event_stream:
-                if "messages" in event:
-                    message = event["messages"][-1]
-                    if isinstance(message, HumanMessage):
-                        continue
-#                    if not isinstance(message, AIMessage):
-#                        continue
-                    if hasattr(message, "content") and message.content:
-                        content = message.content
-
-                        if isinstance(message, ToolMessage):
-                            if "```" not in content:
-                                content = f"\n```\n{content}\n```\n"
-
-                        if (hasattr(message, "tool_calls") and message.tool_calls) or isinstance(message, ToolMessage):
-                            content_msg = {
-                                'choices':
-                                    [
-                                        {
-                                            'delta':
-                                                {
-                                                    'reasoning_content': content,
-                                                },
-                                            'finish_reason': None
-                                        }
-                                    ]
-                            }
-                        else:
-                            content_msg = {
-                                'choices': [
-                                    {
-                                        'delta': {
-                                            'content': content,
-                                        },
-                                        'finish_reason': None
-                                    }
-                                ]
-                            }
-
-                        yield self.send_message(content_msg)
-
-            status_end_message = {
-                "event": {
-                    "type": "status",
-                    "data": {
-                        "description": "Datenbank Zugriff beendet",
-                        "done": True
-                    },
-                }
-            }
-            yield self.send_message(status_end_message)
+                namespace, mode = (), "values"
+                if isinstance(event, tuple):
+                    *namespace, mode, event = event
+                    namespace = tuple(namespace[0]) if namespace else ()
+
+                # only the custom events of subgraphs are shown, not their states or tokens
+                if mode == "custom":
+                    rendered = [self.render_custom(event, progress)]
+                elif mode == "messages" and not namespace:
+                    rendered = self.render_message(*event)
+                elif mode == "values" and not namespace:
+                    rendered = [self.render_values(event)]
+                else:
+                    rendered = []
+
+                for message in rendered:
+                    if message is not None:
+                        yield message
+
+            yield self.send_message(self.status_message("Datenbank Zugriff beendet", True))
 
             stream_end_msg = {
                 'choices': [
@@ -110,4 +196,4 @@ class OpenWebUiRenderer:
             error_msg = {
                 'error': str(e)
             }
-            yield self.send_message(error_msg)
\ No newline at end of file
+            yield self.send_message(error_msg)
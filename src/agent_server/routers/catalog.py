@@ -0,0 +1,62 @@
+from logging import Logger
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from dependency_injector.wiring import inject, Provide
+from pydantic import BaseModel
+
+from ..container.container import Container
+from ..adapters.catalog_store import CatalogSelection
+from ..ai.graphs.catalog import CatalogSweeper
+
+
+class SweepInput(BaseModel):
+    # platform names or ids
+    platforms: list[str | int] = []
+    years: list[int] = []
+    game_ids: list[int] = []
+    limit: Optional[int] = None
+    force: bool = False
+
+
+class Routes:
+    router: APIRouter
+    sweeper: CatalogSweeper
+    logger: Logger
+
+    def __call__(self, *args, **kwargs):
+        return self.router
+
+    @inject
+    def __init__(
+            self,
+            sweeper: CatalogSweeper = Provide[Container.catalog_sweeper],
+            logging: Logger = Provide[Container.logger],
+    ):
+        self.sweeper = sweeper
+        self.logger = logging
+        self.router = APIRouter()
+        self.router.add_api_route("/catalog/sweep", self.sweep, methods=["POST"], status_code=202)
+        self.router.add_api_route("/catalog/sweep/{sweep_id}", self.report, methods=["GET"])
+
+    async def sweep(self, sweep_input: SweepInput):
+        """Searches the manuals of the selected games in the background, see CatalogSweeper."""
+        report = self.sweeper.start(CatalogSelection(
+            platforms=tuple(str(platform) for platform in sweep_input.platforms),
+            years=tuple(sweep_input.years),
+            game_ids=tuple(sweep_input.game_ids),
+            limit=sweep_input.limit,
+            force=sweep_input.force,
+        ))
+        return JSONResponse(
+            content=report,
+            status_code=202,
+            headers={"Location": f"/catalog/sweep/{report['id']}"},
+        )
+
+    async def report(self, sweep_id: str):
+        report = self.sweeper.report(sweep_id)
+        if report is None:
+            raise HTTPException(status_code=404, detail=f"Sweep {sweep_id} not found")
+        return report
@@ -3,13 +3,13 @@ from typing import List, Dict, Any
 
 from alembic.autogenerate import renderers
 from fastapi import HTTPException, APIRouter
-from fastapi.responses import StreamingResponse
 from dependency_injector.wiring import inject, Provide
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
 from ..container.container import Container
 from ..ai.agents.sql_agent import SQLAgent
 from ..renderer.open_webui import OpenWebUiRenderer
+from ..adapters.admission import AdmissionController
 from logging import Logger
 
 from pydantic import (
@@ -28,6 +28,7 @@ class Routes:
     agent: SQLAgent
     logger: Logger
     renderer: OpenWebUiRenderer
+    admission: AdmissionController
 
     def __call__(self, *args, **kwargs):
         return self.router
@@ -38,26 +39,30 @@ class Routes:
             agent: SQLAgent = Provide[Container.sql_agent],
             logging: Logger = Provide[Container.logger],
             renderer: OpenWebUiRenderer = Provide[Container.renderer],
+            admission: AdmissionController = Provide[Container.chat_admission],
     ):
         self.agent = agent
         self.logger = logging
         self.renderer = renderer
+        self.admission = admission
         self.router = APIRouter()
         self.router.add_api_route("/ask", self.ask, methods=["POST"])
         self.router.add_api_route("/stream", self.stream, methods=["POST"])
 
     async def ask(self, query_input: QueryInput):
-        try:
-            result = self.agent.ask(query_input.question)
-            return {"answer": result["messages"][-1].content}
-        except Exception as e: raise (HTTPException(status_code=500, detail=str(e)))
+        # a saturated server answers 429 right away, outside of the 500 handling
+        async with self.admission.admit():
+            try:
+                result = await self.agent.aask(query_input.question)
+                return {"answer": result["messages"][-1].content}
+            except Exception as e: raise (HTTPException(status_code=500, detail=str(e)))
 
     async def stream(self, query_input: QueryInput):
-        return StreamingResponse(
-            self.renderer.render(event_stream=self.agent.stream(query_input.question)),
-            media_type="text/event-stream",
+        # the slot is held until the stream is finished
+        return await self.admission.stream(
+            lambda: self.renderer.render(event_stream=self.agent.stream(query_input.question)),
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
-            }
+            },
         )
\ No newline at end of file
@@ -1,18 +1,36 @@
+from dependency_injector.wiring import inject, Provide
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from ..adapters.warmup import ModelWarmer
+from ..container.container import Container
 
 class Routes:
     router: APIRouter
+    warmer: ModelWarmer
 
     def __call__(self, *args, **kwargs):
         return self.router
 
+    @inject
     def __init__(
             self,
+            warmer: ModelWarmer = Provide[Container.model_warmer],
     ):
+        self.warmer = warmer
         self.router = APIRouter()
         self.router.add_api_route("/healthcheck", self.healthcheck, methods=["GET"])
+        self.router.add_api_route("/readiness", self.readiness, methods=["GET"])
 
     async def healthcheck(self):
         return {
             "status": "ok"
         }
+
+    async def readiness(self):
+        # not ready until the models are loaded, the first request would pay the load time
+        status = self.warmer.status()
+        return JSONResponse(
+            content={"status": "ready" if status["ready"] else "warming", **status},
+            status_code=200 if status["ready"] else 503,
+        )
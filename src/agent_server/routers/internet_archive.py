@@ -0,0 +1,51 @@
+from logging import Logger
+from typing import Callable
+
+from fastapi import APIRouter
+from dependency_injector.wiring import inject, Provide
+from pydantic import BaseModel
+
+from ..container.container import Container
+from ..ai.agents.internet_archive import InternetArchiveAgent
+from ..renderer.open_webui import OpenWebUiRenderer
+from ..adapters.admission import AdmissionController
+
+
+class QueryInput(BaseModel):
+    question: str
+
+
+class Routes:
+    router: APIRouter
+    logger: Logger
+    renderer: OpenWebUiRenderer
+    admission: AdmissionController
+
+    def __call__(self, *args, **kwargs):
+        return self.router
+
+    @inject
+    def __init__(
+            self,
+            agent: Callable[[], InternetArchiveAgent] = Provide[Container.internet_archive_agent.provider],
+            logging: Logger = Provide[Container.logger],
+            renderer: OpenWebUiRenderer = Provide[Container.renderer],
+            admission: AdmissionController = Provide[Container.graph_admission],
+    ):
+        # resolved on the first request, the graph and the IA client are not built at startup
+        self._agent = agent
+        self.logger = logging
+        self.renderer = renderer
+        self.admission = admission
+        self.router = APIRouter()
+        self.router.add_api_route("/ia/stream", self.stream, methods=["POST"])
+
+    async def stream(self, query_input: QueryInput):
+        """Streams the Internet Archive agent, the search progress and found items arrive while the graph runs."""
+        return await self.admission.stream(
+            lambda: self.renderer.render(event_stream=self._agent().stream(query_input.question)),
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+            },
+        )
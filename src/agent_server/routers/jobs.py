@@ -0,0 +1,76 @@
+import json
+from logging import Logger
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from dependency_injector.wiring import inject, Provide
+from pydantic import BaseModel
+
+from ..container.container import Container
+from ..ai.graphs.jobs import IAJobManager
+
+
+class JobInput(BaseModel):
+    question: str
+
+
+class Routes:
+    router: APIRouter
+    jobs: IAJobManager
+    logger: Logger
+
+    def __call__(self, *args, **kwargs):
+        return self.router
+
+    @inject
+    def __init__(
+            self,
+            jobs: IAJobManager = Provide[Container.ia_jobs],
+            logging: Logger = Provide[Container.logger],
+    ):
+        self.jobs = jobs
+        self.logger = logging
+        self.router = APIRouter()
+        self.router.add_api_route("/jobs", self.submit, methods=["POST"], status_code=202)
+        self.router.add_api_route("/jobs/{job_id}", self.get, methods=["GET"])
+        self.router.add_api_route("/jobs/{job_id}", self.cancel, methods=["DELETE"])
+        self.router.add_api_route("/jobs/{job_id}/events", self.events, methods=["GET"])
+
+    async def submit(self, job_input: JobInput):
+        """Starts an Internet Archive search in the background, a running or recent job of the query is reused."""
+        job, created = await self.jobs.submit(job_input.question)
+        return JSONResponse(
+            content={**job, "created": created},
+            status_code=202,
+            headers={"Location": f"/jobs/{job['id']}"},
+        )
+
+    async def get(self, job_id: int):
+        job = await self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return job
+
+    async def cancel(self, job_id: int):
+        job = await self.jobs.cancel(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return JSONResponse(content=job, status_code=202)
+
+    async def events(self, job_id: int):
+        """The progress of the job as server-sent events, the stream ends with the final status."""
+        if await self.jobs.get(job_id, results=False) is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+        async def stream():
+            async for event in self.jobs.events(job_id):
+                yield f"data: {json.dumps(event)}\n\n"
+
+        return StreamingResponse(
+            stream(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+            }
+        )
@@ -0,0 +1,25 @@
+from dependency_injector.wiring import inject, Provide
+from fastapi import APIRouter
+
+from ..container.container import Container
+from ..metrics.registry import MetricsRegistry
+
+
+class Routes:
+    router: APIRouter
+    metrics: MetricsRegistry
+
+    def __call__(self, *args, **kwargs):
+        return self.router
+
+    @inject
+    def __init__(
+            self,
+            metrics: MetricsRegistry = Provide[Container.metrics],
+    ):
+        self.metrics = metrics
+        self.router = APIRouter()
+        self.router.add_api_route("/metrics", self.get_metrics, methods=["GET"])
+
+    async def get_metrics(self):
+        return self.metrics.snapshot()
@@ -1,18 +1,14 @@
-import json
-from typing import Any
+from typing import Callable
 
 from fastapi import  APIRouter
 from dependency_injector.wiring import inject, Provide
-from langgraph.graph.state import CompiledStateGraph
 
 from ..container.container import Container
-from ..ai.agents.internet_archive import InternetArchiveAgent
-from ..ai.states.internet_archive import InternetArchiveState
+from ..ai.graphs.runner import InternetArchiveGraphRunner
+from ..adapters.admission import AdmissionController
 
 class Routes:
     router: APIRouter
-    agent: InternetArchiveAgent
-    llm: Any
 
     def __call__(self, *args, **kwargs):
         return self.router
@@ -20,14 +16,13 @@ class Routes:
     @inject
     def __init__(
             self,
-            llm : Any = Provide[Container.ollamaLLM],
-            agent : InternetArchiveAgent = Provide[Container.internet_archive_agent],
-            graph : CompiledStateGraph = Provide[Container.internet_archive_graph]
+            runner : Callable[[], InternetArchiveGraphRunner] = Provide[Container.internet_archive_runner.provider],
+            admission : AdmissionController = Provide[Container.graph_admission],
     ):
         self.router = APIRouter()
-        self.llm = llm
-        self.agent = agent
-        self.graph = graph
+        # resolved on the first request, the graph and the IA client are not built at startup
+        self._runner = runner
+        self.admission = admission
         self.router.add_api_route("/test", self.test, methods=["GET"])
 
     async def test(self):
@@ -39,11 +34,8 @@ class Routes:
         #search_result = self.agent.ask(search_question)
         #search_answer = search_result["messages"][-1].content
 
-        internet_archive_state = InternetArchiveState(
-            query=search_question,
-        )
-
-        search_result = self.graph.invoke(internet_archive_state)
+        async with self.admission.admit():
+            search_result = await self._runner().ainvoke(search_question)
         search_answer = search_result
 
         return search_answer
@@ -0,0 +1,98 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from agent_server.adapters.admission import AdmissionController, AdmissionRejected
+from agent_server.metrics.registry import MetricsRegistry
+
+
+async def numbers(count: int):
+    for number in range(count):
+        yield number
+
+
+class TestAdmissionController(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+
+    def controller(self, **kwargs) -> AdmissionController:
+        return AdmissionController("chat", metrics=self.metrics, **kwargs)
+
+    async def test_queue_and_reject(self):
+        admission = self.controller(max_in_flight=1, max_queue=1, queue_timeout=1.0)
+        first = await admission.acquire()
+        waiting = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await admission.acquire()
+        assert rejected.exception.status_code == 429
+        assert int(rejected.exception.headers["Retry-After"]) >= 1
+        assert self.metrics.gauge("admission.chat.queue_depth") == 1
+
+        first.release()
+        second = await waiting
+        assert admission.stats()["in_flight"] == 1
+        second.release()
+
+        assert admission.stats() == {"max_in_flight": 1, "max_queue": 1, "in_flight": 0, "queued": 0}
+        assert self.metrics.counter("admission.chat.admitted") == 2
+        assert self.metrics.counter("admission.chat.rejected.queue_full") == 1
+
+    async def test_queue_timeout(self):
+        admission = self.controller(max_in_flight=1, max_queue=2, queue_timeout=0.05)
+        ticket = await admission.acquire()
+
+        with self.assertRaises(AdmissionRejected):
+            await admission.acquire()
+
+        assert admission.stats()["queued"] == 0
+        assert self.metrics.counter("admission.chat.rejected.timeout") == 1
+        ticket.release()
+        ticket.release()
+        assert admission.stats()["in_flight"] == 0
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        admission = self.controller(max_in_flight=1, max_queue=2)
+        ticket = await admission.acquire()
+        waiting = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        ticket.release()
+
+        assert admission.stats()["queued"] == 0
+        assert admission.stats()["in_flight"] == 0
+
+    async def test_guard_holds_the_slot_for_the_stream(self):
+        admission = self.controller(max_in_flight=1, max_queue=0)
+        ticket = await admission.acquire()
+        stream = ticket.guard(numbers(2))
+
+        assert await anext(stream) == 0
+        with self.assertRaises(AdmissionRejected):
+            await admission.acquire()
+        assert [number async for number in stream] == [1]
+
+        assert admission.stats()["in_flight"] == 0
+
+    async def test_stream_response_frees_the_slot_when_its_body_never_starts(self):
+        admission = self.controller(max_in_flight=1, max_queue=0)
+        response = await admission.stream(lambda: numbers(2))
+
+        assert admission.stats()["in_flight"] == 1
+        # the client went away before the body was sent
+        await response.background()
+        assert admission.stats()["in_flight"] == 0
+
+    async def test_unlimited(self):
+        admission = self.controller(max_in_flight=0, max_queue=0)
+
+        tickets = [await admission.acquire() for _ in range(10)]
+
+        assert admission.stats()["in_flight"] == 10
+        for ticket in tickets:
+            ticket.release()
+        assert admission.stats()["in_flight"] == 0
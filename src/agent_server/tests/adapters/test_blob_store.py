@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+import unittest
+
+from agent_server.adapters.blob_store import BlobStore, BlobStoreFactory, FileBlobStore
+
+FILES = [{"name": "tetris.pdf", "format": "Text PDF"}, {"name": "tetris_jp2.zip", "format": "JP2 ZIP"}]
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def test_put_is_content_addressed(self):
+        store = BlobStore()
+        handle = store.put(FILES)
+
+        self.assertTrue(handle.startswith("sha256:"))
+        self.assertEqual(store.put(list(FILES)), handle)
+        self.assertEqual(store.get(handle), FILES)
+        self.assertIsNone(store.get("sha256:unknown"))
+
+    def test_offload_and_load(self):
+        store = BlobStore()
+        item = {"metadata": {"identifier": "tetris"}, "files": FILES}
+        offloaded = store.offload(item, "files")
+
+        self.assertNotIn("files", offloaded)
+        self.assertIn("files", item)
+        self.assertEqual(store.load(offloaded, "files"), FILES)
+        # an entry with the list inline is read as is
+        self.assertEqual(store.load(item, "files"), FILES)
+        self.assertEqual(store.offload(offloaded, "files"), offloaded)
+
+    def test_memory_store_keeps_the_latest_entries(self):
+        store = BlobStore(max_entries=2)
+        handles = [store.put([i]) for i in range(3)]
+
+        self.assertIsNone(store.get(handles[0]))
+        self.assertEqual(store.get(handles[2]), [2])
+
+    def test_file_store_survives_the_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handle = FileBlobStore(directory).put(FILES)
+
+            self.assertEqual(FileBlobStore(directory).get(handle), FILES)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            self.assertIsNone(FileBlobStore(directory).get("sha256:../../etc/passwd"))
+
+    def test_file_store_removes_unused_payloads(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileBlobStore(directory, max_age=60)
+            old, used, new = store.put(["old"]), store.put(["used"]), store.put(["new"])
+            long_ago = time.time() - 120
+            for handle in (old, used):
+                os.utime(store._path(handle), (long_ago, long_ago))
+            store.get(used)
+
+            self.assertEqual(store.cleanup(), 1)
+            self.assertIsNone(store.get(old))
+            self.assertEqual(store.get(used), ["used"])
+            self.assertEqual(store.get(new), ["new"])
+
+    def test_factory(self):
+        self.assertIsNone(BlobStoreFactory.create("none"))
+        self.assertIsInstance(BlobStoreFactory.create("memory"), BlobStore)
+        self.assertIsInstance(BlobStoreFactory.create("memory", checkpoint_backend="none"), BlobStore)
+        self.assertIsInstance(BlobStoreFactory.create("file", directory="/tmp"), FileBlobStore)
+        with self.assertRaises(AttributeError):
+            BlobStoreFactory.create("file")
+        # the checkpoints would outlive the payloads
+        with self.assertRaises(AttributeError):
+            BlobStoreFactory.create("memory", checkpoint_backend="sqlite")
@@ -0,0 +1,62 @@
+import json
+import unittest
+
+from agent_server.adapters.internet_archive_records import IAFile, IAFileTable, IAItem, files_table
+from agent_server.ai.prompts.compaction import MetadataCompactor
+
+MD5 = "8c772fcc917bf151c90e54c9f4f05b48"
+SHA1 = "7afb26d1d0bebf83c13a8cac39832060c0734807"
+
+FILES = [
+    {"name": "manual.pdf", "source": "original", "format": "Text PDF", "size": "764250", "md5": MD5, "sha1": SHA1,
+     "mtime": "1607961347", "crc32": "0fd2a311"},
+    {"name": "manual_jp2.zip", "source": "derivative", "format": "Single Page Processed JP2 ZIP"},
+    {"name": "history/files/manual.pdf.~1~", "source": "derivative", "format": "Text PDF", "old_version": "true"},
+]
+
+
+class TestIAFileTable(unittest.TestCase):
+
+    def test_rows(self):
+        table = IAFileTable.from_files(FILES)
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table[0], IAFile(
+            name="manual.pdf", format="Text PDF", source="original", size=764250, md5=MD5, sha1=SHA1,
+        ))
+        self.assertEqual(table[1].to_dict(), {
+            "name": "manual_jp2.zip", "format": "Single Page Processed JP2 ZIP", "source": "derivative",
+        })
+        self.assertTrue(table[2].old_version)
+        # formats and sources are stored once
+        self.assertEqual(len(table.vocabulary), 5)
+
+    def test_json_round_trip(self):
+        table = IAFileTable.from_files(FILES)
+        loaded = files_table(json.loads(json.dumps(table.to_dict())))
+
+        self.assertEqual(list(loaded), list(table))
+
+    def test_unknown_schema(self):
+        with self.assertRaises(ValueError):
+            IAFileTable.from_dict({"schema": "ia-files/0"})
+
+    def test_smaller_than_the_file_dicts(self):
+        files = [
+            {"name": f"manual_{i}.jpg", "source": "derivative", "format": "JPEG", "size": "123456", "md5": MD5, "sha1": SHA1}
+            for i in range(300)
+        ]
+        self.assertLess(len(json.dumps(IAFileTable.from_files(files).to_dict())), len(json.dumps(files)) * 0.6)
+
+    def test_item(self):
+        item = IAItem.from_api({"identifier": "tetris", "title": "Tetris"}, FILES)
+        loaded = IAItem.from_dict(json.loads(json.dumps(item.to_dict())))
+
+        self.assertEqual(loaded.identifier, "tetris")
+        self.assertEqual(loaded.metadata["title"], "Tetris")
+        self.assertEqual(list(loaded.files), list(item.files))
+
+    def test_compactor_reads_the_table(self):
+        compacted = MetadataCompactor().compact_files(IAFileTable.from_files(FILES).to_dict())
+
+        self.assertEqual(compacted, [{"name": "manual.pdf", "format": "Text PDF", "source": "original", "size": 764250}])
@@ -0,0 +1,88 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+
+from agent_server.adapters.internet_archive import InternetArchiveSearchWrapper
+from agent_server.ai.nodes.internet_archive.Downloader import DownloaderNode
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """Sends the first bytes of a file, then the connection drops."""
+
+    async def __aiter__(self):
+        yield b"%PDF-1.4"
+        raise httpx.ReadError("connection reset")
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/download/tetris/manual.pdf":
+        return httpx.Response(200, content=b"%PDF-1.4 manual")
+    if request.url.path == "/download/tetris-2/manual.pdf":
+        return httpx.Response(200, content=b"%PDF-1.4 manual 2")
+    if request.url.path == "/download/tetris/broken.pdf":
+        return httpx.Response(200, stream=BrokenStream())
+    return httpx.Response(404)
+
+
+class TestInternetArchiveWrapperDownload(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.target_dir = Path(self.tmp.name)
+        self.ia = InternetArchiveSearchWrapper()
+        self.ia._async_client = httpx.AsyncClient(base_url="https://archive.org", transport=httpx.MockTransport(handler))
+        self.ia._async_client_loop = asyncio.get_running_loop()
+
+    async def asyncTearDown(self):
+        await self.ia.aclose()
+        self.tmp.cleanup()
+
+    def files(self) -> list[str]:
+        return sorted(path.relative_to(self.target_dir).as_posix() for path in self.target_dir.rglob("*") if path.is_file())
+
+    async def test_download(self):
+        assert await self.ia.adownload("tetris", ["manual.pdf"], self.target_dir) == {"success": True}
+        assert (self.target_dir / "tetris" / "manual.pdf").read_bytes() == b"%PDF-1.4 manual"
+
+    async def test_items_with_the_same_file_name(self):
+        await self.ia.adownload("tetris", ["manual.pdf"], self.target_dir)
+        await self.ia.adownload("tetris-2", ["manual.pdf"], self.target_dir)
+
+        assert self.files() == ["tetris-2/manual.pdf", "tetris/manual.pdf"]
+        assert (self.target_dir / "tetris-2" / "manual.pdf").read_bytes() == b"%PDF-1.4 manual 2"
+
+        node = DownloaderNode(ia=self.ia, data_dir=self.target_dir)
+        result = await node.ainvoke({"pdfs_to_download": {"tetris": ["manual.pdf"], "tetris-2": ["manual.pdf"]}})
+        assert result["downloaded"] == {
+            identifier: [str(self.target_dir / identifier / "manual.pdf")] for identifier in ("tetris", "tetris-2")
+        }
+
+    async def test_invalid_identifier(self):
+        with self.assertRaises(ValueError):
+            await self.ia.adownload("..", ["manual.pdf"], self.target_dir)
+
+    async def test_error_status_raises(self):
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.ia.adownload("tetris", ["missing.pdf"], self.target_dir)
+        assert self.files() == []
+
+    async def test_broken_stream_leaves_no_partial_file(self):
+        with self.assertRaises(httpx.ReadError):
+            await self.ia.adownload("tetris", ["broken.pdf"], self.target_dir)
+        assert self.files() == []
+
+    async def test_failed_download_is_not_recorded_as_downloaded(self):
+        node = DownloaderNode(ia=self.ia, data_dir=self.target_dir)
+
+        result = await node.ainvoke({"pdfs_to_download": {"tetris": ["manual.pdf"], "tetris-2": ["missing.pdf"]}})
+
+        assert list(result["downloaded"]) == ["tetris"]
+        assert len(result["error"]) == 1 and "404" in result["error"][0]
+
+    async def test_aclose_closes_the_client(self):
+        client = self.ia._async_client
+        await self.ia.aclose()
+        assert client.is_closed and self.ia._async_client is None
@@ -0,0 +1,78 @@
+import time
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from sqlmodel import create_engine
+
+from agent_server.adapters.llm_cache import SQLModelLLMCache, LLMCacheFactory
+from agent_server.adapters.ollama import ManagedChatOllama, keep_alive
+from agent_server.metrics.registry import MetricsRegistry
+
+
+class TestSQLModelLLMCache(unittest.TestCase):
+
+    def create_cache(self, **kwargs) -> SQLModelLLMCache:
+        return SQLModelLLMCache(
+            engine=create_engine("sqlite://"),
+            metrics=MetricsRegistry(),
+            **kwargs
+        )
+
+    def test_hit_returns_cached_generation(self):
+        cache = self.create_cache()
+        llm = FakeListChatModel(responses=["first", "second"], cache=cache)
+
+        self.assertEqual(llm.invoke("prompt").content, "first")
+        self.assertEqual(llm.invoke("prompt").content, "first")
+        self.assertEqual(llm.invoke("other prompt").content, "second")
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+
+    def test_ttl_expires_entries(self):
+        cache = self.create_cache(ttl=1)
+        cache.update("prompt", "llm", [])
+        self.assertEqual(cache.lookup("prompt", "llm"), [])
+        time.sleep(1.1)
+        self.assertIsNone(cache.lookup("prompt", "llm"))
+
+    def test_evicts_least_recently_used(self):
+        cache = self.create_cache(max_entries=2)
+        cache.update("a", "llm", [])
+        cache.update("b", "llm", [])
+        time.sleep(0.01)
+        cache.lookup("a", "llm")
+        cache.update("c", "llm", [])
+
+        self.assertIsNotNone(cache.lookup("a", "llm"))
+        self.assertIsNone(cache.lookup("b", "llm"))
+        self.assertIsNotNone(cache.lookup("c", "llm"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_factory_none_disables_cache(self):
+        self.assertIsNone(LLMCacheFactory.create(backend="none"))
+
+
+class TestManagedChatOllama(unittest.TestCase):
+
+    def test_llm_string_contains_model_and_temperature(self):
+        small = ManagedChatOllama(model="llama3.2:3b", temperature=0.0)
+        large = ManagedChatOllama(model="qwen2.5", temperature=0.0)
+        warm = ManagedChatOllama(model="qwen2.5", temperature=0.7)
+
+        self.assertNotEqual(small._get_llm_string(), large._get_llm_string())
+        self.assertNotEqual(large._get_llm_string(), warm._get_llm_string())
+
+    def test_llm_string_contains_output_schema(self):
+        llm = ManagedChatOllama(model="qwen2.5")
+        self.assertNotEqual(
+            llm._get_llm_string(format={"type": "object"}),
+            llm._get_llm_string(format={"type": "array"}),
+        )
+
+    def test_keep_alive_durations_and_seconds(self):
+        self.assertEqual(keep_alive("30m"), "30m")
+        self.assertEqual(keep_alive(" 1800 "), 1800)
+        self.assertEqual(keep_alive("-1"), -1)
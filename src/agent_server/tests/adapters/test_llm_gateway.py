@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from agent_server.adapters.llm_gateway import LLMGateway, llm_priority, current_priority
+from agent_server.metrics.registry import MetricsRegistry
+
+
+class TestLLMGateway(unittest.TestCase):
+
+    def test_concurrency_limit(self):
+        gateway = LLMGateway(max_concurrency=2)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work():
+            with gateway.slot("graph"):
+                with lock:
+                    running.append(1)
+                    peak.append(len(running))
+                time.sleep(0.02)
+                with lock:
+                    running.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(gateway.stats()["active"], 0)
+
+    def test_priority_context(self):
+        self.assertEqual(current_priority(), "interactive")
+        with llm_priority("batch"):
+            self.assertEqual(current_priority(), "batch")
+        self.assertEqual(current_priority(), "interactive")
+
+
+class TestLLMGatewayAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_weighted_fair_order(self):
+        metrics = MetricsRegistry()
+        gateway = LLMGateway(max_concurrency=1, weights={"interactive": 2, "batch": 1}, metrics=metrics)
+        order = []
+        blocker = asyncio.Event()
+
+        async def hold():
+            async with gateway.aslot("batch"):
+                await blocker.wait()
+
+        async def work(priority: str):
+            async with gateway.aslot(priority):
+                order.append(priority)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(work("batch")) for _ in range(2)]
+        tasks += [asyncio.create_task(work("interactive")) for _ in range(4)]
+        await asyncio.sleep(0)
+        self.assertEqual(gateway.stats()["queued"], {"interactive": 4, "batch": 2})
+
+        blocker.set()
+        await asyncio.gather(holder, *tasks)
+
+        self.assertEqual(order, ["interactive", "interactive", "batch", "interactive", "interactive", "batch"])
+        self.assertEqual(metrics.summary("llm_gateway.wait_seconds.interactive")["count"], 4)
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        gateway = LLMGateway(max_concurrency=1)
+        blocker = asyncio.Event()
+
+        async def hold():
+            async with gateway.aslot():
+                await blocker.wait()
+
+        async def wait():
+            async with gateway.aslot():
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        blocker.set()
+        await holder
+        self.assertEqual(gateway.stats(), {
+            "max_concurrency": 1,
+            "active": 0,
+            "queued": {"interactive": 0, "graph": 0, "batch": 0},
+        })
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from agent_server.adapters.single_flight import SingleFlight, SingleFlightFactory
+from agent_server.metrics.registry import MetricsRegistry
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        metrics = MetricsRegistry()
+        flight = SingleFlight(metrics=metrics)
+        executions = []
+        results = []
+
+        def work():
+            executions.append(1)
+            time.sleep(0.1)
+            return {"items": ["tetris"]}
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do("tetris", work))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(results, [{"items": ["tetris"]}] * 5)
+        self.assertEqual(metrics.counter("single_flight.coalesced"), 4)
+        # the next call executes again
+        flight.do("tetris", work)
+        self.assertEqual(len(executions), 2)
+
+    def test_error_is_shared(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do("tetris", lambda: (_ for _ in ()).throw(ValueError("boom")))
+
+    def test_factory(self):
+        self.assertIsNone(SingleFlightFactory.create("none"))
+        self.assertIsInstance(SingleFlightFactory.create("local"), SingleFlight)
+
+
+class TestSingleFlightAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_coroutines_share_one_execution(self):
+        flight = SingleFlight()
+        executions = []
+
+        async def work():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return ["tetris"]
+
+        results = await asyncio.gather(*(flight.ado("tetris", work) for _ in range(5)))
+        other = await flight.ado("mario", work)
+
+        self.assertEqual(len(executions), 2)
+        self.assertEqual(results, [["tetris"]] * 5)
+        self.assertEqual(other, ["tetris"])
+
+    async def test_cancelled_waiter_does_not_cancel_execution(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.ado("tetris", work))
+        follower = asyncio.create_task(flight.ado("tetris", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+
+        self.assertEqual(await leader, "done")
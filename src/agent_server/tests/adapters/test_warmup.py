@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime
+
+from agent_server.adapters.warmup import ModelWarmer, parse_hours
+from agent_server.metrics.registry import MetricsRegistry
+
+
+class FakeOllamaClient:
+    def __init__(self, failing: set[str] = frozenset()):
+        self.failing = failing
+        self.calls = []
+
+    def generate(self, model, prompt, keep_alive=None):
+        self.calls.append(("generate", model, keep_alive))
+        if model in self.failing:
+            raise ConnectionError("ollama not reachable")
+
+    def embed(self, model, input, keep_alive=None):
+        self.calls.append(("embed", model, keep_alive))
+        if model in self.failing:
+            raise ConnectionError("ollama not reachable")
+
+
+class TestModelWarmer(unittest.TestCase):
+
+    def test_warm_loads_all_models(self):
+        client = FakeOllamaClient()
+        metrics = MetricsRegistry()
+        warmer = ModelWarmer(
+            base_url="http://ollama",
+            chat_models=["qwen2.5", "qwen2.5"],
+            embedding_models=["nomic-embed-text"],
+            keep_alive=1800,
+            metrics=metrics,
+            client=client,
+        )
+        self.assertFalse(warmer.ready)
+
+        self.assertTrue(warmer.warm())
+
+        self.assertTrue(warmer.ready)
+        self.assertEqual(client.calls, [
+            ("generate", "qwen2.5", 1800),
+            ("embed", "nomic-embed-text", 1800),
+        ])
+        self.assertEqual(metrics.summary("warmup.seconds.qwen2.5")["count"], 1)
+        self.assertEqual(metrics.gauge("warmup.ready"), 1.0)
+
+    def test_not_ready_while_a_model_fails(self):
+        client = FakeOllamaClient(failing={"nomic-embed-text"})
+        warmer = ModelWarmer("http://ollama", ["qwen2.5"], ["nomic-embed-text"], client=client)
+
+        self.assertFalse(warmer.warm())
+
+        self.assertFalse(warmer.ready)
+        self.assertIn("nomic-embed-text", warmer.status()["last_error"])
+
+    def test_disabled_is_ready(self):
+        warmer = ModelWarmer("http://ollama", ["qwen2.5"], enabled=False, client=FakeOllamaClient())
+        self.assertTrue(warmer.ready)
+
+    def test_business_hours(self):
+        self.assertIsNone(parse_hours(""))
+        day = ModelWarmer("http://ollama", [], hours="7-22", client=FakeOllamaClient())
+        night = ModelWarmer("http://ollama", [], hours="22-6", client=FakeOllamaClient())
+
+        self.assertTrue(day.in_business_hours(datetime(2025, 1, 1, 7)))
+        self.assertFalse(day.in_business_hours(datetime(2025, 1, 1, 22)))
+        self.assertTrue(night.in_business_hours(datetime(2025, 1, 1, 23)))
+        self.assertFalse(night.in_business_hours(datetime(2025, 1, 1, 12)))
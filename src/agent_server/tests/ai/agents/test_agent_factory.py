@@ -0,0 +1,42 @@
+import logging
+import tempfile
+from unittest import TestCase
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from agent_server.ai.agents.internet_archive import AgentFactory
+
+
+class FakeToolChatModel(FakeListChatModel):
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+class TestAgentFactory(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.factory = AgentFactory(
+            llm=FakeToolChatModel(responses=["{}"]),
+            logger=logging.getLogger(__name__),
+            engine=None,
+            langfuse_config=None,
+            cache_dir=f"{self.tmp.name}/cache",
+            data_dir=self.tmp.name,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_nothing_is_built_before_first_use(self):
+        assert self.factory._shared == {}
+
+    def test_agent_and_graph_share_the_instances(self):
+        graph = self.factory.graph
+        self.factory.create()
+
+        assert self.factory.graph is graph
+        assert self.factory.runner.graph is graph
+        assert self.factory.create_graph() is not graph
+        assert set(self.factory._shared) == {"ia", "graph", "runner", "digest"}
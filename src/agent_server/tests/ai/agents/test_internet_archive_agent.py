@@ -0,0 +1,83 @@
+import json
+import logging
+import tempfile
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from sqlmodel import create_engine
+
+from agent_server.adapters.checkpoint import SQLModelCheckpointSaver
+from agent_server.ai.agents.internet_archive import AgentFactory
+from agent_server.ai.graphs.budget import BudgetLimits
+from agent_server.ai.graphs.progress import PROGRESS_EVENT, FOUND_EVENT
+from agent_server.renderer.open_webui import OpenWebUiRenderer
+from agent_server.tests.ai.graphs.test_internet_archive_graph import FakeInternetArchive, PromptRoutingChatModel, KEPT
+
+
+class ToolCallingChatModel(BaseChatModel):
+    """Calls the search tool first and answers after the tool result."""
+
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "tool-calling-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        if self.calls % 2:
+            message = AIMessage("", tool_calls=[
+                {"name": "internet_archive_search", "args": {"tool_input": "Tetris Manual"}, "id": f"call-{self.calls}"},
+            ])
+        else:
+            message = AIMessage("Here are the manuals")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class TestInternetArchiveAgentStream(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.factory = AgentFactory(
+            # the agent's stream puts the graph LLM calls into streaming mode, the fake answers in _call only
+            llm=PromptRoutingChatModel(disable_streaming=True),
+            llms={"agent": ToolCallingChatModel()},
+            logger=logging.getLogger(__name__),
+            engine=None,
+            langfuse_config={},
+            cache_dir=f"{self.tmp.name}/cache",
+            data_dir=self.tmp.name,
+            checkpointer=SQLModelCheckpointSaver(engine=create_engine(f"sqlite:///{self.tmp.name}/checkpoints.sqlite")),
+            budget_limits=BudgetLimits(),
+        )
+        self.factory._shared["ia"] = FakeInternetArchive()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_graph_progress_reaches_the_agent_stream(self):
+        events = [event async for event in self.factory.create().stream("Where is the Tetris manual?")]
+
+        custom = [chunk for namespace, mode, chunk in events if mode == "custom"]
+        assert custom[0]["type"] == PROGRESS_EVENT and custom[0]["text"] == "search: 6 hits"
+        assert sorted(event["identifier"] for event in custom if event["type"] == FOUND_EVENT) == KEPT
+
+        renderer = OpenWebUiRenderer(logger=logging.getLogger(__name__))
+
+        async def replay():
+            for event in events:
+                yield event
+
+        rendered = [json.loads(message.removeprefix("data: ")) async for message in renderer.render(replay())]
+        statuses = [m["event"]["data"]["description"] for m in rendered if "event" in m]
+        deltas = [m["choices"][0]["delta"] for m in rendered if "choices" in m]
+        contents = [delta["content"] for delta in deltas if "content" in delta]
+        assert "search: 6 hits" in statuses
+        assert len([content for content in contents if content.startswith("- found:")]) == 2
+        assert contents[-1] == "Here are the manuals"
@@ -0,0 +1,148 @@
+import logging
+import os
+import tempfile
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+from agent_server.ai.graphs.budget import BudgetLimits, RunBudget, budget_from, with_budget
+from agent_server.ai.graphs.runner import InternetArchiveGraphRunner
+from agent_server.ai.nodes.internet_archive.FileFinder import FileFinderNode
+from agent_server.ai.prompts.internet_archive import FileFinderPromptFactory
+from agent_server.tests.ai.graphs.test_internet_archive_graph import (
+    FakeInternetArchive, PromptRoutingChatModel, build_graph, IDENTIFIERS, KEPT,
+)
+
+
+class TestRunBudget(TestCase):
+
+    def test_unlimited(self):
+        budget = RunBudget()
+
+        assert budget.allows_llm()
+        assert not budget.expired()
+        assert budget.take_items(["a", "b"]) == ["a", "b"]
+        assert budget.reserve_download(10 ** 12)
+        assert budget.report()["exhausted"] == []
+
+    def test_limits(self):
+        budget = RunBudget(BudgetLimits(max_llm_calls=1, max_items=3, max_download_bytes=100, deadline_seconds=0))
+
+        budget.charge_llm(calls=1, tokens=5)
+        assert not budget.allows_llm()
+        assert budget.take_items(["a", "b"]) == ["a", "b"]
+        assert budget.take_items(["c", "d"]) == ["c"]
+        assert budget.reserve_download(60)
+        assert not budget.reserve_download(60)
+        assert budget.reserve_download(None)
+        assert budget.expired()
+
+        report = budget.report()
+        assert report["exhausted"] == ["deadline", "download_bytes", "items"]
+        assert (report["llm_calls"], report["tokens"], report["items"], report["download_bytes"]) == (1, 5, 3, 60)
+
+    def test_config(self):
+        budget = RunBudget()
+        config = with_budget({"configurable": {"thread_id": "t"}}, budget)
+
+        assert budget_from(config) is budget
+        assert config["configurable"]["thread_id"] == "t"
+        assert budget_from(None) is None
+
+
+class TestGraphBudget(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = f"{self.tmp.name}/cache"
+        self.data_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_graph(self, ia: FakeInternetArchive, limits: BudgetLimits) -> dict:
+        runner = InternetArchiveGraphRunner(build_graph(ia, self.cache_dir, self.data_dir), budget_limits=limits)
+        return runner.invoke("Tetris Manual")
+
+    def test_budget_is_reported(self):
+        result = self.run_graph(FakeInternetArchive(), BudgetLimits())
+
+        assert result["entries_to_consider"] == KEPT
+        # filter, finder and file finder for the two kept items
+        assert result["budget"]["llm_calls"] == 5
+        assert result["budget"]["tokens"] > 0
+        assert result["budget"]["items"] == 2
+        assert result["budget"]["exhausted"] == []
+
+    def test_llm_budget_returns_best_so_far(self):
+        ia = FakeInternetArchive()
+        result = self.run_graph(ia, BudgetLimits(max_llm_calls=1))
+
+        # the filter answered, the entries were not judged any more
+        assert result["filtered_results"] == KEPT
+        assert list(result["metadata"]) == KEPT
+        assert result["entries_to_consider"] == []
+        assert ia.downloads == []
+        assert result["budget"]["llm_calls"] == 1
+        assert result["budget"]["exhausted"] == ["llm_calls"]
+
+    def test_item_budget(self):
+        ia = FakeInternetArchive()
+        result = self.run_graph(ia, BudgetLimits(max_items=1))
+
+        assert result["entries_to_consider"] == KEPT[:1]
+        assert ia.metadata_calls == KEPT[:1]
+        assert ia.downloads == [("tetris-1", ("tetris-1.pdf",))]
+        assert result["budget"]["exhausted"] == ["items"]
+
+    def test_deadline(self):
+        ia = FakeInternetArchive()
+        result = self.run_graph(ia, BudgetLimits(deadline_seconds=0))
+
+        # no LLM call, no IA request after the search: the unfiltered results without metadata
+        assert result["filtered_results"] == IDENTIFIERS
+        assert ia.metadata_calls == []
+        assert ia.downloads == []
+        assert result["budget"]["llm_calls"] == 0
+        assert result["budget"]["exhausted"] == ["deadline"]
+        # the unfiltered results are not written to the query cache
+        assert not any(files for _, _, files in os.walk(self.cache_dir))
+
+
+class TestFileFinderBudget(TestCase):
+
+    def test_falls_back_to_the_first_pdf(self):
+        node = FileFinderNode(
+            llm=PromptRoutingChatModel(), prompt_factory=FileFinderPromptFactory(), logger=logging.getLogger(__name__)
+        )
+        budget = RunBudget(BudgetLimits(max_llm_calls=0))
+        state = {
+            "query": "Tetris Manual",
+            "entries_to_consider": ["tetris-1"],
+            "metadata": {"tetris-1": FakeInternetArchive().item_metadata("tetris-1")},
+        }
+
+        result = node.invoke(state, with_budget(None, budget))
+
+        assert result["pdfs_to_download"] == {"tetris-1": ["tetris-1.pdf"]}
+        assert budget.llm_calls == 0
+
+
+class TestGraphBudgetAsync(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_llm_budget(self):
+        ia = FakeInternetArchive()
+        graph = build_graph(ia, f"{self.tmp.name}/cache", self.tmp.name)
+        runner = InternetArchiveGraphRunner(graph)
+
+        result = await runner.ainvoke("Tetris Manual", limits=BudgetLimits(max_llm_calls=1))
+
+        assert result["filtered_results"] == KEPT
+        assert result["entries_to_consider"] == []
+        assert ia.downloads == []
+        assert result["budget"]["llm_calls"] == 1
+        assert result["budget"]["exhausted"] == ["llm_calls"]
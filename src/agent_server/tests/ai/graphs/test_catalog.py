@@ -0,0 +1,108 @@
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from agent_server.adapters.catalog_store import CatalogSelection, CatalogStore
+from agent_server.adapters.ia_search_store import IASearchStore
+from agent_server.ai.graphs.catalog import CatalogSweeper, catalog_query
+from agent_server.ai.graphs.runner import InternetArchiveGraphRunner
+from agent_server.catalog import parse_args
+from agent_server.models.manual import Game, Platform, Manual, ManualSource, IASearch
+from agent_server.tests.ai.graphs.test_internet_archive_graph import FakeInternetArchive, build_graph, KEPT
+from agent_server.tests.ai.graphs.test_runner import FlakyInternetArchive
+
+
+class TestCatalogSweeper(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmp.name}/catalog.sqlite")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            session.add_all([
+                Platform(id=1, name="Nintendo Entertainment System"),
+                Platform(id=2, name="Game Boy"),
+                Game(id=1, name="Tetris", year=1989, platform=1),
+                # the same game twice in the catalog, one query
+                Game(id=2, name="tetris", year=1989, platform=1),
+                Game(id=3, name="Tetris", year=1989, platform=2),
+            ])
+            session.commit()
+        self.catalog = CatalogStore(engine=self.engine)
+        self.sweeper = self.sweeper_for(FakeInternetArchive())
+
+    def sweeper_for(self, ia: FakeInternetArchive) -> CatalogSweeper:
+        self.ia = ia
+        graph = build_graph(ia, f"{self.tmp.name}/cache", self.tmp.name)
+        return CatalogSweeper(
+            runner=InternetArchiveGraphRunner(graph),
+            search_store=IASearchStore(engine=self.engine),
+            catalog_store=self.catalog,
+        )
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def sources(self, game_id: int) -> list[tuple[str, str]]:
+        with Session(self.engine) as session:
+            return sorted(
+                (source.identifier, source.file_name)
+                for source in session.exec(
+                    select(ManualSource).join(Manual, ManualSource.manual_id == Manual.id).where(Manual.game_id == game_id)
+                ).all()
+            )
+
+    async def test_sweep_links_the_manuals(self):
+        report = await self.sweeper.sweep(CatalogSelection(platforms=("nintendo entertainment system",)))
+
+        summary = report.to_dict()
+        assert (summary["status"], summary["games"], summary["queries"], summary["done"]) == ("done", 2, 1, 1)
+        assert summary["manuals"] == 2
+        assert summary["sources"] == 4
+        expected = [(identifier, f"{identifier}.pdf") for identifier in KEPT]
+        assert self.sources(1) == self.sources(2) == expected
+        assert self.sources(3) == []
+        assert self.ia.searches == 1
+
+        # done games are skipped, the sweep resumes with the rest
+        assert [game.id for game in self.catalog.games(CatalogSelection())] == [3]
+        assert [game.id for game in self.catalog.games(CatalogSelection(game_ids=(1,), force=True))] == [1]
+
+    async def test_shared_identifiers(self):
+        report = await self.sweeper.sweep(CatalogSelection(years=(1989,)))
+
+        assert report.queries == 2
+        # both queries find the same items, each runs once and is linked to the games of both
+        assert report.shared_identifiers == len(KEPT)
+        assert sorted(self.ia.metadata_calls) == KEPT
+        assert len(self.ia.downloads) == len(KEPT)
+        assert self.sources(3) == self.sources(1) == [(identifier, f"{identifier}.pdf") for identifier in KEPT]
+        assert report.manuals == 3
+        with Session(self.engine) as session:
+            assert [search.status for search in session.exec(select(IASearch)).all()] == ["done", "done"]
+
+    async def test_failed_download_is_not_linked(self):
+        self.sweeper = self.sweeper_for(FlakyInternetArchive("tetris-4"))
+
+        report = await self.sweeper.sweep(CatalogSelection(game_ids=(1,)))
+
+        assert report.sources == 1
+        assert self.sources(1) == [("tetris-1", "tetris-1.pdf")]
+
+    async def test_only_the_last_finished_reports_are_kept(self):
+        self.sweeper.max_reports = 2
+        running = self.sweeper._new_report()
+        reports = [await self.sweeper.sweep(CatalogSelection(game_ids=(4,))) for _ in range(3)]
+
+        assert self.sweeper.report(reports[0].id) is None
+        assert [self.sweeper.report(report.id)["status"] for report in reports[1:]] == ["done", "done"]
+        assert self.sweeper.report(running.id)["status"] == "running"
+
+    def test_query_and_cli(self):
+        [game] = self.catalog.games(CatalogSelection(platforms=("2",)))
+        args = parse_args(["--platform", "Game Boy", "--year", "1989", "--ids", "1,3", "--force"])
+
+        assert catalog_query(game) == "Tetris (Game Boy) Manual"
+        assert (args.platform, args.year, args.ids, args.force) == (["Game Boy"], [1989], [1, 3], True)
@@ -0,0 +1,258 @@
+import json
+import logging
+import tempfile
+import threading
+from typing import Any, List
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+
+from agent_server.adapters.blob_store import BlobStore
+from agent_server.adapters.internet_archive import InternetArchiveSearchWrapper
+from agent_server.adapters.internet_archive_records import IAItem, files_table
+from agent_server.ai.graphs.internet_archive import InternetArchiveGraphBuilder
+from agent_server.ai.nodes.internet_archive.Database import DatabaseNode
+from agent_server.ai.nodes.internet_archive.Downloader import DownloaderNode
+from agent_server.ai.nodes.internet_archive.FileFinder import FileFinderNode
+from agent_server.ai.nodes.internet_archive.Filter import FilterNode
+from agent_server.ai.nodes.internet_archive.Finder import FinderNode, FinderEarlyStop
+from agent_server.ai.nodes.internet_archive.Metadata import MetadataNode, MetadataPrefetchNode
+from agent_server.ai.nodes.internet_archive.Search import SearchNode
+from agent_server.ai.prompts.internet_archive import FilterPromptFactory, FinderPromptFactory, FileFinderPromptFactory
+from agent_server.metrics.memory import state_size
+
+IDENTIFIERS = [f"tetris-{i}" for i in range(6)]
+KEPT = ["tetris-1", "tetris-4"]
+
+
+class FakeInternetArchive(InternetArchiveSearchWrapper):
+    """Answers like the IA API without network access and records the calls."""
+
+    def __init__(self, failing: tuple = (), extra_files: int = 0, **data):
+        super().__init__(**data)
+        self._failing = failing
+        self._extra_files = extra_files
+        self._lock = threading.Lock()
+        self._metadata_calls = []
+        self._downloads = []
+        self._async_calls = 0
+        self._searches = 0
+
+    def search(self, query: str, **kwargs: Any) -> str:
+        with self._lock:
+            self._searches += 1
+        return json.dumps({"items": IDENTIFIERS, "q": query, "k": self.k})
+
+    def item_metadata(self, query: str, **kwargs: Any) -> dict:
+        with self._lock:
+            self._metadata_calls.append(query)
+        if query in self._failing:
+            raise ConnectionError(f"metadata of {query} not available")
+        return IAItem.from_api(
+            {"identifier": query, "title": f"Tetris Manual {query}"},
+            [
+                {"name": f"{query}.pdf", "format": "Text PDF", "source": "original", "size": "4200000"},
+                {"name": f"{query}_jp2.zip", "format": "Single Page Processed JP2 ZIP", "source": "derivative"},
+            ] + [
+                {"name": f"{query}_page_{i}.jpg", "format": "JPEG", "source": "derivative", "size": "123456"}
+                for i in range(self._extra_files)
+            ],
+        ).to_dict()
+
+    def download(self, identifier: str, files: List[str], target_dir):
+        with self._lock:
+            self._downloads.append((identifier, tuple(files)))
+
+    async def asearch(self, query: str, **kwargs: Any) -> str:
+        self._async_calls += 1
+        return self.search(query, **kwargs)
+
+    async def aitem_metadata(self, query: str, **kwargs: Any) -> dict:
+        self._async_calls += 1
+        return self.item_metadata(query, **kwargs)
+
+    async def adownload(self, identifier: str, files: List[str], target_dir):
+        self._async_calls += 1
+        self.download(identifier, files, target_dir)
+
+    @property
+    def searches(self) -> int:
+        return self._searches
+
+    @property
+    def async_calls(self) -> int:
+        return self._async_calls
+
+    @property
+    def metadata_calls(self) -> list[str]:
+        return self._metadata_calls
+
+    @property
+    def downloads(self) -> list[tuple]:
+        return self._downloads
+
+
+class PromptRoutingChatModel(FakeListChatModel):
+    """Answers depending on which node prompt it receives."""
+
+    responses: list = []
+
+    def _call(self, messages: list[BaseMessage], *args: Any, **kwargs: Any) -> str:
+        prompt = messages[-1].content
+        if "filters Internet Archive search results" in prompt:
+            return json.dumps({"filtered_results": KEPT})
+        if "evaluates Internet Archive entries" in prompt:
+            return json.dumps({"is_this_entry_relevant": True})
+        if "selects the most relevant PDF" in prompt:
+            name = prompt.split("Item identifier/name:\n")[1].split("\n")[0]
+            return json.dumps({"pdfs_to_download": [f"{name}.pdf"]})
+        return "{}"
+
+
+def build_graph(
+        ia: FakeInternetArchive,
+        cache_dir: str,
+        data_dir: str,
+        prefetch_depth: int = 0,
+        checkpointer=None,
+        downloader_node=None,
+        blob_store=None,
+        early_stop: FinderEarlyStop | None = None,
+):
+    logger = logging.getLogger(__name__)
+    llm = PromptRoutingChatModel()
+    return InternetArchiveGraphBuilder(
+        search_node=SearchNode(_logger=logger, ia=ia),
+        filter_node=FilterNode(llm=llm, prompt_factory=FilterPromptFactory(), logger=logger),
+        metadata_node=MetadataNode(_logger=logger, _blob_store=blob_store, ia=ia),
+        finder_node=FinderNode(llm=llm, prompt_factory=FinderPromptFactory(), logger=logger, early_stop=early_stop),
+        file_finder_node=FileFinderNode(
+            llm=llm, prompt_factory=FileFinderPromptFactory(), logger=logger, blob_store=blob_store,
+        ),
+        downloader_node=downloader_node or DownloaderNode(ia=ia, data_dir=data_dir, logger=logger),
+        database_node=DatabaseNode(engine=None, logger=logger),
+        metadata_prefetch_node=MetadataPrefetchNode(
+            _logger=logger, _blob_store=blob_store, ia=ia, depth=prefetch_depth
+        ) if prefetch_depth else None,
+        logger=logger,
+        cache_dir=cache_dir,
+        checkpointer=checkpointer,
+    ).build()
+
+
+class TestInternetArchiveGraph(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = f"{self.tmp.name}/cache"
+        self.data_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_invoke(self):
+        ia = FakeInternetArchive()
+        graph = build_graph(ia, self.cache_dir, self.data_dir)
+        result = graph.invoke({"query": "Tetris Manual"})
+
+        assert result["filtered_results"] == KEPT
+        assert list(result["metadata"].keys()) == KEPT
+        assert result["entries_to_consider"] == KEPT
+        assert result["pdfs_to_download"] == {name: [f"{name}.pdf"] for name in KEPT}
+        assert sorted(ia.downloads) == [(name, (f"{name}.pdf",)) for name in KEPT]
+
+    def test_invoke_with_prefetch(self):
+        ia = FakeInternetArchive()
+        graph = build_graph(ia, self.cache_dir, self.data_dir, prefetch_depth=3)
+        result = graph.invoke({"query": "Tetris Manual"})
+
+        assert list(result["metadata"].keys()) == KEPT
+        assert result.get("prefetched_metadata") is None
+        # top 3 prefetched, tetris-1 reused, tetris-4 fetched afterwards
+        assert sorted(ia.metadata_calls) == ["tetris-0", "tetris-1", "tetris-2", "tetris-4"]
+
+    def test_failing_item_does_not_stop_the_others(self):
+        ia = FakeInternetArchive(failing=("tetris-1",))
+        graph = build_graph(ia, self.cache_dir, self.data_dir)
+        result = graph.invoke({"query": "Tetris Manual"})
+
+        assert result["entries_to_consider"] == ["tetris-4"]
+        assert ia.downloads == [("tetris-4", ("tetris-4.pdf",))]
+        assert result["error"] == ["tetris-1: No metadata available"]
+
+    def test_errors_of_all_stages_are_appended(self):
+        ia = FakeInternetArchive(failing=("tetris-1", "tetris-4"))
+        result = build_graph(ia, self.cache_dir, self.data_dir).invoke({"query": "Tetris Manual"})
+
+        assert sorted(result["error"]) == ["tetris-1: No metadata available", "tetris-4: No metadata available"]
+
+    def test_file_lists_are_kept_out_of_the_state(self):
+        inline = build_graph(
+            FakeInternetArchive(extra_files=200), f"{self.cache_dir}/inline", self.data_dir,
+        ).invoke({"query": "Tetris Manual"})
+
+        blob_store = BlobStore()
+        ia = FakeInternetArchive(extra_files=200)
+        result = build_graph(
+            ia, f"{self.cache_dir}/blobs", self.data_dir, prefetch_depth=3, blob_store=blob_store,
+        ).invoke({"query": "Tetris Manual"})
+
+        assert all("files" not in entry for entry in result["metadata"].values())
+        assert len(files_table(blob_store.load(result["metadata"]["tetris-1"], "files"))) == 202
+        assert result["pdfs_to_download"] == {name: [f"{name}.pdf"] for name in KEPT}
+        assert state_size(result) * 10 < state_size(inline)
+
+    def test_early_stop_sends_items_in_waves(self):
+        ia = FakeInternetArchive()
+        graph = build_graph(ia, self.cache_dir, self.data_dir, early_stop=FinderEarlyStop(max_hits=1, window=1))
+        result = graph.invoke({"query": "Tetris Manual"})
+
+        # the first item was a hit, the second one was never sent
+        assert result["filtered_results"] == KEPT
+        assert result["dispatched"] == KEPT[:1]
+        assert result["entries_to_consider"] == KEPT[:1]
+        assert ia.metadata_calls == KEPT[:1]
+        assert ia.downloads == [("tetris-1", ("tetris-1.pdf",))]
+
+    def test_wave_is_not_larger_than_the_missing_hits(self):
+        ia = FakeInternetArchive()
+        graph = build_graph(ia, self.cache_dir, self.data_dir, early_stop=FinderEarlyStop(max_hits=1, window=2))
+        result = graph.invoke({"query": "Tetris Manual"})
+
+        assert result["dispatched"] == KEPT[:1]
+        assert ia.metadata_calls == KEPT[:1]
+
+    def test_cached_filter_results_fan_out(self):
+        graph = build_graph(FakeInternetArchive(), self.cache_dir, self.data_dir)
+        graph.invoke({"query": "Tetris Manual"})
+
+        ia = FakeInternetArchive()
+        result = build_graph(ia, self.cache_dir, self.data_dir).invoke({"query": "Tetris Manual"})
+
+        assert result["cached_results"] is True
+        assert sorted(ia.metadata_calls) == KEPT
+        assert result["pdfs_to_download"] == {name: [f"{name}.pdf"] for name in KEPT}
+
+
+class TestInternetArchiveGraphAsync(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = f"{self.tmp.name}/cache"
+        self.data_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_ainvoke_uses_async_nodes(self):
+        ia = FakeInternetArchive()
+        graph = build_graph(ia, self.cache_dir, self.data_dir, prefetch_depth=3)
+        result = await graph.ainvoke({"query": "Tetris Manual"})
+
+        assert result["entries_to_consider"] == KEPT
+        assert result["pdfs_to_download"] == {name: [f"{name}.pdf"] for name in KEPT}
+        assert sorted(ia.downloads) == [(name, (f"{name}.pdf",)) for name in KEPT]
+        # 1 search + 3 prefetched + 1 missing metadata + 2 downloads, all through the async API
+        assert ia.async_calls == 7
@@ -0,0 +1,104 @@
+import asyncio
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from agent_server.adapters.blob_store import BlobStore
+from agent_server.adapters.ia_search_store import IASearchStore, JOB_DONE, JOB_CANCELLED, JOB_RUNNING
+from agent_server.ai.graphs.jobs import IAJobManager, STATUS_EVENT
+from agent_server.ai.graphs.progress import PROGRESS_EVENT
+from agent_server.ai.graphs.runner import InternetArchiveGraphRunner
+from agent_server.models.manual import IAItem, IAItemFile, IASearch
+from agent_server.tests.ai.graphs.test_internet_archive_graph import FakeInternetArchive, build_graph, IDENTIFIERS, KEPT
+from agent_server.tests.ai.graphs.test_runner import SlowInternetArchive
+
+
+class TestIAJobManager(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmp.name}/jobs.sqlite")
+        SQLModel.metadata.create_all(self.engine)
+        self.store = IASearchStore(engine=self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def manager(self, ia: FakeInternetArchive, blob_store: BlobStore | None = None) -> IAJobManager:
+        graph = build_graph(ia, f"{self.tmp.name}/cache", self.tmp.name, blob_store=blob_store)
+        return IAJobManager(runner=lambda: InternetArchiveGraphRunner(graph), store=self.store)
+
+    async def test_job_results_are_persisted(self):
+        jobs = self.manager(FakeInternetArchive())
+
+        job, created = await jobs.submit("Tetris Manual")
+        events = [event async for event in jobs.events(job["id"])]
+        result = await jobs.get(job["id"])
+
+        assert created and job["status"] == "queued"
+        assert [e["status"] for e in events if e["type"] == STATUS_EVENT] == ["queued", "running", "done"]
+        assert any(e["type"] == PROGRESS_EVENT and e["stage"] == "search" for e in events)
+        assert result["status"] == JOB_DONE
+        assert result["stage"] == "done"
+        assert result["results"]["results"] == IDENTIFIERS
+        assert result["results"]["filtered_results"] == KEPT
+        assert sorted(result["results"]["entries_to_consider"]) == KEPT
+        assert result["results"]["pdfs_to_download"] == {identifier: [f"{identifier}.pdf"] for identifier in KEPT}
+
+        with Session(self.engine) as session:
+            assert session.get(IAItem, "tetris-1").title == "Tetris Manual tetris-1"
+            pdf = session.exec(select(IAItemFile).where(IAItemFile.identifier == "tetris-1")).one()
+            assert (pdf.name, pdf.size_bytes) == ("tetris-1.pdf", 4200000)
+
+    async def test_file_details_are_read_from_the_blob_store(self):
+        blob_store = BlobStore()
+        self.store = IASearchStore(engine=self.engine, blob_store=blob_store)
+        jobs = self.manager(FakeInternetArchive(), blob_store=blob_store)
+
+        job, _ = await jobs.submit("Tetris Manual")
+        [event async for event in jobs.events(job["id"])]
+
+        with Session(self.engine) as session:
+            pdf = session.exec(select(IAItemFile).where(IAItemFile.identifier == "tetris-4")).one()
+            assert (pdf.name, pdf.format, pdf.size_bytes) == ("tetris-4.pdf", "Text PDF", 4200000)
+
+    async def test_submit_is_idempotent_per_normalized_query(self):
+        ia = FakeInternetArchive()
+        jobs = self.manager(ia)
+
+        (first, _), (second, created) = await asyncio.gather(
+            jobs.submit("Tetris Manual"), jobs.submit('  "tetris"  manual')
+        )
+        assert second["id"] == first["id"] and not created
+        [event async for event in jobs.events(first["id"])]
+
+        again, created = await jobs.submit("TETRIS MANUAL")
+        assert again["id"] == first["id"] and not created
+        assert ia.searches == 1
+
+    async def test_cancel(self):
+        jobs = self.manager(SlowInternetArchive())
+        job, _ = await jobs.submit("Tetris Manual")
+        await asyncio.sleep(0.05)
+
+        cancelled = await jobs.cancel(job["id"])
+
+        assert cancelled["status"] == JOB_CANCELLED
+        assert [event async for event in jobs.events(job["id"])][-1]["status"] == JOB_CANCELLED
+        # a cancelled job is started again
+        retried, created = await jobs.submit("Tetris Manual")
+        assert created and retried["id"] != job["id"]
+        await jobs.cancel(retried["id"])
+
+    async def test_recover_unfinished_jobs(self):
+        with Session(self.engine) as session:
+            session.add(IASearch(query="Tetris Manual", normalized_query="tetris manual", status=JOB_RUNNING))
+            session.commit()
+        jobs = self.manager(FakeInternetArchive())
+
+        assert await jobs.recover() == 1
+        [event async for event in jobs.events(1)]
+
+        assert (await jobs.get(1))["status"] == JOB_DONE
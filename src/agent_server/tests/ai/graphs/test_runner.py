@@ -0,0 +1,228 @@
+import asyncio
+import tempfile
+import threading
+import time
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+from sqlmodel import create_engine
+
+from agent_server.adapters.checkpoint import SQLModelCheckpointSaver
+from agent_server.adapters.single_flight import SingleFlight
+from agent_server.ai.graphs.budget import BudgetLimits
+from agent_server.ai.graphs.progress import PROGRESS_EVENT, FOUND_EVENT
+from agent_server.ai.graphs.runner import InternetArchiveGraphRunner, normalize_query, thread_id_for
+from agent_server.ai.nodes.internet_archive.Downloader import DownloaderNode
+from agent_server.metrics.registry import MetricsRegistry
+from agent_server.tests.ai.graphs.test_internet_archive_graph import FakeInternetArchive, build_graph, KEPT
+
+
+class CrashingDownloaderNode(DownloaderNode):
+    """Crashes the first time it runs for `identifier`, like a killed worker."""
+
+    def __init__(self, identifier: str, **kwargs):
+        super().__init__(**kwargs)
+        self.identifier = identifier
+        self.crashed = False
+
+    def invoke(self, state, config=None, **kwargs):
+        if not self.crashed and self.identifier in (state.get("pdfs_to_download") or {}):
+            self.crashed = True
+            raise RuntimeError("worker killed")
+        return super().invoke(state, config, **kwargs)
+
+
+class FlakyInternetArchive(FakeInternetArchive):
+    """The first download of `identifier` times out, the DownloaderNode records the error and returns."""
+
+    def __init__(self, identifier: str, **data):
+        super().__init__(**data)
+        self._flaky = identifier
+        self._timed_out = False
+
+    def download(self, identifier, files, target_dir):
+        if identifier == self._flaky and not self._timed_out:
+            self._timed_out = True
+            raise TimeoutError("IA timeout")
+        super().download(identifier, files, target_dir)
+
+
+class SlowInternetArchive(FakeInternetArchive):
+
+    def search(self, query, **kwargs):
+        time.sleep(0.1)
+        return super().search(query, **kwargs)
+
+
+class TestInternetArchiveGraphRunner(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = f"{self.tmp.name}/cache"
+        self.data_dir = self.tmp.name
+        self.checkpointer = SQLModelCheckpointSaver(engine=create_engine(f"sqlite:///{self.tmp.name}/checkpoints.sqlite"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_thread_id_from_normalized_query(self):
+        assert normalize_query('  "Tetris"   MANUAL ') == "tetris manual"
+        assert thread_id_for("Tetris Manual") == thread_id_for("tetris  manual")
+        assert thread_id_for("Tetris Manual") != thread_id_for("Tetris 2 Manual")
+
+    def test_resume_after_crash(self):
+        ia = FakeInternetArchive()
+        downloader = CrashingDownloaderNode("tetris-4", ia=ia, data_dir=self.data_dir)
+        runner = InternetArchiveGraphRunner(graph=build_graph(
+            ia, self.cache_dir, self.data_dir, checkpointer=self.checkpointer, downloader_node=downloader,
+        ))
+
+        with self.assertRaises(RuntimeError):
+            runner.invoke("Tetris Manual")
+        assert ia.searches == 1
+        assert sorted(ia.metadata_calls) == KEPT
+
+        result = runner.invoke("tetris manual")
+
+        # search, filter and the metadata of both items are not done again
+        assert ia.searches == 1
+        assert sorted(ia.metadata_calls) == KEPT
+        assert result["pdfs_to_download"] == {name: [f"{name}.pdf"] for name in KEPT}
+        assert sorted(ia.downloads) == [(name, (f"{name}.pdf",)) for name in KEPT]
+
+    def test_failed_items_of_a_finished_run_are_retried(self):
+        ia = FlakyInternetArchive("tetris-4")
+        runner = InternetArchiveGraphRunner(graph=build_graph(
+            ia, self.cache_dir, self.data_dir, checkpointer=self.checkpointer,
+        ))
+
+        first = runner.invoke("Tetris Manual")
+        assert first["item_errors"] == ["tetris-4: IA timeout"]
+        assert list(first["downloaded"]) == ["tetris-1"]
+
+        second = runner.invoke("Tetris Manual")
+
+        # only the failed item runs again
+        assert ia.searches == 1
+        assert sorted(ia.metadata_calls) == ["tetris-1", "tetris-4", "tetris-4"]
+        assert sorted(ia.downloads) == [(name, (f"{name}.pdf",)) for name in KEPT]
+        assert not second["item_errors"] and not second["error"]
+        assert sorted(second["downloaded"]) == KEPT
+        assert second["entries_to_consider"] == KEPT
+
+        third = runner.invoke("Tetris Manual")
+        assert len(ia.downloads) == 2
+        assert third["downloaded"] == second["downloaded"]
+
+    def test_finished_run_is_answered_from_checkpoint(self):
+        ia = FakeInternetArchive()
+        runner = InternetArchiveGraphRunner(graph=build_graph(
+            ia, self.cache_dir, self.data_dir, checkpointer=self.checkpointer,
+        ))
+
+        first = runner.invoke("Tetris Manual")
+        second = runner.invoke("Tetris Manual")
+
+        assert second["entries_to_consider"] == first["entries_to_consider"] == KEPT
+        assert len(ia.downloads) == 2
+
+    def test_run_cut_short_by_its_budget_is_not_reused(self):
+        ia = FakeInternetArchive()
+        runner = InternetArchiveGraphRunner(graph=build_graph(
+            ia, self.cache_dir, self.data_dir, checkpointer=self.checkpointer,
+        ))
+
+        limited = runner.invoke("Tetris Manual", limits=BudgetLimits(max_items=1))
+        assert limited["budget"]["exhausted"] == ["items"]
+        assert limited["entries_to_consider"] == ["tetris-1"]
+
+        result = runner.invoke("Tetris Manual")
+        assert result["entries_to_consider"] == KEPT
+
+    def test_stale_run_starts_over(self):
+        ia = FakeInternetArchive()
+        runner = InternetArchiveGraphRunner(graph=build_graph(
+            ia, self.cache_dir, self.data_dir, checkpointer=self.checkpointer,
+        ), max_age=-1)
+
+        runner.invoke("Tetris Manual")
+        result = runner.invoke("Tetris Manual")
+
+        assert result["entries_to_consider"] == KEPT
+        assert len(ia.downloads) == 4
+
+    def test_identical_concurrent_runs_are_coalesced(self):
+        ia = SlowInternetArchive()
+        runner = InternetArchiveGraphRunner(
+            graph=build_graph(ia, self.cache_dir, self.data_dir),
+            single_flight=SingleFlight(),
+        )
+        results = []
+        queries = ["Tetris Manual", "tetris manual", "Tetris  Manual"]
+        threads = [threading.Thread(target=lambda q=q: results.append(runner.invoke(q))) for q in queries]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert ia.searches == 1
+        assert len(ia.downloads) == 2
+        assert [result["entries_to_consider"] for result in results] == [KEPT] * 3
+
+    def test_memory_of_a_run_is_recorded(self):
+        metrics = MetricsRegistry()
+        runner = InternetArchiveGraphRunner(
+            graph=build_graph(FakeInternetArchive(), self.cache_dir, self.data_dir),
+            metrics=metrics,
+            trace_memory=True,
+        )
+        runner.invoke("Tetris Manual")
+
+        assert metrics.summary("ia_graph.state_bytes")["count"] == 1
+        assert metrics.summary("ia_graph.peak_memory_bytes")["max"] > 0
+
+
+class TestInternetArchiveGraphRunnerStream(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_progress_is_streamed_before_the_result(self):
+        ia = FakeInternetArchive()
+        runner = InternetArchiveGraphRunner(graph=build_graph(ia, f"{self.tmp.name}/cache", self.tmp.name))
+
+        events = [event async for event in runner.astream("Tetris Manual")]
+
+        custom = [chunk for mode, chunk in events if mode == "custom"]
+        assert events[-1][0] == "values"
+        assert events[-1][1]["entries_to_consider"] == KEPT
+        assert custom[0] == {"type": PROGRESS_EVENT, "stage": "search", "text": "search: 6 hits", "hits": 6}
+        assert custom[1]["text"] == "filter: 2 of 6 relevant"
+        assert sorted(event["identifier"] for event in custom if event["type"] == FOUND_EVENT) == KEPT
+        assert custom[-1]["stage"] == "done"
+        found = next(event for event in custom if event["type"] == FOUND_EVENT)
+        assert found["files"] == [{"name": f"{found['identifier']}.pdf", "format": "Text PDF", "size": 4200000}]
+
+    async def test_stream_and_invoke_of_a_query_share_one_run(self):
+        ia = SlowInternetArchive()
+        checkpointer = SQLModelCheckpointSaver(engine=create_engine(f"sqlite:///{self.tmp.name}/checkpoints.sqlite"))
+        runner = InternetArchiveGraphRunner(graph=build_graph(
+            ia, f"{self.tmp.name}/cache", self.tmp.name, checkpointer=checkpointer,
+        ))
+
+        async def stream():
+            return [event async for event in runner.astream("Tetris Manual")]
+
+        async def invoke():
+            await asyncio.sleep(0.05)
+            return await runner.ainvoke("tetris manual")
+
+        events, state = await asyncio.gather(stream(), invoke())
+
+        assert ia.searches == 1
+        assert len(ia.downloads) == 2
+        assert events[-1][1]["entries_to_consider"] == state["entries_to_consider"] == KEPT
+        assert sorted(state["downloaded"]) == KEPT
+        assert events[0][1]["text"] == "search: 6 hits"
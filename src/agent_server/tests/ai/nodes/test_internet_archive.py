@@ -1,15 +1,18 @@
+import asyncio
 import time
 import logging
-from unittest import TestCase
+from unittest import TestCase, IsolatedAsyncioTestCase
 
+from langchain_core.embeddings import Embeddings
 from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from langchain_core.messages import BaseMessage
 from langchain_core.outputs import ChatResult, ChatGeneration
 from typing_extensions import override
 
 from agent_server.ai.nodes.internet_archive.Filter import FilterNode
-from agent_server.ai.nodes.internet_archive.Finder import FinderNode
+from agent_server.ai.nodes.internet_archive.Finder import FinderNode, FinderEarlyStop
 from agent_server.ai.prompts.internet_archive import FinderPromptFactory, FilterPromptFactory
+from agent_server.ai.rankers.embedding import EmbeddingRanker
 from agent_server.ai.states.internet_archive import InternetArchiveState
 
 DATA_VALID:dict={
@@ -215,6 +218,45 @@ class FakeListAndRespChatModel(FakeListChatModel):
         return self.received_messages
 
 
+class FakeKeywordEmbeddings(Embeddings):
+    """Embeds texts as [mentions tetris, mentions manual]."""
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        text = text.lower()
+        return [float("tetris" in text), float("manual" in text)]
+
+
+class CountingKeywordEmbeddings(FakeKeywordEmbeddings):
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(texts)
+        return self.embed_documents(texts)
+
+
+class TestEmbeddingRanker(IsolatedAsyncioTestCase):
+
+    async def test_items_ranked_together_share_one_call(self):
+        embeddings = CountingKeywordEmbeddings()
+        ranker = EmbeddingRanker(embeddings=embeddings)
+        items = [{name: {"title": name}} for name in ("Tetris Manual", "Tetris Box", "Super Mario")]
+
+        scores = await asyncio.gather(*(ranker.ascore("Tetris Manual", item) for item in items))
+
+        ranked = [round(score[name], 3) for score, name in zip(scores, ("Tetris Manual", "Tetris Box", "Super Mario"))]
+        assert ranked == [1.0, 0.707, 0.0]
+        # the query once, the three entries in the same call
+        assert len(embeddings.calls) == 1 and len(embeddings.calls[0]) == 4
+
+        await ranker.ascore("Tetris Manual", {"Tetris 2": {"title": "Tetris 2"}})
+        assert embeddings.calls[1] == ["search_document: Tetris 2\nTetris 2"]
+
+
 class TestFindNode(TestCase):
     response: list[str] = [
         "{\"is_this_entry_relevant\":true}"
@@ -258,6 +300,68 @@ class TestFindNode(TestCase):
         assert entries_to_consider is not None
         assert "super-mario-bros-2-nes-spielanleitung" in entries_to_consider
 
+    def test_invoke_with_ranker_asks_llm_only_for_uncertain(self):
+        llm = FakeListChatModel(responses=self.response * 2)
+        finder = FinderNode(
+            llm=llm,
+            logger=None,
+            prompt_factory=FinderPromptFactory,
+            ranker=EmbeddingRanker(
+                embeddings=FakeKeywordEmbeddings(),
+                upper_threshold=0.9,
+                lower_threshold=0.5,
+            ),
+        )
+        state = InternetArchiveState(
+            query="Tetris Manual",
+            metadata={
+                "unrelated": {"metadata": {"title": "Super Mario"}},
+                "tetris-manual": {"metadata": {"title": "Tetris Manual"}},
+                "tetris-box": {"metadata": {"title": "Tetris Box"}},
+            },
+        )
+        result = finder.invoke(state=state)
+
+        assert result.get("entries_to_consider") == ["tetris-manual", "tetris-box"]
+        assert result.get("relevance_scores")["unrelated"] == 0.0
+        # only the uncertain entry has been sent to the LLM
+        assert llm.i == 1
+
+    @staticmethod
+    def early_stop_state() -> InternetArchiveState:
+        return InternetArchiveState(
+            query="Tetris Manual",
+            metadata={f"tetris-{i}": {"metadata": {"title": f"Tetris {i}"}} for i in range(6)},
+        )
+
+    def test_early_stop_after_max_hits(self):
+        relevant, irrelevant = self.response[0], "{\"is_this_entry_relevant\":false}"
+        llm = FakeListChatModel(responses=[irrelevant, relevant, relevant, relevant])
+        finder = FinderNode(
+            llm=llm,
+            logger=None,
+            prompt_factory=FinderPromptFactory,
+            early_stop=FinderEarlyStop(max_hits=1, window=1),
+        )
+        result = finder.invoke(state=self.early_stop_state())
+
+        assert result.get("entries_to_consider") == ["tetris-1"]
+        assert llm.i == 2
+
+    def test_early_stop_when_a_hit_is_unlikely(self):
+        llm = FakeListChatModel(responses=["{\"is_this_entry_relevant\":false}"] * 6)
+        finder = FinderNode(
+            llm=llm,
+            logger=None,
+            prompt_factory=FinderPromptFactory,
+            early_stop=FinderEarlyStop(max_hits=1, min_hit_probability=0.3, window=1),
+        )
+        result = finder.invoke(state=self.early_stop_state())
+
+        assert result.get("entries_to_consider") == []
+        # 1/3 after the first miss, 1/4 after the second
+        assert llm.i == 2
+
 
 class TestFilterNode(TestCase):
     response: list[str] = [
@@ -300,4 +404,22 @@ class TestFilterNode(TestCase):
         assert error is ""
         filtered_results = result.get("filtered_results") or None
         assert filtered_results is not None
-        assert "super-mario-bros-2-nes-spielanleitung" in filtered_results
\ No newline at end of file
+        assert "super-mario-bros-2-nes-spielanleitung" in filtered_results
+
+    def test_invoke_chunks_keep_ranking(self):
+        results = [f"item-{i}" for i in range(30)]
+        # every chunk answers with the same identifiers in reverse order, plus an unknown one
+        llm = FakeListChatModel(responses=[
+            "{\"filtered_results\":[\"item-25\", \"made-up\", \"item-3\", \"item-12\"]}"
+        ])
+        node = FilterNode(
+            llm=llm,
+            prompt_factory=FilterPromptFactory,
+            logger=None,
+            chunk_token_budget=20,
+        )
+        result = node.invoke(state=InternetArchiveState(query="Tetris Manual", results=results))
+        assert result.get("filtered_results") == ["item-3", "item-12", "item-25"]
+        timings = result.get("filter_timings")
+        assert len(timings) > 1
+        assert sum(t["size"] for t in timings) == 30
@@ -0,0 +1,47 @@
+import json
+import unittest
+from typing import Any
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_ollama import ChatOllama
+
+from agent_server.ai.nodes.internet_archive.Finder import FinderNodeStructuredOutput
+from agent_server.ai.nodes.structured import StructuredOutput, json_schema
+
+
+class FakeOllama(ChatOllama):
+    """Answers like Ollama would with a `format` schema, records the requested format."""
+    formats: list = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.formats.append(kwargs.get("format"))
+        content = json.dumps({"is_this_entry_relevant": True})
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+class TestStructuredOutput(unittest.TestCase):
+
+    def test_ollama_gets_json_schema_format(self):
+        llm = FakeOllama(model="fake", formats=[])
+        structured = StructuredOutput(llm, FinderNodeStructuredOutput)
+
+        response = structured.invoke("is it relevant?")
+
+        self.assertEqual(structured.mode, "ollama_format")
+        self.assertIsNone(structured.parser)
+        self.assertTrue(response.is_this_entry_relevant)
+        self.assertEqual(llm.formats, [json_schema(FinderNodeStructuredOutput)])
+        # compiled once per model
+        self.assertIs(json_schema(FinderNodeStructuredOutput), json_schema(FinderNodeStructuredOutput))
+
+    def test_json_parser_for_models_without_structured_output(self):
+        llm = FakeListChatModel(responses=['```json\n{"is_this_entry_relevant": false}\n```'])
+        structured = StructuredOutput(llm, FinderNodeStructuredOutput)
+
+        response = structured.invoke("is it relevant?")
+
+        self.assertEqual(structured.mode, "json_parser")
+        self.assertIsNotNone(structured.parser)
+        self.assertFalse(response.is_this_entry_relevant)
@@ -0,0 +1,61 @@
+import json
+from unittest import TestCase
+
+from agent_server.ai.prompts.compaction import MetadataCompactor, estimate_tokens
+from agent_server.ai.prompts.internet_archive import FileFinderPromptFactory, FinderPromptFactory
+from agent_server.tests.ai.nodes.test_internet_archive import DATA_VALID
+
+IDENTIFIER = "super-mario-bros-2-nes-spielanleitung"
+ENTRY = DATA_VALID["metadata"][IDENTIFIER]
+
+
+class TestMetadataCompactor(TestCase):
+
+    def test_metadata_whitelist(self):
+        compacted = MetadataCompactor().compact_metadata(ENTRY["metadata"])
+        assert compacted["title"] == "Super Mario Bros 2 - NES - Spielanleitung"
+        assert "ocr_detected_script_conf" not in compacted
+        assert "curation" not in compacted
+
+    def test_description_truncated(self):
+        compacted = MetadataCompactor(description_max_chars=20).compact_metadata(
+            {"title": "x", "description": "a very long description " * 50}
+        )
+        assert len(compacted["description"]) <= 21
+
+    def test_metadata_budget(self):
+        metadata = {**ENTRY["metadata"], "description": "word " * 2000}
+        compactor = MetadataCompactor(metadata_token_budget=60)
+        compacted = compactor.compact_metadata(metadata)
+        assert compacted["identifier"] == IDENTIFIER
+        assert compactor._tokens(compacted) <= 60
+
+    def test_metadata_budget_is_a_hard_cap(self):
+        metadata = {**ENTRY["metadata"], "title": "Super Mario Bros 2 Spielanleitung " * 100}
+        compacted = MetadataCompactor(metadata_token_budget=40).compact_metadata(metadata)
+
+        assert estimate_tokens(json.dumps(compacted, ensure_ascii=False)) <= 40
+        assert compacted["title"].startswith("Super Mario Bros 2") and compacted["title"].endswith("…")
+        assert compacted["identifier"] == IDENTIFIER
+
+    def test_files_only_candidates(self):
+        files = MetadataCompactor().compact_files(ENTRY["files"])
+        names = [f["name"] for f in files]
+        assert names == [
+            "Super Mario Bros 2 - NES - Spielanleitung.pdf",
+            "Super Mario Bros 2 - NES - Spielanleitung_text.pdf",
+        ]
+        assert "md5" not in files[0]
+
+    def test_files_budget(self):
+        files = [{"name": f"manual-{i}.pdf", "format": "Text PDF", "source": "original"} for i in range(500)]
+        compacted = MetadataCompactor(files_token_budget=200).compact_files(files)
+        assert 0 < len(compacted) < 500
+
+    def test_prompts_are_smaller(self):
+        prompt = FileFinderPromptFactory.create(query="Super Mario Bros 2 Manual", name=IDENTIFIER, files=ENTRY["files"])
+        assert "_jp2.zip" not in prompt
+        assert "__ia_thumb.jpg" not in prompt
+
+        prompt = FinderPromptFactory.create(query="Super Mario Bros 2 Manual", name=IDENTIFIER, metadata=ENTRY["metadata"])
+        assert estimate_tokens(prompt) < 600
@@ -0,0 +1,82 @@
+import json
+import tempfile
+from unittest import TestCase
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from agent_server.adapters.blob_store import BlobStore
+from agent_server.ai.graphs.runner import InternetArchiveGraphRunner
+from agent_server.ai.tools.digest import InternetArchiveDigest
+from agent_server.ai.tools.internet_archive import InternetArchiveSearchTool, InternetArchiveDetailTool
+from agent_server.tests.ai.graphs.test_internet_archive_graph import FakeInternetArchive, build_graph, KEPT
+
+
+class TestInternetArchiveDigest(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = BlobStore()
+        ia = FakeInternetArchive(extra_files=200)
+        self.state = build_graph(ia, f"{self.tmp.name}/cache", self.tmp.name).invoke({"query": "Tetris Manual"})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_digest_holds_the_selected_items(self):
+        digest = InternetArchiveDigest(store=self.store).digest(self.state)
+
+        assert [item["identifier"] for item in digest["items"]] == KEPT
+        assert digest["items"][0] == {
+            "identifier": "tetris-1",
+            "title": "Tetris Manual tetris-1",
+            "pdfs": ["tetris-1.pdf"],
+            "paths": [f"{self.tmp.name}/tetris-1/tetris-1.pdf"],
+        }
+        assert digest["errors"] == []
+        assert len(json.dumps(digest)) < len(json.dumps(self.state)) / 10
+
+    def test_digest_is_capped(self):
+        state = {**self.state, "error": [f"error {i} " * 100 for i in range(20)]}
+        digest = InternetArchiveDigest(store=self.store, max_chars=800).digest(state)
+
+        assert len(json.dumps(digest, ensure_ascii=False, separators=(",", ":"))) <= 800
+        assert digest["items"] == []
+        assert digest["omitted_items"] == 2
+        assert len(digest["errors"]) + digest["omitted_errors"] == 20
+
+    def test_detail_on_demand(self):
+        digest = InternetArchiveDigest(store=self.store)
+        handle = digest.digest(self.state)["detail"]
+
+        item = json.loads(digest.detail(handle, "tetris-4"))
+        assert item["metadata"]["title"] == "Tetris Manual tetris-4"
+        assert [f["name"] for f in item["pdf_files"]] == ["tetris-4.pdf"]
+
+        overview = json.loads(digest.detail(handle))
+        assert overview["entries_to_consider"] == KEPT
+        assert "error" in json.loads(digest.detail("sha256:unknown"))
+
+    def test_detail_is_capped(self):
+        digest = InternetArchiveDigest(store=self.store, detail_max_chars=250)
+        handle = digest.digest({**self.state, "error": ["IA timeout " * 100]})["detail"]
+
+        for identifier in (None, "tetris-4"):
+            text = digest.detail(handle, identifier)
+            detail = json.loads(text)
+            assert len(text) <= 250
+            assert detail["truncated"]
+        assert json.loads(digest.detail(handle, "tetris-4"))["identifier"] == "tetris-4"
+
+    def test_tools(self):
+        digest = InternetArchiveDigest(store=self.store)
+        ia = FakeInternetArchive()
+        search = InternetArchiveSearchTool(
+            llm=FakeListChatModel(responses=["unused"]),
+            logger=None,
+            runner=InternetArchiveGraphRunner(graph=build_graph(ia, f"{self.tmp.name}/tool", self.tmp.name)),
+            digest=digest,
+        )
+        result = json.loads(search.invoke({"tool_input": "Tetris Manual"}))
+        detail = InternetArchiveDetailTool(digest=digest).invoke({"handle": result["detail"], "identifier": "tetris-1"})
+
+        assert json.loads(detail)["pdfs"] == ["tetris-1.pdf"]
@@ -0,0 +1,38 @@
+import unittest
+
+from langchain_core.language_models import FakeListChatModel
+
+from agent_server.adapters.ollama import ManagedChatOllama
+from agent_server.metrics.llm import LLMRoleMetricsHandler
+from agent_server.metrics.registry import MetricsRegistry
+
+
+class TestLLMRoleMetrics(unittest.TestCase):
+
+    def test_records_calls_and_latency_per_role(self):
+        metrics = MetricsRegistry()
+        filter_llm = FakeListChatModel(
+            responses=["a", "b"],
+            callbacks=[LLMRoleMetricsHandler(role="filter", metrics=metrics)],
+        )
+        finder_llm = FakeListChatModel(
+            responses=["c"],
+            callbacks=[LLMRoleMetricsHandler(role="finder", metrics=metrics)],
+        )
+
+        filter_llm.invoke("one")
+        filter_llm.invoke("two")
+        finder_llm.invoke("three")
+
+        self.assertEqual(metrics.counter("llm.filter.calls"), 2)
+        self.assertEqual(metrics.counter("llm.finder.calls"), 1)
+        self.assertEqual(metrics.summary("llm.filter.seconds")["count"], 2)
+
+    def test_role_model_falls_back_to_default(self):
+        metrics = MetricsRegistry()
+        small = ManagedChatOllama.for_role("filter", "qwen2.5:0.5b", "qwen2.5", metrics=metrics)
+        default = ManagedChatOllama.for_role("agent", "", "qwen2.5", metrics=metrics)
+
+        self.assertEqual(small.model, "qwen2.5:0.5b")
+        self.assertEqual(default.model, "qwen2.5")
+        self.assertEqual(default.callbacks[0].role, "agent")
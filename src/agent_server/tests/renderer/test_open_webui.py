@@ -0,0 +1,88 @@
+import json
+import logging
+from unittest import IsolatedAsyncioTestCase
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+from agent_server.ai.graphs.progress import PROGRESS_EVENT, FOUND_EVENT
+from agent_server.renderer.open_webui import OpenWebUiRenderer
+
+
+async def stream(events):
+    for event in events:
+        yield event
+
+
+def parse(messages: list[str]) -> list[dict]:
+    return [json.loads(message.removeprefix("data: ")) for message in messages]
+
+
+class TestOpenWebUiRenderer(IsolatedAsyncioTestCase):
+
+    async def render(self, events) -> list[dict]:
+        renderer = OpenWebUiRenderer(logger=logging.getLogger(__name__))
+        return parse([message async for message in renderer.render(stream(events))])
+
+    @staticmethod
+    def statuses(messages: list[dict]) -> list[str]:
+        return [m["event"]["data"]["description"] for m in messages if "event" in m]
+
+    @staticmethod
+    def contents(messages: list[dict]) -> list[str]:
+        deltas = [m["choices"][0]["delta"] for m in messages if "choices" in m]
+        return [delta["content"] for delta in deltas if "content" in delta]
+
+    @staticmethod
+    def reasoning(messages: list[dict]) -> list[str]:
+        deltas = [m["choices"][0]["delta"] for m in messages if "choices" in m]
+        return [delta["reasoning_content"] for delta in deltas if "reasoning_content" in delta]
+
+    async def test_values_stream(self):
+        messages = await self.render([
+            {"messages": [HumanMessage("Tetris?")]},
+            {"messages": [HumanMessage("Tetris?"), AIMessage("The manual")]},
+        ])
+
+        assert self.contents(messages) == ["The manual"]
+        assert self.statuses(messages) == ["Datenbank Zugriff gestartet", "Datenbank Zugriff beendet"]
+
+    async def test_progress_and_found_items(self):
+        messages = await self.render([
+            ((), "values", {"messages": [HumanMessage("Tetris?")]}),
+            (("tools:1",), "custom", {"type": PROGRESS_EVENT, "stage": "search", "text": "search: 37 hits"}),
+            (("tools:1",), "custom", {"type": PROGRESS_EVENT, "stage": "filter", "text": "filter: 2 of 37", "kept": 2}),
+            (("tools:1",), "custom", {"type": PROGRESS_EVENT, "stage": "metadata", "text": "metadata: a", "items": 1}),
+            (("tools:1",), "values", {"query": "Tetris", "messages": [AIMessage("internal")]}),
+            (("tools:1",), "custom", {
+                "type": FOUND_EVENT, "identifier": "tetris-manual", "title": "Tetris manual",
+                "files": [{"name": "tetris.pdf", "format": "Text PDF", "size": 4200000}],
+            }),
+            ((), "values", {"messages": [HumanMessage("Tetris?"), AIMessage("Here it is")]}),
+        ])
+
+        assert self.statuses(messages)[1:4] == ["search: 37 hits", "filter: 2 of 37", "metadata 1/2"]
+        assert self.contents(messages) == [
+            "- found: [Tetris manual](https://archive.org/details/tetris-manual) (PDF, 4.2 MB)\n",
+            "Here it is",
+        ]
+
+    async def test_messages_stream(self):
+        agent, tools = {"langgraph_node": "agent"}, {"langgraph_node": "tools"}
+        messages = await self.render([
+            ((), "messages", (AIMessageChunk("", tool_call_chunks=[
+                {"name": "sql_db_query", "args": "", "id": "call-1", "index": 0},
+            ]), agent)),
+            ((), "messages", (AIMessageChunk("", tool_call_chunks=[
+                {"name": None, "args": '{"query": "SELECT 1"}', "id": None, "index": 0},
+            ]), agent)),
+            # the query checker of the SQL toolkit is an LLM call within the tools node
+            ((), "messages", (AIMessageChunk("SELECT 1"), tools)),
+            ((), "messages", (ToolMessage("[(1,)]", tool_call_id="call-1"), tools)),
+            (("tools:1",), "messages", (AIMessageChunk("internal"), agent)),
+            ((), "messages", (AIMessageChunk("One "), agent)),
+            ((), "messages", (AIMessageChunk([{"type": "text", "text": "game"}]), agent)),
+        ])
+
+        assert self.statuses(messages)[1:-1] == ["tool: sql_db_query"]
+        assert self.reasoning(messages) == ["\n```\n[(1,)]\n```\n"]
+        assert self.contents(messages) == ["One ", "game"]
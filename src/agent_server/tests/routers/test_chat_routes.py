@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+from fastapi import FastAPI
+from langchain_community.utilities.sql_database import SQLDatabase
+
+from agent_server.adapters.admission import AdmissionController
+from agent_server.ai.agents.sql_agent import SQLAgent
+from agent_server.metrics.registry import MetricsRegistry
+from agent_server.renderer.open_webui import OpenWebUiRenderer
+from agent_server.routers import chat, healthcheck
+from agent_server.tests.ai.agents.test_agent_factory import FakeToolChatModel
+
+DELAY = 0.5
+
+
+class SlowChatModel(FakeToolChatModel):
+    """Answers after a blocking call, like a sync-only client would."""
+
+    def _generate(self, *args, **kwargs):
+        time.sleep(DELAY)
+        return super()._generate(*args, **kwargs)
+
+
+class TestChatRoutes(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.app(AdmissionController("chat"))
+
+    def app(self, admission: AdmissionController):
+        logger = logging.getLogger(__name__)
+        agent = SQLAgent(
+            db=SQLDatabase.from_uri("sqlite://"),
+            llm=SlowChatModel(responses=["There is one game"]),
+            prompt="You answer questions about games.",
+            langfuse_config={},
+            logger=logger,
+        )
+        app = FastAPI()
+        app.include_router(chat.Routes(
+            agent=agent, logging=logger, renderer=OpenWebUiRenderer(logger), admission=admission
+        )())
+        app.include_router(healthcheck.Routes(warmer=None)())
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_concurrent_asks_progress_in_parallel(self):
+        started = time.monotonic()
+        responses = await asyncio.gather(*(
+            self.client.post("/ask", json={"question": "How many games?"}) for _ in range(3)
+        ))
+        elapsed = time.monotonic() - started
+
+        assert [response.json() for response in responses] == [{"answer": "There is one game"}] * 3
+        # one after the other they would take 3 * DELAY
+        assert elapsed < 2 * DELAY
+
+    async def test_healthcheck_is_served_while_asking(self):
+        ask = asyncio.create_task(self.client.post("/ask", json={"question": "How many games?"}))
+        await asyncio.sleep(DELAY / 5)
+
+        started = time.monotonic()
+        health = await self.client.get("/healthcheck")
+
+        assert health.json() == {"status": "ok"}
+        assert time.monotonic() - started < DELAY / 2
+        assert not ask.done()
+        assert (await ask).status_code == 200
+
+    async def test_overload_is_rejected(self):
+        await self.client.aclose()
+        metrics = MetricsRegistry()
+        self.app(AdmissionController("chat", max_in_flight=1, max_queue=1, queue_timeout=5, metrics=metrics))
+
+        responses = await asyncio.gather(*(
+            self.client.post("/ask", json={"question": "How many games?"}) for _ in range(4)
+        ))
+
+        # one runs, one waits for it, the others are turned away right away
+        assert sorted(response.status_code for response in responses) == [200, 200, 429, 429]
+        assert all(int(response.headers["Retry-After"]) >= 1 for response in responses if response.status_code == 429)
+        assert metrics.counter("admission.chat.rejected.queue_full") == 2
+        assert metrics.gauge("admission.chat.in_flight") == 0
@@ -0,0 +1,39 @@
+import logging
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+from fastapi import FastAPI
+
+from agent_server.adapters.admission import AdmissionController
+from agent_server.renderer.open_webui import OpenWebUiRenderer
+from agent_server.routers import internet_archive
+
+
+def broken_agent():
+    # e.g. the DownloaderNode without its data directory
+    raise AttributeError("data_dir /data/ia/data does not exist")
+
+
+class TestInternetArchiveRoutes(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger = logging.getLogger(__name__)
+        self.admission = AdmissionController("graph", max_in_flight=1, max_queue=0)
+        app = FastAPI()
+        app.include_router(internet_archive.Routes(
+            agent=broken_agent, logging=logger, renderer=OpenWebUiRenderer(logger), admission=self.admission
+        )())
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://test"
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_failing_agent_does_not_keep_the_slot(self):
+        for _ in range(2):
+            response = await self.client.post("/ia/stream", json={"question": "Where is the Tetris manual?"})
+            # the slot is free again, the next request is not turned away with 429
+            assert response.status_code == 500
+
+        assert self.admission.stats()["in_flight"] == 0
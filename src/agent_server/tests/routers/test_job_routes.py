@@ -0,0 +1,56 @@
+import json
+import logging
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+from fastapi import FastAPI
+from sqlmodel import SQLModel, create_engine
+
+from agent_server.adapters.ia_search_store import IASearchStore
+from agent_server.ai.graphs.jobs import IAJobManager
+from agent_server.ai.graphs.runner import InternetArchiveGraphRunner
+from agent_server.routers import jobs
+from agent_server.tests.ai.graphs.test_internet_archive_graph import FakeInternetArchive, build_graph, KEPT
+
+
+class TestJobRoutes(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmp.name}/jobs.sqlite")
+        SQLModel.metadata.create_all(self.engine)
+        graph = build_graph(FakeInternetArchive(), f"{self.tmp.name}/cache", self.tmp.name)
+        manager = IAJobManager(runner=InternetArchiveGraphRunner(graph), store=IASearchStore(engine=self.engine))
+        app = FastAPI()
+        app.include_router(jobs.Routes(jobs=manager, logging=logging.getLogger(__name__))())
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    async def test_job_lifecycle(self):
+        submitted = await self.client.post("/jobs", json={"question": "Tetris Manual"})
+        job = submitted.json()
+
+        assert submitted.status_code == 202
+        assert submitted.headers["Location"] == f"/jobs/{job['id']}"
+        assert job["created"]
+
+        async with self.client.stream("GET", f"/jobs/{job['id']}/events") as response:
+            lines = [line async for line in response.aiter_lines() if line.startswith("data: ")]
+        assert json.loads(lines[-1].removeprefix("data: "))["status"] == "done"
+
+        result = (await self.client.get(f"/jobs/{job['id']}")).json()
+        assert result["status"] == "done"
+        assert result["results"]["filtered_results"] == KEPT
+
+        assert (await self.client.post("/jobs", json={"question": "tetris manual"})).json()["created"] is False
+        assert (await self.client.delete(f"/jobs/{job['id']}")).json()["status"] == "done"
+
+    async def test_unknown_job(self):
+        assert (await self.client.get("/jobs/42")).status_code == 404
+        assert (await self.client.get("/jobs/42/events")).status_code == 404
+        assert (await self.client.delete("/jobs/42")).status_code == 404